@@ -0,0 +1,181 @@
+"""
+Inference backend selection for WorkerCounter.
+
+ultralytics' AutoBackend runs every format we ship behind the same call, so a
+backend is just which artifact of the model gets loaded:
+
+  tensorrt     <stem>.engine               (CUDA only)
+  openvino     <stem>_openvino_model/      (CPU)
+  onnxruntime  <stem>.onnx                 (CPU, or CUDA with onnxruntime-gpu)
+  pytorch      <stem>.pt
+
+resolve() picks one. backend="auto" probes every backend whose artifact
+exists and whose runtime is importable: it times the raw forward pass at the
+configured input size and keeps the fastest. The choice is cached in
+backend_cache.json next to the model, keyed by model stem, device and input
+size, and reused on later boots as long as the artifacts are unchanged.
+Exported artifacts with a fixed square input that can't take the configured
+size are probed (and later run) at 640x640.
+
+    python backends.py textile_model_worker1.pt --device cpu [--reprobe]
+"""
+import gc
+import importlib.util
+import json
+import os
+import time
+
+import numpy as np
+
+
+BACKENDS = ("tensorrt", "openvino", "onnxruntime", "pytorch")
+RUNTIME_MODULES = {"tensorrt": "tensorrt", "openvino": "openvino", "onnxruntime": "onnxruntime", "pytorch": "torch"}
+CACHE_NAME = "backend_cache.json"
+SQUARE_HW = (640, 640)
+
+
+def artifacts(model_path):
+    """{backend: path} for every artifact of model_path that exists on disk."""
+    stem = os.path.splitext(model_path.rstrip("/"))[0]
+    if stem.endswith("_openvino_model"):
+        stem = stem[:-len("_openvino_model")]
+    paths = {
+        "tensorrt": stem + ".engine",
+        "openvino": stem + "_openvino_model",
+        "onnxruntime": stem + ".onnx",
+        "pytorch": stem + ".pt",
+    }
+    return {b: p for b, p in paths.items() if os.path.exists(p)}
+
+
+def available(model_path, on_cuda):
+    """Backends that have an artifact and an importable runtime on this box."""
+    found = {}
+    for backend, path in artifacts(model_path).items():
+        if backend == "tensorrt" and not on_cuda:
+            continue
+        if backend == "openvino" and on_cuda:
+            continue  # CPU-only runtime; no reason to pick it with a GPU present
+        if importlib.util.find_spec(RUNTIME_MODULES[backend]) is None:
+            continue
+        found[backend] = path
+    return found
+
+
+def _mtime(path):
+    if os.path.isdir(path):
+        return max((os.path.getmtime(os.path.join(path, f)) for f in os.listdir(path)), default=0.0)
+    return os.path.getmtime(path)
+
+
+def _time_backend(path, device, half, input_hw, runs):
+    """ms per forward pass at input_hw (or SQUARE_HW if the artifact is fixed-shape); (ms, hw)."""
+    import torch
+    from ultralytics import YOLO
+
+    model = YOLO(path, task='detect')
+    try:
+        for hw in (tuple(input_hw), SQUARE_HW):
+            try:
+                dummy = np.zeros(hw + (3,), dtype=np.uint8)
+                model.predict(dummy, imgsz=hw, half=half, device=device, verbose=False)
+                backend = model.predictor.model
+                x = torch.zeros((1, 3) + hw, device=backend.device)
+                with torch.inference_mode():
+                    for _ in range(3):
+                        backend(x)  # warm-up
+                    t0 = time.perf_counter()
+                    for _ in range(runs):
+                        out = backend(x)
+                    # one sync for the whole run on CUDA
+                    (out[0] if isinstance(out, (list, tuple)) else out).cpu()
+                return 1000.0 * (time.perf_counter() - t0) / runs, hw
+            except Exception as e:
+                if hw == SQUARE_HW:
+                    raise
+                print(f"  {path}: {hw} not accepted ({e}); trying {SQUARE_HW}")
+                model.predictor = None
+    finally:
+        del model
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+
+def probe(candidates, device, half, input_hw, runs=20):
+    """{backend: {"path", "ms", "input_hw"}} for each candidate that loads and runs."""
+    results = {}
+    for backend, path in candidates.items():
+        try:
+            ms, hw = _time_backend(path, device, half, input_hw, runs)
+        except Exception as e:
+            print(f"  {backend:12s} failed: {e}")
+            continue
+        results[backend] = {"path": path, "ms": round(ms, 3), "input_hw": list(hw)}
+        print(f"  {backend:12s} {ms:8.2f} ms/forward at {hw[1]}x{hw[0]}  ({path})")
+    return results
+
+
+def resolve(model_path, backend="auto", device="cpu", half=False, input_hw=(384, 640), cache_path=None, reprobe=False):
+    """
+    (backend, artifact path, model input hw) to run. backend is "auto" or one
+    of BACKENDS; an explicit backend is used as-is if its artifact exists.
+    """
+    on_cuda = str(device) != "cpu"
+    candidates = available(model_path, on_cuda)
+    if not candidates:
+        raise IOError(f"No usable model artifact for {model_path}")
+    cache_path = cache_path or os.path.join(os.path.dirname(os.path.abspath(model_path)), CACHE_NAME)
+    stem = os.path.basename(os.path.splitext(model_path.rstrip("/"))[0])
+    key = f"{stem}|{device}|{'fp16' if half else 'fp32'}|{input_hw[1]}x{input_hw[0]}"
+    mtimes = {p: _mtime(p) for p in candidates.values()}
+
+    cache = {}
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path) as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+
+    if backend != "auto":
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend: {backend}")
+        if backend not in candidates:
+            raise IOError(f"Backend {backend} unavailable for {model_path} (have: {', '.join(candidates)})")
+        if backend == "pytorch":
+            return backend, candidates[backend], tuple(input_hw)
+        # input size an earlier probe found for this artifact, else the usual square export
+        probed = (cache.get(key) or {}).get("probe", {}).get(backend)
+        return backend, candidates[backend], tuple(probed["input_hw"]) if probed else SQUARE_HW
+
+    entry = cache.get(key)
+    if not reprobe and entry and entry.get("artifacts") == mtimes:
+        print(f"Backend {entry['backend']} ({entry['path']}) from {cache_path}")
+        return entry["backend"], entry["path"], tuple(entry["input_hw"])
+
+    print(f"Probing inference backends for {stem} on {device} at {input_hw[1]}x{input_hw[0]} ...")
+    results = probe(candidates, device, half, input_hw)
+    if not results:
+        raise IOError(f"No backend could run {model_path}")
+    best = min(results, key=lambda b: results[b]["ms"])
+    cache[key] = {"backend": best, **results[best], "artifacts": mtimes, "probe": results, "probed_at": time.time()}
+    try:
+        with open(cache_path, "w") as f:
+            json.dump(cache, f, indent=2)
+    except OSError as e:
+        print(f"Could not write {cache_path}: {e}")
+    print(f"Selected backend {best} ({results[best]['ms']} ms/forward)")
+    return best, results[best]["path"], tuple(results[best]["input_hw"])
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("model")
+    parser.add_argument("--device", default="cpu", help="'cpu' or 'cuda:0'")
+    parser.add_argument("--half", action="store_true")
+    parser.add_argument("--reprobe", action="store_true", help="ignore the cached choice")
+    args = parser.parse_args()
+    print(resolve(args.model, "auto", device=args.device, half=args.half, reprobe=args.reprobe))
@@ -0,0 +1,148 @@
+"""
+Cross-stream batching for a detector shared by several WorkerCounters.
+
+Every counter still runs its own _process_frame() on its own thread; inside
+detect_track() it submits its preprocessed (1, 3, H, W) input here and blocks
+until its detections come back. A scheduler thread collects submissions into
+one batch and runs a single forward pass + NMS for all of them. A batch closes
+when:
+  - MAX_BATCH inputs are waiting, or
+  - every registered stream is waiting (nobody else can submit), or
+  - MAX_WAIT seconds have passed since the oldest waiting input arrived
+Inputs of different shapes in one batch are run as separate sub-batches.
+Each stream gets its (N, 6) detections back and tracks them itself.
+
+Exported models need a dynamic (or >= MAX_BATCH) batch dimension;
+MultiCameraRunner probes for it and leaves fixed batch-1 exports unbatched.
+"""
+import threading
+import time
+from collections import defaultdict, deque
+
+import numpy as np
+import torch
+
+
+class _Request:
+    __slots__ = ("stream", "tensor", "t_submit", "t_start", "done", "result", "error")
+
+    def __init__(self, stream, tensor):
+        self.stream = stream
+        self.tensor = tensor
+        self.t_submit = time.perf_counter()
+        self.t_start = None
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class BatchScheduler:
+    """Groups detector inputs from several streams into batched calls."""
+
+    def __init__(self, infer_batch, max_batch=8, max_wait=0.005, name="batcher", stats_len=1024):
+        # infer_batch: (B, 3, H, W) tensor -> list of B (N, 6) arrays
+        self.infer_batch = infer_batch
+        self.MAX_BATCH = max_batch
+        self.MAX_WAIT = max_wait
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._streams = set()
+        self._closed = False
+
+        self.stats = {"batches": 0, "frames": 0, "errors": 0}
+        self._fill = deque(maxlen=stats_len)
+        self._queue_wait = deque(maxlen=stats_len)
+        self._latency = defaultdict(lambda: deque(maxlen=stats_len))
+
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._thread.start()
+
+    def register(self, stream):
+        with self._cond:
+            self._streams.add(stream)
+
+    def unregister(self, stream):
+        with self._cond:
+            self._streams.discard(stream)
+            self._cond.notify_all()  # the waiting batch may now be complete
+
+    def submit(self, stream, tensor, timeout=None):
+        """Detections (N, 6) for tensor; blocks until its batch has run."""
+        req = _Request(stream, tensor)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("BatchScheduler is closed")
+            self._queue.append(req)
+            self._cond.notify_all()
+        if not req.done.wait(timeout):
+            raise TimeoutError(f"No detections for stream {stream} within {timeout}s")
+        if req.error is not None:
+            raise req.error
+        self._latency[stream].append(time.perf_counter() - req.t_submit)
+        return req.result
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout=1.0)
+
+    def _batch_ready(self):
+        n = len(self._queue)
+        return n >= self.MAX_BATCH or (self._streams and n >= len(self._streams))
+
+    def _next_batch(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._queue or self._closed)
+            if not self._queue:
+                return None
+            deadline = self._queue[0].t_submit + self.MAX_WAIT
+            while not self._batch_ready() and not self._closed:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            n = min(self.MAX_BATCH, len(self._queue))
+            return [self._queue.popleft() for _ in range(n)]
+
+    def _loop(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            t_start = time.perf_counter()
+            by_shape = defaultdict(list)
+            for req in batch:
+                req.t_start = t_start
+                self._queue_wait.append(t_start - req.t_submit)
+                by_shape[tuple(req.tensor.shape[1:])].append(req)
+            for reqs in by_shape.values():
+                try:
+                    results = self.infer_batch(torch.cat([r.tensor for r in reqs]))
+                    for req, dets in zip(reqs, results):
+                        req.result = dets
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    for req in reqs:
+                        req.error = e
+                for req in reqs:
+                    req.done.set()
+            self.stats["batches"] += 1
+            self.stats["frames"] += len(batch)
+            self._fill.append(len(batch) / self.MAX_BATCH)
+
+    def get_stats(self):
+        """Batch fill ratio, queue wait and per-stream submit->result latency (ms)."""
+        def summary(values):
+            if not values:
+                return {"mean_ms": 0.0, "p95_ms": 0.0}
+            v = np.asarray(values) * 1000.0
+            return {"mean_ms": round(float(v.mean()), 2), "p95_ms": round(float(np.percentile(v, 95)), 2)}
+
+        return {
+            **self.stats,
+            "fill_ratio": round(float(np.mean(self._fill)), 3) if self._fill else 0.0,
+            "avg_batch": round(self.stats["frames"] / max(1, self.stats["batches"]), 2),
+            "queue_wait": summary(list(self._queue_wait)),
+            "latency": {s: summary(list(v)) for s, v in self._latency.items()},
+        }
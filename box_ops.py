@@ -0,0 +1,63 @@
+"""
+Whole-array box helpers (xyxy boxes as (N, 4) NumPy arrays).
+"""
+import numpy as np
+
+
+def area(xyxy):
+    return np.clip(xyxy[:, 2] - xyxy[:, 0], 0, None) * np.clip(xyxy[:, 3] - xyxy[:, 1], 0, None)
+
+
+def intersection_matrix(a, b):
+    """(len(a), len(b)) intersection areas."""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float64)
+    # in place on two (len(a), len(b)) buffers: at hundreds of boxes the temporaries dominate
+    iw = np.minimum(a[:, None, 2], b[None, :, 2])
+    iw -= np.maximum(a[:, None, 0], b[None, :, 0])
+    np.maximum(iw, 0, out=iw)
+    ih = np.minimum(a[:, None, 3], b[None, :, 3])
+    ih -= np.maximum(a[:, None, 1], b[None, :, 1])
+    np.maximum(ih, 0, out=ih)
+    iw *= ih
+    return iw
+
+
+def iou_matrix(a, b):
+    """(len(a), len(b)) IoU matrix in one broadcasted operation."""
+    inter = intersection_matrix(a, b)
+    if inter.size == 0:
+        return inter
+    union = area(a)[:, None] + area(b)[None, :]
+    union -= inter
+    return inter / np.maximum(union, 1e-9)
+
+
+def ios_matrix(a, b):
+    """Intersection over the smaller box: 1.0 when one box lies inside the other (e.g. a cut-off part)."""
+    inter = intersection_matrix(a, b)
+    if inter.size == 0:
+        return inter
+    smaller = np.minimum(area(a)[:, None], area(b)[None, :])
+    return inter / np.maximum(smaller, 1e-9)
+
+
+def nms(xyxy, scores, iou_thresh=0.5, classes=None):
+    """
+    Greedy non-maximum suppression; returns kept indices, best score first.
+    With classes given, boxes of different classes never suppress each other.
+    """
+    if len(xyxy) == 0:
+        return np.zeros((0,), dtype=np.int64)
+    boxes = xyxy
+    if classes is not None:
+        # shift each class into its own coordinate range
+        offset = (np.asarray(classes, dtype=np.float64) * (xyxy.max() + 1.0))[:, None]
+        boxes = xyxy + offset
+    order = np.argsort(-scores, kind="stable")
+    ious = iou_matrix(boxes[order], boxes[order])
+    keep = np.ones(len(order), dtype=bool)
+    for i in range(len(order)):
+        if keep[i]:
+            keep[i + 1:] &= ious[i, i + 1:] <= iou_thresh
+    return order[keep]
@@ -0,0 +1,264 @@
+"""
+Supervised live capture: wraps cv2.VideoCapture, notices stalls and reopens
+the stream with exponential backoff.
+
+A stall is either
+  - no frame with an advancing PTS for STALE_SEC (read() failing, or the camera
+    repeating the same frame), which triggers a reopen, or
+  - a PTS jump larger than PTS_GAP_SEC on a stream that recovered by itself.
+Both are reported as an outage with its duration and an estimate of the
+frames lost (duration * nominal fps).
+
+The supervisor only replaces the capture object, so whoever owns it (e.g.
+WorkerCounter) keeps its loaded model and per-track counting state.
+
+Run this file to exercise it against FakePausingCapture, a local source that
+pauses and resumes:
+
+    python capture_supervisor.py
+"""
+import time
+
+import cv2
+import numpy as np
+
+
+def open_stream(src, timeout_sec=5.0):
+    """cv2.VideoCapture for src; RTSP opens/reads are bounded by timeout_sec where OpenCV supports it."""
+    timeout_ms = int(timeout_sec * 1000)
+    if isinstance(src, str) and src.startswith("rtsp") and hasattr(cv2, "CAP_PROP_READ_TIMEOUT_MSEC"):
+        # bound blocking opens/reads so the supervisor gets control back on a dead camera
+        cap = cv2.VideoCapture(src, cv2.CAP_FFMPEG, [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, timeout_ms,
+                                                     cv2.CAP_PROP_READ_TIMEOUT_MSEC, timeout_ms])
+    else:
+        cap = cv2.VideoCapture(src)
+    if cap.isOpened():
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+
+class CaptureSupervisor:
+    """Drop-in for the parts of cv2.VideoCapture the frame readers use."""
+
+    def __init__(self,
+                 open_capture,
+                 stale_sec=5.0,
+                 pts_gap_sec=2.0,
+                 backoff_initial=1.0,
+                 backoff_max=30.0,
+                 stop_event=None):
+        self._open_capture = open_capture
+        self.STALE_SEC = stale_sec
+        self.PTS_GAP_SEC = pts_gap_sec
+        self.BACKOFF_INITIAL = backoff_initial
+        self.BACKOFF_MAX = backoff_max
+        self._stop = stop_event
+
+        self.cap = None
+        self.healthy = True
+        self.fps = 25.0
+        self._last_pts = None
+        self._last_progress = time.monotonic()
+        self._outage_start = None
+        self.stats = {
+            "outages": 0,
+            "reconnects": 0,
+            "outage_sec_total": 0.0,
+            "last_outage_sec": 0.0,
+            "frames_lost": 0,
+        }
+
+        self.cap = self._open_capture()
+        if self.cap is None or not self.cap.isOpened():
+            raise IOError("Cannot open video source")
+        self._on_opened()
+
+    # --------------- cv2.VideoCapture surface ----------------
+
+    def isOpened(self):
+        return self.cap is not None and self.cap.isOpened()
+
+    def grab(self):
+        return self._after_read(self.cap.grab())
+
+    def retrieve(self):
+        return self.cap.retrieve()
+
+    def read(self):
+        ok, frame = self.cap.read()
+        ok = self._after_read(ok)
+        return ok, (frame if ok else None)
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+
+    # --------------- supervision ----------------
+
+    def _on_opened(self):
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        if fps and 1.0 <= fps <= 240.0:
+            self.fps = fps
+        self._last_pts = None  # PTS restarts with a new session
+        self._last_progress = time.monotonic()
+
+    def _after_read(self, ok):
+        now = time.monotonic()
+        if ok:
+            pts = self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+            last = self._last_pts
+            if last is None or pts <= 0 or pts > last:
+                if last is not None and pts - last > self.PTS_GAP_SEC:
+                    # stream paused and came back on its own
+                    self._start_outage(now - (pts - last))
+                self._last_pts = pts if pts > 0 else last
+                self._last_progress = now
+                self._end_outage(now)
+                return True
+        # no progress: read failed or the camera keeps repeating the same PTS
+        if now - self._last_progress > self.STALE_SEC:
+            self._start_outage(self._last_progress)
+            self._reconnect()
+        return False
+
+    def _start_outage(self, since):
+        if self._outage_start is None:
+            self._outage_start = since
+            self.healthy = False
+            self.stats["outages"] += 1
+            print(f"[CAPTURE] stream stalled, no new frames since {time.monotonic() - since:.1f}s ago")
+
+    def _end_outage(self, now):
+        if self._outage_start is None:
+            return
+        duration = now - self._outage_start
+        lost = max(0, int(round(duration * self.fps)) - 1)
+        self._outage_start = None
+        self.healthy = True
+        self.stats["outage_sec_total"] += duration
+        self.stats["last_outage_sec"] = duration
+        self.stats["frames_lost"] += lost
+        print(f"[CAPTURE] stream back after {duration:.1f}s outage, ~{lost} frames lost")
+
+    def _reconnect(self):
+        """Reopen the source with exponential backoff until it works or we are stopped."""
+        delay = self.BACKOFF_INITIAL
+        while not (self._stop is not None and self._stop.is_set()):
+            try:
+                self.cap.release()
+            except Exception:
+                pass
+            self.stats["reconnects"] += 1
+            print(f"[CAPTURE] reconnecting (attempt {self.stats['reconnects']}) ...")
+            try:
+                cap = self._open_capture()
+            except Exception as e:
+                print(f"[CAPTURE] reopen failed: {e}")
+                cap = None
+            if cap is not None and cap.isOpened():
+                self.cap = cap
+                self._on_opened()
+                return True
+            if self._stop is not None:
+                self._stop.wait(delay)
+            else:
+                time.sleep(delay)
+            delay = min(delay * 2, self.BACKOFF_MAX)
+        return False
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["healthy"] = self.healthy
+        if self._outage_start is not None:
+            stats["current_outage_sec"] = time.monotonic() - self._outage_start
+        return stats
+
+
+class FakePausingCapture:
+    """
+    Local stand-in for an RTSP camera. Produces frames at fps (with a PTS) and
+    goes silent during the given (start, end) windows, measured in seconds
+    since the first capture was opened. With dead_until_reopen=True a pause
+    only ends once the source is reopened after the window, like a camera that
+    dropped the RTSP session.
+    """
+
+    _epoch = None
+
+    def __init__(self, pauses=((2.0, 5.0),), fps=25.0, shape=(360, 640, 3), dead_until_reopen=False):
+        if FakePausingCapture._epoch is None:
+            FakePausingCapture._epoch = time.monotonic()
+        self.pauses = pauses
+        self.fps = fps
+        self.dead_until_reopen = dead_until_reopen
+        self._frame = np.zeros(shape, dtype=np.uint8)
+        self._opened_at = self._clock()
+        self._n = 0
+        self._pts = 0.0
+        self._open = True
+
+    def _clock(self):
+        return time.monotonic() - FakePausingCapture._epoch
+
+    def _paused(self, t):
+        for start, end in self.pauses:
+            if start <= t < end:
+                return True
+            if self.dead_until_reopen and start <= t and self._opened_at < end:
+                return True
+        return False
+
+    def isOpened(self):
+        return self._open and not self._paused(self._clock())
+
+    def grab(self):
+        time.sleep(1.0 / self.fps)
+        t = self._clock()
+        if not self._open or self._paused(t):
+            return False
+        self._n += 1
+        self._pts = t - self._opened_at
+        return True
+
+    def retrieve(self):
+        self._frame[:] = self._n % 256
+        return True, self._frame
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            return 1000.0 * self._pts
+        return 0.0
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        self._open = False
+
+
+if __name__ == "__main__":
+    # 1) camera pauses for 1s and resumes by itself -> PTS-gap outage, no reopen
+    # 2) camera drops the session for 3s -> stale watchdog, reopen with backoff
+    sup = CaptureSupervisor(
+        lambda: FakePausingCapture(pauses=((1.0, 2.0), (3.0, 6.0)), dead_until_reopen=False),
+        stale_sec=1.5, pts_gap_sec=0.5, backoff_initial=0.5)
+    t_end = time.monotonic() + 8.0
+    frames = 0
+    while time.monotonic() < t_end:
+        ok, _ = sup.read()
+        frames += ok
+    print(f"frames read: {frames}")
+    print(sup.get_stats())
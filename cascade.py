@@ -0,0 +1,179 @@
+"""
+Two-tier detector cascade for WorkerCounter.
+
+A small model (textile_model_worker_fast.*) runs on every detected frame; the
+full model only runs where the small one is not enough:
+
+  uncertain  the small model has a target-class box it is unsure about (conf
+             between LOW_CONF and SURE_CONF) within UNCERTAIN_MARGIN of the
+             band; the full model decides. Unsure boxes of other classes or
+             far from the line can't change a count and don't escalate
+  band       a target track, or a new target box, is inside the band around
+             line_y, where a wrong or missing box becomes a wrong count
+
+When a full-model crop route is given, escalations whose boxes all sit inside
+the ROI band run the full model on the band crop only; the small model's boxes
+outside the crop are kept. On every escalation the two models' confident
+target boxes are matched by IoU, and a frame where either side has an
+unmatched box counts as a disagreement.
+"""
+import time
+
+import numpy as np
+import torch
+from ultralytics.utils import ops
+
+from box_ops import iou_matrix, nms
+from preprocess import FusedPreprocessor
+
+
+class FastDetector:
+    """Raw forward pass + NMS of a (small) model on the fused frame input; (N, 6) detections."""
+
+    def __init__(self, model, half=False, device="cpu", torch_device="cpu", input_hw=None, nms_iou=0.7, max_det=300):
+        self.model = model
+        self.HALF = half
+        self.DEVICE = device
+        self.torch_device = torch_device
+        self.input_hw = input_hw
+        self.nms_iou = nms_iou
+        self.max_det = max_det
+        self._preprocessor = None
+        self._backend = None
+
+    def __call__(self, frame, conf):
+        pre = self._preprocessor
+        if pre is None or pre.frame_hw != frame.shape[:2]:
+            pre = self._preprocessor = FusedPreprocessor(frame.shape, half=self.HALF, device=self.torch_device,
+                                                         input_hw=self.input_hw)
+        x = pre(frame)
+        if self._backend is None:
+            # one ordinary predict sets up the predictor's AutoBackend at this input size
+            dummy = np.zeros(pre.input_hw + (3,), dtype=np.uint8)
+            self.model.predict(dummy, imgsz=pre.input_hw, half=self.HALF, device=self.DEVICE, verbose=False)
+            self._backend = self.model.predictor.model
+        with torch.inference_mode():
+            out = ops.non_max_suppression(self._backend(x), conf, self.nms_iou, max_det=self.max_det)
+        return out[0].cpu().numpy()
+
+
+def centers_inside(dets, rects):
+    """Mask of detections whose box center lies in any of rects."""
+    cx = 0.5 * (dets[:, 0] + dets[:, 2])
+    cy = 0.5 * (dets[:, 1] + dets[:, 3])
+    inside = np.zeros(len(dets), dtype=bool)
+    for x0, y0, x1, y1 in rects:
+        inside |= (cx >= x0) & (cx < x1) & (cy >= y0) & (cy < y1)
+    return inside
+
+
+class DetectorCascade:
+    """
+    fast(frame, conf) and full(frame) return (N, 6) x1, y1, x2, y2, conf, cls
+    detections in frame pixels; full_crops(frame, rects), if given, runs the
+    full model on crops only.
+    """
+
+    def __init__(self, fast, full, full_crops=None, cls_id=1, conf=0.7, low_conf=0.25, sure_conf=0.85,
+                 uncertain_margin=60, match_iou=0.5, merge_iou=0.5, log_every=500):
+        self.fast = fast
+        self.full = full
+        self.full_crops = full_crops
+        self.CLS_ID = cls_id
+        self.CONF = conf              # what counting keeps; used for the disagreement check
+        self.LOW_CONF = low_conf      # small model's NMS threshold; anything below is ignored
+        self.SURE_CONF = sure_conf    # small-model target boxes below this escalate...
+        self.UNCERTAIN_MARGIN = uncertain_margin  # ...when their center is within this many px of the band
+        self.MATCH_IOU = match_iou
+        self.MERGE_IOU = merge_iou
+        self.LOG_EVERY = log_every
+        self.stats = {"frames": 0, "escalated": 0, "uncertain": 0, "band": 0, "crop": 0,
+                      "disagreements": 0, "fast_sec": 0.0, "full_sec": 0.0}
+
+    def _uncertain(self, dets, band):
+        """Mask of unsure target-class boxes whose center is near the band."""
+        lo, hi = band
+        cy = 0.5 * (dets[:, 1] + dets[:, 3])
+        near = (cy >= lo - self.UNCERTAIN_MARGIN) & (cy <= hi + self.UNCERTAIN_MARGIN)
+        return (dets[:, 5] == self.CLS_ID) & (dets[:, 4] < self.SURE_CONF) & near
+
+    def _reason(self, dets, band, track_cy):
+        if np.any(self._uncertain(dets, band)):
+            return "uncertain"
+        lo, hi = band
+        if np.any((track_cy >= lo) & (track_cy <= hi)):
+            return "band"
+        tgt = dets[dets[:, 5] == self.CLS_ID]
+        cy = 0.5 * (tgt[:, 1] + tgt[:, 3])
+        if np.any((cy >= lo) & (cy <= hi)):
+            return "band"
+        return None
+
+    def _disagree(self, fast, full):
+        """Unmatched confident target boxes on either side."""
+        a = fast[(fast[:, 5] == self.CLS_ID) & (fast[:, 4] >= self.CONF), :4]
+        b = full[(full[:, 5] == self.CLS_ID) & (full[:, 4] >= self.CONF), :4]
+        if len(a) != len(b):
+            return True
+        if len(a) == 0:
+            return False
+        matched = iou_matrix(a, b) >= self.MATCH_IOU
+        return not (matched.any(axis=1).all() and matched.any(axis=0).all())
+
+    def detect(self, frame, band, track_cy, rects=None):
+        """
+        Detections for frame. band is the (y_lo, y_hi) escalation band around the
+        line, track_cy the latest cy of the live target tracks, rects the ROI
+        band crops for the full model.
+        """
+        s = self.stats
+        s["frames"] += 1
+        t0 = time.perf_counter()
+        fast = self.fast(frame, self.LOW_CONF)
+        t1 = time.perf_counter()
+        s["fast_sec"] += t1 - t0
+
+        reason = self._reason(fast, band, track_cy)
+        if reason is None:
+            self._maybe_log()
+            return fast
+        s["escalated"] += 1
+        s[reason] += 1
+
+        uncertain = self._uncertain(fast, band)
+        if self.full_crops is not None and rects and centers_inside(fast[uncertain], rects).all():
+            s["crop"] += 1
+            full = self.full_crops(frame, rects)
+            inside = centers_inside(fast, rects)
+            compared, kept = fast[inside], fast[~inside]
+            merged = np.concatenate([kept, full]) if len(kept) else full
+            if len(kept) and len(full):
+                # boxes straddling a crop edge can come from both models
+                merged = merged[nms(merged[:, :4], merged[:, 4], self.MERGE_IOU, classes=merged[:, 5])]
+        else:
+            full = merged = self.full(frame)
+            compared = fast
+        s["full_sec"] += time.perf_counter() - t1
+        if self._disagree(compared, full):
+            s["disagreements"] += 1
+        self._maybe_log()
+        return merged
+
+    def get_stats(self):
+        s = self.stats
+        frames, esc = max(1, s["frames"]), s["escalated"]
+        return {
+            "frames": s["frames"],
+            "escalation_rate": round(esc / frames, 4),
+            "uncertain": s["uncertain"],
+            "band": s["band"],
+            "crop": s["crop"],
+            "disagreement_rate": round(s["disagreements"] / max(1, esc), 4),
+            "fast_ms": round(1e3 * s["fast_sec"] / frames, 2),
+            "full_ms": round(1e3 * s["full_sec"] / max(1, esc), 2),
+            "ms_per_frame": round(1e3 * (s["fast_sec"] + s["full_sec"]) / frames, 2),
+        }
+
+    def _maybe_log(self):
+        if self.LOG_EVERY and self.stats["frames"] % self.LOG_EVERY == 0:
+            print(f"Cascade: {self.get_stats()}")
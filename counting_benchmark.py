@@ -0,0 +1,237 @@
+"""
+Micro-benchmark: per-frame counting cost of the old per-box loop vs the
+vectorized engine in improved_class.WorkerCounter, with 5, 50 and 500 tracked
+objects. Both paths are fed the same synthetic tracks and must make exactly
+the same crossing decisions.
+
+    python counting_benchmark.py [--frames 600] [--device cuda:0]
+
+If torch is installed, boxes live in a torch tensor on --device so the old
+path pays the real per-scalar .item()/.tolist() syncs; otherwise NumPy is used.
+"""
+import argparse
+import contextlib
+import io
+import time
+from collections import deque
+
+import numpy as np
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+import improved_class
+from counting_engine import boxes_to_arrays
+
+
+class SyntheticBoxes:
+    """Just enough of ultralytics Boxes for both counting paths."""
+
+    def __init__(self, data):
+        self.data = data  # (N, 7): x1, y1, x2, y2, id, conf, cls
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def id(self):
+        return self.data[:, 4]
+
+    def __iter__(self):
+        for i in range(len(self.data)):
+            yield _SyntheticBox(self.data[i:i + 1])
+
+
+class _SyntheticBox:
+    def __init__(self, row):
+        self.xyxy = row[:, :4]
+        self.cls = row[0, 6]
+
+
+class LegacyCounter:
+    """Copy of the per-box counting loop as it was before the vectorized engine."""
+
+    def __init__(self, ref):
+        for k in ("CLS_ID_TO_COUNT", "AREA_MIN", "AREA_MAX", "HYSTERESIS", "COOLDOWN_SEC", "MIN_AGE",
+                  "MIN_TRAVEL", "MIN_VY", "GATE_ENABLE", "GATE_WINDOW", "SWITCH_SUPPRESS_T", "SWITCH_SUPPRESS_R"):
+            setattr(self, k, getattr(ref, k))
+        self.exit_count = 0
+        self.rollsin = 0
+        self.workers = {}
+        self.track_state = {}
+        self.recent_crossings = deque(maxlen=4096)
+
+    def _line_sides(self, cy, line_y):
+        if cy <= line_y - self.HYSTERESIS:
+            return -1
+        elif cy >= line_y + self.HYSTERESIS:
+            return +1
+        return 0
+
+    def _update_track_state(self, tid, cx, cy, w, h, now):
+        st = self.track_state.get(tid)
+        if st is None:
+            st = {"hist": deque(maxlen=12), "age": 0, "prev_side": None,
+                  "last_cross_time": -1e9, "last_gate_side": None, "last_seen": now}
+            self.track_state[tid] = st
+        st["hist"].append((now, cx, cy, w, h))
+        st["age"] += 1
+        st["last_seen"] = now
+        return st
+
+    def _purge_old_tracks(self, now):
+        drop = [tid for tid, st in self.track_state.items() if now - st["last_seen"] > 3.0]
+        for tid in drop:
+            self.track_state.pop(tid, None)
+
+    def _gate_pair_pass(self, st, side_now):
+        if not self.GATE_ENABLE:
+            return True
+        last_side = st.get("last_gate_side")
+        t_now = st["hist"][-1][0]
+        if side_now == 0:
+            return False
+        valid = False
+        if last_side is None:
+            st["last_gate_side"] = side_now
+        elif last_side != side_now:
+            t_prev = st["hist"][-2][0] if len(st["hist"]) >= 2 else t_now
+            if (t_now - t_prev) <= self.GATE_WINDOW:
+                valid = True
+            st["last_gate_side"] = side_now
+        return valid
+
+    def _switch_suppress(self, cx, cy, now):
+        for (t, px, py) in reversed(self.recent_crossings):
+            if now - t > self.SWITCH_SUPPRESS_T:
+                break
+            if abs(px - cx) <= self.SWITCH_SUPPRESS_R and abs(py - cy) <= self.SWITCH_SUPPRESS_R:
+                return True
+        return False
+
+    def process(self, boxes, line_y, now, log):
+        self.rollsin = len(boxes)
+        for box, track_id in zip(boxes, boxes.id):
+            x1, y1, x2, y2 = box.xyxy[0].tolist()
+            cls = int(box.cls.item())
+            track_id = int(track_id.item())
+            if cls != self.CLS_ID_TO_COUNT:
+                if cls not in self.workers:
+                    self.workers[cls] = 0
+                continue
+            area = abs(y2 - y1) * abs(x2 - x1)
+            if area < self.AREA_MIN or area > self.AREA_MAX:
+                continue
+            cx, cy = 0.5 * (x1 + x2), 0.5 * (y1 + y2)
+            st = self._update_track_state(track_id, cx, cy, x2 - x1, y2 - y1, now)
+            if st["age"] < self.MIN_AGE:
+                continue
+            hist = st["hist"]
+            vy = 0.0 if len(hist) < 2 else (hist[-1][2] - hist[-2][2]) / max(1e-3, hist[-1][0] - hist[-2][0])
+            side_now = self._line_sides(cy, line_y)
+            side_prev = st["prev_side"]
+            if side_now != 0:
+                st["prev_side"] = side_now
+            crossed_band = (side_prev is not None) and (side_now != 0) and (side_prev != side_now)
+            gate_ok = self._gate_pair_pass(st, side_now)
+            speed_ok = abs(vy) >= self.MIN_VY
+            travel_ok = (0.0 if len(hist) < 2 else abs(hist[-1][2] - hist[0][2])) >= self.MIN_TRAVEL
+            cooldown_ok = (now - st["last_cross_time"]) >= self.COOLDOWN_SEC
+            if crossed_band and gate_ok and speed_ok and travel_ok and cooldown_ok:
+                if not self._switch_suppress(cx, cy, now):
+                    st["last_cross_time"] = now
+                    self.recent_crossings.append((now, cx, cy))
+                    if side_prev == 1:
+                        self.exit_count += 1
+                        for worker in self.workers.keys():
+                            self.workers[worker] += 1
+                        log.append(("exit", now, track_id))
+                    else:
+                        self.rollsin += 1
+                        log.append(("entry", now, track_id))
+        self._purge_old_tracks(now)
+
+
+def make_engine_counter():
+    """A WorkerCounter with counting state only (no model, no capture)."""
+    wc = improved_class.WorkerCounter.__new__(improved_class.WorkerCounter)
+    wc.show = False
+    wc.CLS_ID_TO_COUNT = 1
+    wc._init_counting_state()
+    return wc
+
+
+def synthetic_stream(n_objects, n_frames, line_y, fps=15.0, seed=0):
+    """Yield (now, data) with n_objects rolls moving up/down through the line plus a few workers."""
+    rng = np.random.default_rng(seed)
+    n_workers = max(1, n_objects // 10)
+    y = rng.uniform(0, 360, n_objects)
+    x = rng.uniform(20, 620, n_objects)
+    vy = rng.choice([-1.0, 1.0], n_objects) * rng.uniform(20, 200, n_objects)
+    ids = np.arange(1, n_objects + 1)
+    t0 = 1_000_000.0
+    for f in range(n_frames):
+        now = t0 + f / fps
+        y = (y + vy / fps) % 400 - 20
+        w = rng.uniform(40, 60, n_objects)
+        h = rng.uniform(40, 60, n_objects)
+        rolls = np.stack([x - w / 2, y - h / 2, x + w / 2, y + h / 2, ids,
+                          np.full(n_objects, 0.9), np.ones(n_objects)], axis=1)
+        wx = rng.uniform(0, 640, n_workers)
+        people = np.stack([wx, np.zeros(n_workers), wx + 80, np.full(n_workers, 200.0),
+                           10_000 + np.arange(n_workers), np.full(n_workers, 0.8),
+                           np.zeros(n_workers)], axis=1)
+        data = np.concatenate([rolls, people]).astype(np.float32)
+        yield now, data[rng.permutation(len(data))]
+
+
+def run_case(n_objects, n_frames, device):
+    line_y = int(360 / 2 - 60)
+    frames = list(synthetic_stream(n_objects, n_frames, line_y))
+    if torch is not None:
+        frames = [(now, torch.from_numpy(d).to(device)) for now, d in frames]
+
+    engine = make_engine_counter()
+    legacy = LegacyCounter(engine)
+
+    legacy_log, t_legacy = [], 0.0
+    for now, data in frames:
+        t = time.perf_counter()
+        legacy.process(SyntheticBoxes(data), line_y, now, legacy_log)
+        t_legacy += time.perf_counter() - t
+
+    engine_log, t_engine = [], 0.0
+    quiet = contextlib.redirect_stdout(io.StringIO())  # the engine prints per worker increment
+    with quiet:
+        for now, data in frames:
+            t = time.perf_counter()
+            boxes = SyntheticBoxes(data)
+            engine.rollsin = len(boxes)
+            before_exit, before_in = engine.exit_count, engine.rollsin
+            engine._count_detections(boxes_to_arrays(boxes), None, line_y, now)
+            engine._purge_old_tracks(now)
+            t_engine += time.perf_counter() - t
+            engine_log.extend([("exit", now)] * (engine.exit_count - before_exit))
+            engine_log.extend([("entry", now)] * (engine.rollsin - before_in))
+
+    same = sorted((k, t) for k, t, _ in legacy_log) == sorted(engine_log) \
+        and legacy.exit_count == engine.exit_count and legacy.workers == engine.workers
+    print(f"{n_objects:>4} objects | legacy {1e3 * t_legacy / n_frames:8.3f} ms/frame | "
+          f"engine {1e3 * t_engine / n_frames:8.3f} ms/frame | "
+          f"speedup {t_legacy / max(t_engine, 1e-9):5.1f}x | "
+          f"crossings {len(legacy_log):5d} | identical {same}")
+    return same
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--device", default="cuda:0" if torch is not None and torch.cuda.is_available() else "cpu")
+    args = parser.parse_args()
+    print(f"Counting micro-benchmark ({args.frames} frames, boxes on "
+          f"{args.device if torch is not None else 'numpy'})")
+    ok = all([run_case(n, args.frames, args.device) for n in (5, 50, 500)])
+    if not ok:
+        raise SystemExit("engine and legacy crossing decisions differ")
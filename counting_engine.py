@@ -0,0 +1,68 @@
+"""
+Vectorized counting helpers for WorkerCounter.
+
+All boxes of a frame are pulled off the device in one bulk transfer and the
+counting predicates (class/area filter, hysteresis side test, gate, speed,
+travel, cooldown) are evaluated as NumPy array operations. Only the rare
+candidate crossings fall back to a short Python loop, because switch
+suppression depends on crossings registered earlier in the same frame.
+"""
+import numpy as np
+
+
+EMPTY_XYXY = np.zeros((0, 4), dtype=np.float64)
+EMPTY_INT = np.zeros((0,), dtype=np.int64)
+EMPTY_FLOAT = np.zeros((0,), dtype=np.float64)
+
+
+def empty_detections():
+    return EMPTY_XYXY, EMPTY_INT, EMPTY_FLOAT, EMPTY_INT
+
+
+def boxes_to_arrays(boxes):
+    """
+    Convert an ultralytics Boxes object into (xyxy, ids, conf, cls) NumPy arrays
+    with a single device->host copy.
+
+    Tracked boxes carry 7 columns: x1, y1, x2, y2, id, conf, cls.
+    Coordinates are widened to float64 so the arithmetic matches the old
+    per-box `.tolist()` path bit for bit.
+    """
+    if boxes is None or boxes.id is None or len(boxes) == 0:
+        return empty_detections()
+    data = boxes.data
+    if hasattr(data, "cpu"):
+        data = data.cpu().numpy()
+    data = np.asarray(data, dtype=np.float64)
+    xyxy = data[:, :4]
+    ids = data[:, -3].astype(np.int64)
+    conf = data[:, -2]
+    cls = data[:, -1].astype(np.int64)
+    return xyxy, ids, conf, cls
+
+
+def box_geometry(xyxy):
+    """Return (area, cx, cy, w, h) arrays, using the same formulas as the scalar path."""
+    x1, y1, x2, y2 = xyxy[:, 0], xyxy[:, 1], xyxy[:, 2], xyxy[:, 3]
+    w = x2 - x1
+    h = y2 - y1
+    area = np.abs(h) * np.abs(w)
+    cx = 0.5 * (x1 + x2)
+    cy = 0.5 * (y1 + y2)
+    return area, cx, cy, w, h
+
+
+def line_sides(cy, line_y, hysteresis):
+    """Vectorized _line_sides: -1 above, +1 below, 0 inside the hysteresis band."""
+    sides = np.zeros(cy.shape, dtype=np.int8)
+    sides[cy <= line_y - hysteresis] = -1
+    sides[cy >= line_y + hysteresis] = 1
+    return sides
+
+
+def first_seen(values):
+    """Unique values of a 1-D array with the index of their first occurrence, in order."""
+    seen = {}
+    for i, v in enumerate(values.tolist()):
+        seen.setdefault(v, i)  # a dict keeps first-insertion order
+    return [(i, v) for v, i in seen.items()]
@@ -0,0 +1,66 @@
+"""
+Adaptive detector stride for WorkerCounter.
+
+YOLO runs on every k-th frame; on the frames in between the caller carries
+tracks forward with a constant-velocity prediction (TrackStore.predict).
+k is picked per frame:
+  - 1 (full rate) while any live track is, or will be within the current
+    stride, inside the hysteresis band plus NEAR_PX around line_y
+  - otherwise ceil(detector latency / LATENCY_BUDGET), at least FAR_MIN and
+    at most MAX, where the latency is a rolling (EWMA) detector time
+"""
+import math
+
+import numpy as np
+
+
+class StrideController:
+    """Decides per frame whether the detector runs or tracks are propagated."""
+
+    def __init__(self, max_stride=4, far_min=2, latency_budget=0.030, near_px=40, ewma=0.2):
+        self.MAX = max_stride
+        self.FAR_MIN = far_min
+        self.LATENCY_BUDGET = latency_budget  # s of detector time we can afford per frame
+        self.NEAR_PX = near_px
+        self.EWMA = ewma
+
+        self.latency = None     # rolling detector latency (s)
+        self.frame_dt = None    # rolling time between frames (s)
+        self.k = 1
+        self._since_detect = 0
+        self._last_now = None
+        self.stats = {"frames": 0, "detected": 0, "propagated": 0}
+
+    def _smooth(self, old, new):
+        return new if old is None else (1.0 - self.EWMA) * old + self.EWMA * new
+
+    def note_latency(self, seconds):
+        self.latency = self._smooth(self.latency, seconds)
+
+    def choose(self, cy, vy, line_y, hysteresis):
+        """Stride k for the live tracks' predicted centers cy and vertical speeds vy (px/s)."""
+        if len(cy):
+            horizon = (self.frame_dt or 0.0) * self.MAX
+            reach = hysteresis + self.NEAR_PX + np.abs(vy) * horizon
+            if np.any(np.abs(cy - line_y) <= reach):
+                return 1
+        if not self.latency:
+            return 1  # no measurement yet
+        k = math.ceil(self.latency / self.LATENCY_BUDGET)
+        return int(min(self.MAX, max(self.FAR_MIN, k)))
+
+    def should_detect(self, now, cy, vy, line_y, hysteresis):
+        """Advance one frame; True if the detector should run on it."""
+        self.stats["frames"] += 1
+        if self._last_now is not None and now > self._last_now:
+            self.frame_dt = self._smooth(self.frame_dt, now - self._last_now)
+        self._last_now = now
+
+        self.k = self.choose(cy, vy, line_y, hysteresis)
+        self._since_detect += 1
+        if self._since_detect < self.k:
+            self.stats["propagated"] += 1
+            return False
+        self._since_detect = 0
+        self.stats["detected"] += 1
+        return True
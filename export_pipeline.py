@@ -0,0 +1,379 @@
+"""
+Offline export matrix for the worker detector, with a CPU latency / memory /
+accuracy report to pick the artifact WorkerCounter should run.
+
+From one trained .pt this builds:
+
+  pt                 the checkpoint itself (baseline)
+  onnx_fp32          ONNX, dynamic input
+  onnx_fp16          fp16 weights, fp32 I/O (needs onnxconverter-common)
+  onnx_int8_dynamic  onnxruntime dynamic quantization (weights only)
+  onnx_int8_static   onnxruntime static QDQ quantization, calibrated
+  openvino_fp32      OpenVINO IR, dynamic input
+  openvino_int8      OpenVINO IR quantized with NNCF, calibrated
+
+Calibration uses the frames create_dataset.py samples from the recordings
+(dataset/frame_*.jpg), resized to the 640x360 processing frame and laid out
+exactly as the lean path feeds them (FusedPreprocessor, 640x384). The detect
+head's box decode is kept in float for both INT8 variants; quantizing it costs
+most of the accuracy.
+
+Every export has a dynamic input, so image size is a runtime choice rather
+than another artifact: each artifact is reported at every --imgsz. Latency is
+the raw forward pass at the rectangular input for that width (640 -> 384x640,
+what WorkerCounter runs), mAP comes from model.val() on the train_yolo.py
+dataset's val split at that size, and memory is the peak RSS of loading and
+running the artifact in a fresh process. --clip adds the exit count of a
+full-frame replay (roi_benchmark.run_case) so a faster artifact that changes
+the count stands out.
+
+The recommendation is the fastest row whose mAP50-95 is within --max-map-drop
+of the .pt at the same size (and whose count matches, with --clip).
+--promote copies it to the <stem>.onnx / <stem>_openvino_model name that
+backends.py probes; the changed artifact invalidates the cached choice.
+
+    python export_pipeline.py --model textile_model_worker1.pt
+        --data ./textile_labelling.v1i.yolov11/data.yaml --calib dataset
+        [--imgsz 640 480 320] [--clip recorded.mp4] [--promote]
+
+TensorRT engines are built on the Jetson itself (tensor_rt_exporter.py).
+"""
+import argparse
+import glob
+import json
+import math
+import multiprocessing as mp
+import os
+import resource
+import shutil
+import time
+
+import cv2
+import numpy as np
+
+import backends
+from preprocess import FusedPreprocessor
+
+
+FRAME_HW = (360, 640)  # WorkerCounter.TARGET_H / TARGET_W
+VARIANTS = ("pt", "onnx_fp32", "onnx_fp16", "onnx_int8_dynamic", "onnx_int8_static",
+            "openvino_fp32", "openvino_int8")
+REPORT_NAME = "export_report.json"
+
+
+def input_hw(width, stride=32):
+    """Model input for the processing frame scaled to width, rounded up to stride."""
+    return (math.ceil(width * FRAME_HW[0] / FRAME_HW[1] / stride) * stride, width)
+
+
+def load_calibration(calib_dir, max_frames):
+    """Up to max_frames calibration frames, evenly sampled, at the processing size."""
+    paths = sorted(glob.glob(os.path.join(calib_dir, "*.jpg")) + glob.glob(os.path.join(calib_dir, "*.png")))
+    if not paths:
+        raise IOError(f"No calibration frames in {calib_dir} (run create_dataset.py)")
+    if len(paths) > max_frames:
+        paths = [paths[i] for i in np.linspace(0, len(paths) - 1, max_frames).astype(int)]
+    frames = []
+    for path in paths:
+        frame = cv2.imread(path)
+        if frame is not None:
+            frames.append(cv2.resize(frame, FRAME_HW[::-1]))
+    return frames
+
+
+def calibration_inputs(frames):
+    """Yield each frame as the (1, 3, 384, 640) float32 array the lean path builds."""
+    pre = FusedPreprocessor(FRAME_HW + (3,))
+    for frame in frames:
+        yield pre(frame).numpy().copy()
+
+
+def _size_mb(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) / 1e6
+    return os.path.getsize(path) / 1e6
+
+
+def _rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+
+def _head_index(pt_path):
+    from ultralytics import YOLO
+
+    return len(YOLO(pt_path).model.model) - 1
+
+
+def _copy_onnx_metadata(src, dst):
+    """Carry ultralytics' names/stride/imgsz metadata over to a derived model."""
+    import onnx
+
+    meta = {p.key: p.value for p in onnx.load(src, load_external_data=False).metadata_props}
+    model = onnx.load(dst)
+    del model.metadata_props[:]
+    for key, value in meta.items():
+        model.metadata_props.add(key=key, value=value)
+    onnx.save(model, dst)
+
+
+def export_onnx(work_pt, out_dir, stem):
+    from ultralytics import YOLO
+
+    path = YOLO(work_pt).export(format="onnx", dynamic=True, simplify=True, device="cpu")
+    dst = os.path.join(out_dir, f"{stem}_fp32.onnx")
+    os.replace(path, dst)
+    return dst
+
+
+def export_onnx_fp16(fp32, out_dir, stem):
+    import onnx
+    from onnxconverter_common import float16
+
+    dst = os.path.join(out_dir, f"{stem}_fp16.onnx")
+    onnx.save(float16.convert_float_to_float16(onnx.load(fp32), keep_io_types=True), dst)
+    _copy_onnx_metadata(fp32, dst)
+    return dst
+
+
+def export_onnx_int8_dynamic(fp32, out_dir, stem):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    dst = os.path.join(out_dir, f"{stem}_int8_dynamic.onnx")
+    quantize_dynamic(fp32, dst, weight_type=QuantType.QUInt8)
+    _copy_onnx_metadata(fp32, dst)
+    return dst
+
+
+class _CalibrationReader:
+    """onnxruntime CalibrationDataReader over the calibration frames."""
+
+    def __init__(self, input_name, frames):
+        self.input_name = input_name
+        self._inputs = calibration_inputs(frames)
+
+    def get_next(self):
+        x = next(self._inputs, None)
+        return None if x is None else {self.input_name: x}
+
+
+def export_onnx_int8_static(fp32, out_dir, stem, frames, head):
+    import onnx
+    import onnxruntime
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+
+    # leave the head's box decode (everything outside its cv2/cv3 conv branches) in float
+    prefix = f"/model.{head}/"
+    exclude = [n.name for n in onnx.load(fp32).graph.node
+               if n.name.startswith(prefix) and not n.name.startswith((prefix + "cv2", prefix + "cv3"))]
+    input_name = onnxruntime.InferenceSession(fp32, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    dst = os.path.join(out_dir, f"{stem}_int8_static.onnx")
+    quantize_static(fp32, dst, _CalibrationReader(input_name, frames),
+                    quant_format=QuantFormat.QDQ, per_channel=True,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                    calibrate_method=CalibrationMethod.MinMax, nodes_to_exclude=exclude)
+    _copy_onnx_metadata(fp32, dst)
+    return dst
+
+
+def export_openvino(work_pt, out_dir, stem):
+    from ultralytics import YOLO
+
+    path = YOLO(work_pt).export(format="openvino", dynamic=True, half=False, device="cpu")
+    dst = os.path.join(out_dir, f"{stem}_fp32_openvino_model")
+    shutil.rmtree(dst, ignore_errors=True)
+    os.replace(path, dst)
+    return dst
+
+
+def export_openvino_int8(fp32_dir, out_dir, stem, frames, head):
+    import nncf
+    import openvino as ov
+
+    xml = glob.glob(os.path.join(fp32_dir, "*.xml"))[0]
+    model = ov.Core().read_model(xml)
+    # same head exclusions ultralytics uses for its own INT8 export
+    name = f"model.{head}"
+    ignored = nncf.IgnoredScope(patterns=[f".*{name}/.*/Add", f".*{name}/.*/Sub*", f".*{name}/.*/Mul*",
+                                          f".*{name}/.*/Div*", f".*{name}\\.dfl.*"],
+                                types=["Sigmoid"])
+    quantized = nncf.quantize(model, nncf.Dataset(list(calibration_inputs(frames))),
+                              preset=nncf.QuantizationPreset.MIXED, subset_size=len(frames),
+                              ignored_scope=ignored)
+    dst = os.path.join(out_dir, f"{stem}_int8_openvino_model")
+    shutil.rmtree(dst, ignore_errors=True)
+    os.makedirs(dst)
+    ov.save_model(quantized, os.path.join(dst, os.path.basename(xml)), compress_to_fp16=False)
+    for f in os.listdir(fp32_dir):
+        if f.endswith(".yaml"):
+            shutil.copy(os.path.join(fp32_dir, f), dst)  # ultralytics metadata
+    return dst
+
+
+def build(model_path, out_dir, frames, variants):
+    """{variant: artifact path} for every variant that exported; failures are printed and skipped."""
+    os.makedirs(out_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    # ultralytics writes exports next to the weights; export from a copy so the
+    # deployed <stem>.onnx / <stem>_openvino_model are never overwritten
+    work_pt = os.path.join(out_dir, stem + ".pt")
+    shutil.copy(model_path, work_pt)
+    head = _head_index(model_path)
+
+    steps = (
+        ("onnx_fp32", None, lambda: export_onnx(work_pt, out_dir, stem)),
+        ("onnx_fp16", "onnx_fp32", lambda: export_onnx_fp16(built["onnx_fp32"], out_dir, stem)),
+        ("onnx_int8_dynamic", "onnx_fp32", lambda: export_onnx_int8_dynamic(built["onnx_fp32"], out_dir, stem)),
+        ("onnx_int8_static", "onnx_fp32",
+         lambda: export_onnx_int8_static(built["onnx_fp32"], out_dir, stem, frames, head)),
+        ("openvino_fp32", None, lambda: export_openvino(work_pt, out_dir, stem)),
+        ("openvino_int8", "openvino_fp32",
+         lambda: export_openvino_int8(built["openvino_fp32"], out_dir, stem, frames, head)),
+    )
+    wanted = set(variants) | {needs for variant, needs, _ in steps if variant in variants and needs}
+    built = {"pt": model_path}
+    for variant, needs, export in steps:
+        if variant not in wanted:
+            continue
+        if needs and needs not in built:
+            print(f"  {variant:18s} skipped ({needs} not built)")
+            continue
+        t0 = time.perf_counter()
+        try:
+            built[variant] = export()
+        except Exception as e:
+            print(f"  {variant:18s} failed: {e}")
+            continue
+        print(f"  {variant:18s} {time.perf_counter() - t0:6.1f} s  {built[variant]}")
+    return {v: p for v, p in built.items() if v in variants}
+
+
+def _evaluate(variant, path, width, data, runs, clip):
+    """Child-process measurement of one artifact at one size."""
+    import contextlib
+    import io
+
+    from ultralytics import YOLO
+
+    hw = input_hw(width)
+    row = {"variant": variant, "path": path, "imgsz": width, "input_hw": list(hw), "size_mb": round(_size_mb(path), 2)}
+    base = _rss_mb()
+    timed = backends.probe({variant: path}, "cpu", False, hw, runs=runs).get(variant)
+    row["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 / 1e6 - base, 1)
+    if timed is None:
+        row["error"] = "failed to run"
+        return row
+    row["ms"], row["input_hw"] = timed["ms"], timed["input_hw"]
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            metrics = YOLO(path, task="detect").val(data=data, imgsz=width, batch=1, device="cpu",
+                                                    split="val", plots=False, verbose=False)
+        row["map50"], row["map50_95"] = round(float(metrics.box.map50), 4), round(float(metrics.box.map), 4)
+    except Exception as e:
+        row["error"] = f"val: {e}"
+
+    if clip:
+        from roi_benchmark import load_clip, make_counter, run_case
+
+        clip_path, cls_id, conf, line_offset = clip
+        wc = make_counter(path, cls_id, conf, False, "cpu", None)
+        frames, stamps = load_clip(clip_path, wc.TARGET_W, wc.TARGET_H)
+        row["exits"] = run_case(variant, wc, frames, stamps, int(wc.TARGET_H / 2 - line_offset))[0]
+    return row
+
+
+def evaluate(artifacts, sizes, data, runs=50, clip=None):
+    """One report row per (artifact, imgsz), each measured in a fresh process."""
+    ctx = mp.get_context("spawn")
+    rows = []
+    with ctx.Pool(1, maxtasksperchild=1) as pool:
+        for variant, path in artifacts.items():
+            for i, width in enumerate(sizes):
+                # the clip replay runs model.track() at its default size; once per artifact is enough
+                row = pool.apply(_evaluate, (variant, path, width, data, runs, clip if i == 0 else None))
+                rows.append(row)
+                print(f"  {variant:18s} {width:4d}  {row.get('ms', '-'):>8} ms  {row['peak_rss_mb']:7.1f} MB  "
+                      f"mAP50-95 {row.get('map50_95', '-')}  {row.get('error', '')}")
+    return rows
+
+
+def recommend(rows, max_map_drop):
+    """Fastest row within max_map_drop mAP50-95 of the .pt at the same size (and, if measured, the same count)."""
+    base = {r["imgsz"]: r for r in rows if r["variant"] == "pt" and "map50_95" in r}
+    base_exits = next((r["exits"] for r in rows if r["variant"] == "pt" and "exits" in r), None)
+    exits = {r["variant"]: r["exits"] for r in rows if "exits" in r}
+    ok = [r for r in rows
+          if "ms" in r and "map50_95" in r and r["imgsz"] in base
+          and r["map50_95"] >= base[r["imgsz"]]["map50_95"] - max_map_drop
+          and (base_exits is None or exits.get(r["variant"]) == base_exits)]
+    return min(ok, key=lambda r: r["ms"]) if ok else None
+
+
+def promote(row, model_path):
+    """Install row's artifact under the name backends.artifacts() looks for."""
+    stem = os.path.splitext(model_path)[0]
+    if row["variant"].startswith("onnx"):
+        dst = stem + ".onnx"
+        shutil.copy(row["path"], dst)
+    elif row["variant"].startswith("openvino"):
+        dst = stem + "_openvino_model"
+        shutil.rmtree(dst, ignore_errors=True)
+        shutil.copytree(row["path"], dst)
+    else:
+        return None
+    return dst
+
+
+def print_report(rows):
+    print(f"{'variant':18s} {'imgsz':>5s} {'ms':>8s} {'RSS MB':>7s} {'size MB':>7s} "
+          f"{'mAP50':>6s} {'mAP50-95':>8s} {'exits':>5s}")
+    for r in rows:
+        print(f"{r['variant']:18s} {r['imgsz']:5d} {r.get('ms', '-'):>8} {r['peak_rss_mb']:7.1f} {r['size_mb']:7.2f} "
+              f"{r.get('map50', '-'):>6} {r.get('map50_95', '-'):>8} {r.get('exits', ''):>5}"
+              + (f"  {r['error']}" if "error" in r else ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", required=True, help="trained .pt")
+    parser.add_argument("--data", required=True, help="dataset yaml used by train_yolo.py (val split)")
+    parser.add_argument("--calib", default="dataset", help="frames from create_dataset.py")
+    parser.add_argument("--calib-frames", type=int, default=200)
+    parser.add_argument("--imgsz", type=int, nargs="+", default=[640, 480, 320], help="input widths to report")
+    parser.add_argument("--variants", nargs="+", default=list(VARIANTS), choices=VARIANTS)
+    parser.add_argument("--out", default="exports")
+    parser.add_argument("--runs", type=int, default=50, help="timed forward passes per row")
+    parser.add_argument("--clip", default=None, help="recorded clip for the count check")
+    parser.add_argument("--cls", type=int, default=1)
+    parser.add_argument("--conf", type=float, default=0.7)
+    parser.add_argument("--line-offset", type=int, default=60)
+    parser.add_argument("--max-map-drop", type=float, default=0.01)
+    parser.add_argument("--promote", action="store_true", help="install the recommended artifact for backends.py")
+    args = parser.parse_args()
+
+    if not args.model.endswith(".pt"):
+        raise ValueError("--model must be the trained .pt")
+    variants = ["pt"] + [v for v in args.variants if v != "pt"]
+    frames = load_calibration(args.calib, args.calib_frames)
+    print(f"Exporting {args.model} ({len(frames)} calibration frames) -> {args.out}")
+    artifacts = build(args.model, args.out, frames, variants)
+
+    print(f"Evaluating {len(artifacts)} artifacts at imgsz {args.imgsz} on CPU ...")
+    clip = (args.clip, args.cls, args.conf, args.line_offset) if args.clip else None
+    rows = evaluate(artifacts, args.imgsz, args.data, args.runs, clip)
+    print_report(rows)
+
+    best = recommend(rows, args.max_map_drop)
+    report = {"model": args.model, "data": args.data, "calibration_frames": len(frames),
+              "max_map_drop": args.max_map_drop, "rows": rows, "recommended": best, "created_at": time.time()}
+    with open(os.path.join(args.out, REPORT_NAME), "w") as f:
+        json.dump(report, f, indent=2)
+    if best is None:
+        print("No artifact stays within the accuracy budget; keep the .pt")
+    else:
+        print(f"Recommended: {best['variant']} at imgsz {best['imgsz']} ({best['ms']} ms/forward, "
+              f"mAP50-95 {best['map50_95']})")
+        if args.promote:
+            dst = promote(best, args.model)
+            print(f"Installed {dst}" if dst else "Recommended artifact is the .pt; nothing to install")
@@ -0,0 +1,100 @@
+"""
+Small pool of preallocated, fixed-shape frame buffers shared by the capture
+thread and the inference loop.
+
+The reader resizes straight into a free slot (cv2.resize(..., dst=slot)) and
+publishes its index; the consumer takes a published slot, works on it in place
+and releases it.
+
+  latest   (live streams): only the newest published frame is kept; an untaken
+           older frame goes straight back to the pool. With 3 slots the writer
+           always has a free buffer (one held by the consumer, one "latest").
+  lossless (file replay):  published frames queue up in order and the writer
+           blocks in acquire_write() while every slot is in use, so each frame
+           is processed exactly once and the reader never runs ahead.
+"""
+import threading
+from collections import deque
+
+import numpy as np
+
+
+class FrameRing:
+    """Fixed-shape frame buffers handed between threads by slot index."""
+
+    def __init__(self, shape, slots=3, dtype=np.uint8, lossless=False):
+        if slots < (2 if lossless else 3):
+            raise ValueError("FrameRing needs at least 3 slots (2 when lossless)")
+        self.buffers = [np.zeros(shape, dtype=dtype) for _ in range(slots)]
+        self.shape = tuple(shape)
+        self.lossless = lossless
+        self._cond = threading.Condition()
+        self._free = list(range(slots))
+        self._ready = deque()   # (idx, ts, seq) published but not yet taken, oldest first
+        self._seq = 0
+        self.closed = False
+        self.published = 0
+        self.overwritten = 0    # published slots replaced before the consumer took them
+
+    def acquire_write(self, timeout=None):
+        """
+        Index of a free buffer for the writer to fill. In lossless mode this
+        blocks until the consumer releases one; returns None on timeout or close.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._free or self.closed, timeout):
+                return None
+            if self.closed:
+                return None
+            return self._free.pop()
+
+    def publish(self, idx, ts):
+        """
+        Hand buffer idx to the consumer. In latest mode an untaken older frame
+        goes back to the pool; returns True when that happened (it was dropped).
+        """
+        with self._cond:
+            dropped = False
+            if not self.lossless and self._ready:
+                self._free.append(self._ready.popleft()[0])
+                self.overwritten += 1
+                dropped = True
+            self._seq += 1
+            self._ready.append((idx, ts, self._seq))
+            self.published += 1
+            self._cond.notify_all()
+            return dropped
+
+    def cancel_write(self, idx):
+        """Return a buffer obtained with acquire_write without publishing it."""
+        self.release(idx)
+
+    def acquire_read(self, timeout=0):
+        """
+        Take the next frame as (idx, ts, seq): the newest one in latest mode, the
+        oldest queued one in lossless mode. Waits up to timeout seconds, then
+        returns None.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._ready or self.closed, timeout):
+                return None
+            if not self._ready:
+                return None
+            return self._ready.popleft()
+
+    def release(self, idx):
+        with self._cond:
+            self._free.append(idx)
+            self._cond.notify_all()
+
+    def close(self):
+        """No more frames will be published; wakes blocked readers and writers."""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    @property
+    def drained(self):
+        """Closed and every published frame has been taken."""
+        with self._cond:
+            return self.closed and not self._ready
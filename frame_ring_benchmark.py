@@ -0,0 +1,97 @@
+"""
+Benchmark: capture->inference hand-off per frame, old path vs FrameRing.
+
+  old:  reader stores the full-res frame, run() copies it under the lock
+        (self._last_frame.copy()) and cv2.resize allocates a new 640x360 frame
+  ring: reader resizes straight into a preallocated slot (cv2.resize(..., dst=...)),
+        run() gets the slot index
+
+Reports time, peak NumPy/OpenCV allocation (tracemalloc) and estimated memory
+traffic per frame at the main-stream resolution.
+
+    python frame_ring_benchmark.py [--width 2560 --height 1440] [--frames 300]
+"""
+import argparse
+import threading
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from frame_ring import FrameRing
+
+
+TARGET_W, TARGET_H = 640, 360
+
+
+def old_path(frames, lock):
+    state = {"frame": None}
+    for frame in frames:
+        # reader thread side
+        with lock:
+            state["frame"] = frame
+        # run() side
+        with lock:
+            f = state["frame"].copy()
+        f = cv2.resize(f, (TARGET_W, TARGET_H))
+        yield f
+
+
+def ring_path(frames, ring):
+    for frame in frames:
+        # reader thread side
+        idx = ring.acquire_write()
+        cv2.resize(frame, (TARGET_W, TARGET_H), dst=ring.buffers[idx])
+        ring.publish(idx, 0.0)
+        # run() side
+        idx, _ts, _seq = ring.acquire_read()
+        f = ring.buffers[idx]
+        ring.release(idx)
+        yield f
+
+
+def measure(name, gen, n_frames, bytes_moved, sample_frames=30):
+    # timing pass
+    t = time.perf_counter()
+    for _ in gen():
+        pass
+    dt = (time.perf_counter() - t) / n_frames
+
+    # allocation pass: peak bytes allocated while handing over one frame
+    tracemalloc.start()
+    it = gen()
+    peaks = []
+    for _ in range(min(sample_frames, n_frames)):
+        f = None  # drop our reference to the previous frame first
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        f = next(it)
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    print(f"{name:5s} | {1e3 * dt:7.3f} ms/frame | "
+          f"{np.median(peaks) / 1e6:7.2f} MB allocated/frame | "
+          f"{bytes_moved / 1e6:7.2f} MB moved/frame | "
+          f"{bytes_moved / dt / 1e9:6.2f} GB/s effective")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--width", type=int, default=2560)
+    parser.add_argument("--height", type=int, default=1440)
+    parser.add_argument("--frames", type=int, default=300)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 255, (args.height, args.width, 3), dtype=np.uint8) for _ in range(4)]
+    frames = [frames[i % 4] for i in range(args.frames)]
+    src = args.width * args.height * 3
+    dst = TARGET_W * TARGET_H * 3
+
+    lock = threading.Lock()
+    ring = FrameRing((TARGET_H, TARGET_W, 3), slots=3)
+    print(f"Hand-off benchmark: {args.width}x{args.height} -> {TARGET_W}x{TARGET_H}, {args.frames} frames")
+    # copy reads+writes the full frame, resize reads it again and writes the small one
+    measure("old", lambda: old_path(frames, lock), args.frames, 3 * src + dst)
+    # resize reads the full frame once and writes into the slot
+    measure("ring", lambda: ring_path(frames, ring), args.frames, src + dst)
@@ -1,18 +1,23 @@
-from collections import defaultdict, deque
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import torch 
 from ultralytics import YOLO
-from yoloer import YOLOER
+from yoloer import DETECTION_DTYPE, get_detector
+from counting_engine import boxes_to_arrays
+from pickup_engine import PickupEngine
+from inference_server import InferenceClient, default_input_hw
+from tracking import create_tracker
 import time 
 import cv2
 
 class WorkerCounter:
     # ... your existing __init__ ...
-    def __init__(self,model_path,video_path,conf_threshold=0.6,cls_id_to_count=1,device=0,half=True):
+    def __init__(self,model_path,video_path,conf_threshold=0.6,cls_id_to_count=1,device=0,half=True,
+                 hand_backend=None,hand_target=None,parallel_hands=True,hand_roi=False,inference_socket=None):
         self.CONF_THRESHOLD = conf_threshold    
-        self.track_history = defaultdict(lambda: deque(maxlen=8))  # (t, cx, cy, w, h)
         self.pickups = 0
-        self.picked_ids = set()
         self.MODEL_PATH=model_path
         self.FPS_UPDATE_INTERVAL = 10
         self.HALF=half
@@ -20,20 +25,52 @@ class WorkerCounter:
         self.TARGET_W, self.TARGET_H = 640, 360 
         self.VIDEO_PATH=video_path
         self.frame_count=0
-        # thresholds (tune for your video scale/FPS)
-        self.IoU_THRESH = 0.20
-        self.V_UP_THRESH = 60.0      # px/s upward (negative vy)
-        self.LIFT_PIXELS = 12        # min upward delta of bottom y
-        self.CONSEC_FRAMES = 3
-        self.OCC_FRAC = 0.15         # 15% area shrink
-        model=YOLO(self.MODEL_PATH,task="detect")
+        # With inference_socket the object model lives in inference_server.py (shared with the
+        # other apps on the box); detections come back over the socket and ByteTrack runs here
+        self.INFERENCE_SOCKET = inference_socket
+        self._inference_client = None
+        self._object_tracker = None
+        model=None if inference_socket else YOLO(self.MODEL_PATH,task="detect")
         self.fps=0 
         self.frame_count=0
         self.start_time=time.time()
         self.CLS_ID_TO_COUNT = cls_id_to_count
         self.DEVICE = f"cuda:{device}" if torch.cuda.is_available() and device >= 0 else "cpu"
         self.model = model
-        self.AREA_MIN, self.AREA_MAX = 100, 12000
+        # pickup rule and per-track state; thresholds (tune for your video scale/FPS) are
+        # its IOU_THRESH, V_UP_THRESH, LIFT_PIXELS, CONSEC_FRAMES, OCC_FRAC, AREA_MIN/AREA_MAX
+        self.pickup_engine = PickupEngine(iou_thresh=0.20, v_up_thresh=60.0, lift_pixels=12, consec_frames=3,
+                                          occ_frac=0.15, area_min=100, area_max=12000, ttl=3.0)
+
+        # Hand detector (OpenCV DNN, YOLOv4-tiny): loaded once through yoloer's registry.
+        # hand_backend/hand_target name an OpenCV DNN backend/target, e.g. "cuda"/"cuda_fp16"
+        # (see yoloer.BACKENDS/TARGETS); None keeps OpenCV's default (CPU)
+        self.HAND_CFG = "cross-hands-yolov4-tiny.cfg"
+        self.HAND_WEIGHTS = "cross-hands-yolov4-tiny.weights"
+        self.HAND_SIZE = 416         # int (square) or (w, h), e.g. (640, 352) to keep the 640x360 frame's shape
+        self.hand_detector = get_detector(self.HAND_CFG, self.HAND_WEIGHTS, ["hand"], size=self.HAND_SIZE,
+                                          backend=hand_backend, target=hand_target)
+        # ROI mode: detect hands only in padded square crops around the last frame's tracked
+        # target objects, all crops in one batch at HAND_ROI_SIZE; the full frame every
+        # HAND_HEARTBEAT frames, and when the crops would cost more than the full frame, cover
+        # most of it, or shrink a crop harder than the full-frame pass shrinks the frame
+        self.HAND_ROI_MODE = hand_roi
+        self.HAND_ROI_SIZE = 160      # crop network input (multiple of 32); its own Net, so sizes never reshape
+        self.HAND_ROI_PAD = 0.6       # padding on each side, as a fraction of the object's longer side
+        self.HAND_ROI_MIN = 96        # min crop side in frame px (a hand next to a small roll)
+        self.HAND_HEARTBEAT = 10      # frames; 0 = never run the full frame in ROI mode
+        self.HAND_ROI_MAX_COVER = 0.5  # crops covering more than this share of the frame: full frame
+        self.hand_roi_detector = None
+        if hand_roi:
+            self.hand_roi_detector = get_detector(self.HAND_CFG, self.HAND_WEIGHTS, ["hand"],
+                                                  size=self.HAND_ROI_SIZE, backend=hand_backend, target=hand_target)
+        self._hand_objects = np.zeros((0, 4))  # tracked object boxes of the last frame
+        self.hand_stats = {"full": 0, "roi": 0, "skipped": 0, "crops": 0}
+        # run the hand detector on a worker thread while the tracker runs (both release the GIL)
+        self.PARALLEL_HANDS = parallel_hands
+        self._hand_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hands") if parallel_hands else None
+        # per-frame seconds: hand detector, object tracker, whole pickup pipeline
+        self.timing = {"hands": deque(maxlen=1000), "tracker": deque(maxlen=1000), "frame": deque(maxlen=1000)}
                 
         # Video Capture Setup
         self.cap = cv2.VideoCapture(self.VIDEO_PATH)
@@ -43,100 +80,116 @@ class WorkerCounter:
 
 
     # ---------- OPTIONAL: plug your hand detector here ----------
-    def _detect_hands(self, frame):
+    def _detect_hands(self, frame, rects=None):
         """
-        Return list of hand boxes as [x1,y1,x2,y2]. 
-        Replace with MediaPipe/YOLO-hand/etc.
+        Return (hand boxes as an (M, 4) x1,y1,x2,y2 array, raw detections for _draw_hands).
+        rects: crops (see _hand_rois) to search instead of the full frame; [] skips detection.
+        Only reads frame, so it can run while the tracker uses the same frame.
         """
-        yolo_model = YOLOER("cross-hands-yolov4-tiny.cfg", "cross-hands-yolov4-tiny.weights", ["hand"])
-        width, height, inference_time, results = yolo_model.inference(frame)
-        hand_count= len(results)
-        hand_boxes = []
-        for detection in results[:hand_count]:
-            id, name, confidence, x, y, w, h = detection
-            hand_boxes.append([x, y, x + w, y + h])
-            cx = x + (w / 2)
-            cy = y + (h / 2)
-
-            # draw a bounding box rectangle and label on the image
-            color = (0, 255, 255)
-            cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
-            text = "%s (%s)" % (name, round(confidence, 2))
-            cv2.putText(frame, text, (x, y - 5), cv2.FONT_HERSHEY_SIMPLEX,
-                        0.5, color, 2)
-        return hand_boxes 
+        t0 = time.perf_counter()
+        if rects is None:
+            width, height, inference_time, results = self.hand_detector.inference(frame)
+        elif len(rects):
+            crops = [frame[y0:y1, x0:x1] for (x0, y0, x1, y1) in rects]
+            inference_time, per_crop = self.hand_roi_detector.inference_many(crops)
+            for r, (x0, y0, _x1, _y1) in zip(per_crop, rects):
+                r["x"] += x0
+                r["y"] += y0
+            results = np.concatenate(per_crop)
+        else:
+            results = np.zeros(0, dtype=DETECTION_DTYPE)
+        hand_boxes = np.stack([results["x"], results["y"], results["x"] + results["w"],
+                               results["y"] + results["h"]], axis=1)
+        self.timing["hands"].append(time.perf_counter() - t0)
+        return hand_boxes, results
 
     @staticmethod
-    def _iou(a, b):
-        ax1, ay1, ax2, ay2 = a
-        bx1, by1, bx2, by2 = b
-        inter_x1, inter_y1 = max(ax1, bx1), max(ay1, by1)
-        inter_x2, inter_y2 = min(ax2, bx2), min(ay2, by2)
-        iw, ih = max(0, inter_x2 - inter_x1), max(0, inter_y2 - inter_y1)
-        inter = iw * ih
-        a_area = max(0, (ax2 - ax1)) * max(0, (ay2 - ay1))
-        b_area = max(0, (bx2 - bx1)) * max(0, (by2 - by1))
-        union = a_area + b_area - inter + 1e-6
-        return inter / union
-
-    def _update_track_history(self, track_id, x1, y1, x2, y2, now_s):
-        cx, cy = 0.5*(x1+x2), 0.5*(y1+y2)
-        w, h = (x2-x1), (y2-y1)
-        self.track_history[track_id].append((now_s, cx, cy, w, h))
-
-    def _estimate_vel(self, track_id):
-        hist = self.track_history[track_id]
-        if len(hist) < 2:
-            return 0.0, 0.0
-        (t0, cx0, cy0, _, _), (t1, cx1, cy1, _, _) = hist[-2], hist[-1]
-        dt = max(1e-3, t1 - t0)
-        vx = (cx1 - cx0) / dt
-        vy = (cy1 - cy0) / dt
-        return vx, vy
-
-    def _area(self, box):
-        x1,y1,x2,y2 = box
-        return max(0, x2-x1) * max(0, y2-y1)
-
-    def _consecutive_contact(self, track_id, obj_box, recent_hands):
+    def _hand_rois(xyxy, shape, pad, min_side):
         """
-        Return True if IoU(obj, any hand) exceeds IoU_THRESH for >= CONSEC_FRAMES frames.
-        Maintain a short deque of bools per track.
+        Padded square crops (x0, y0, x1, y1) around object boxes, kept inside the
+        frame; overlapping crops are merged so no hand is searched twice.
         """
-        key = f"contact_{track_id}"
-        if not hasattr(self, "_contact_buf"):
-            self._contact_buf = defaultdict(lambda: deque(maxlen=self.CONSEC_FRAMES))
-        # check IoU with any recent hand box
-        touch = any(self._iou(obj_box, hb) >= self.IoU_THRESH for hb in recent_hands)
-        self._contact_buf[key].append(touch)
-        return len(self._contact_buf[key]) == self.CONSEC_FRAMES and all(self._contact_buf[key])
+        h, w = shape[:2]
+        side = np.maximum(np.maximum(xyxy[:, 2] - xyxy[:, 0], xyxy[:, 3] - xyxy[:, 1]) * (1 + 2 * pad), min_side)
+        cx, cy = 0.5 * (xyxy[:, 0] + xyxy[:, 2]), 0.5 * (xyxy[:, 1] + xyxy[:, 3])
+        rects = np.stack([cx - side / 2, cy - side / 2, cx + side / 2, cy + side / 2], axis=1).tolist()
+        merged = True
+        while merged and len(rects) > 1:
+            merged = False
+            for i in range(len(rects)):
+                for j in range(i + 1, len(rects)):
+                    a, b = rects[i], rects[j]
+                    if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                        x0, y0, x1, y1 = min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+                        s = max(x1 - x0, y1 - y0)  # keep it square: the crop net input is square
+                        mx, my = 0.5 * (x0 + x1), 0.5 * (y0 + y1)
+                        rects[i] = [mx - s / 2, my - s / 2, mx + s / 2, my + s / 2]
+                        del rects[j]
+                        merged = True
+                        break
+                if merged:
+                    break
+        out = []
+        for x0, y0, x1, y1 in rects:
+            # slide a crop at the border back inside rather than cutting it, so it stays square
+            s = int(round(x1 - x0))
+            x0, y0 = min(max(int(round(x0)), 0), max(0, w - s)), min(max(int(round(y0)), 0), max(0, h - s))
+            out.append((x0, y0, min(w, x0 + s), min(h, y0 + s)))
+        return out
 
-    def _lifted(self, track_id):
-        """
-        Check bottom-y lifted by >= LIFT_PIXELS over last window.
-        """
-        hist = self.track_history[track_id]
-        if len(hist) < self.CONSEC_FRAMES:
-            return False
-        # compare oldest vs newest
-        _, _, cy_old, _, h_old = hist[-self.CONSEC_FRAMES]
-        _, _, cy_new, _, h_new = hist[-1]
-        by_old = cy_old + 0.5*h_old
-        by_new = cy_new + 0.5*h_new
-        return (by_old - by_new) >= self.LIFT_PIXELS  # moved up
+    def _hand_regions(self, frame):
+        """Where to look for hands this frame: None = full frame, else a list of crops."""
+        stats = self.hand_stats
+        n = stats["full"] + stats["roi"] + stats["skipped"]
+        if not self.HAND_ROI_MODE or (self.HAND_HEARTBEAT and n % self.HAND_HEARTBEAT == 0):
+            stats["full"] += 1
+            return None
+        rects = self._hand_rois(self._hand_objects, frame.shape, self.HAND_ROI_PAD, self.HAND_ROI_MIN)
+        h, w = frame.shape[:2]
+        full_w, full_h = self.hand_detector.size
+        # a crop side above this reaches the crop net at a lower resolution than the full pass
+        max_side = self.HAND_ROI_SIZE / min(full_w / w, full_h / h)
+        sides = [max(x1 - x0, y1 - y0) for (x0, y0, x1, y1) in rects]
+        cover = sum((x1 - x0) * (y1 - y0) for (x0, y0, x1, y1) in rects) / float(w * h)
+        if (len(rects) * np.prod(self.hand_roi_detector.size) >= full_w * full_h
+                or any(side > max_side for side in sides) or cover > self.HAND_ROI_MAX_COVER):
+            stats["full"] += 1
+            return None
+        if rects:
+            stats["roi"] += 1
+            stats["crops"] += len(rects)
+        else:
+            stats["skipped"] += 1  # nothing tracked: no pickup to see until the next heartbeat
+        return rects
 
-    def _occluded(self, prev_area, curr_area):
-        if prev_area <= 0:
-            return False
-        return (prev_area - curr_area) / prev_area >= self.OCC_FRAC
+    def _draw_hands(self, frame, results):
+        for id, confidence, x, y, w, h in results.tolist():
+            # draw a bounding box rectangle and label on the image
+            color = (0, 255, 255)
+            cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+            text = "%s (%s)" % (self.hand_detector.label(id), round(confidence, 2))
+            cv2.putText(frame, text, (x, y - 5), cv2.FONT_HERSHEY_SIMPLEX,
+                        0.5, color, 2)
 
-    # -------- modify your _process_frame to call the above --------
-    def _process_frame(self, frame):
-        now_s = time.time()
-        # frame=cv2.resize(frame,(self.TARGET_W,self.TARGET_H))
-        #Frame is already resized in run()
-        hand_boxes = self._detect_hands(frame)  # fill this
+    def get_timing_stats(self):
+        """Mean / p95 ms per frame for the hand detector, the tracker and the whole pipeline."""
+        stats = {}
+        for name, samples in self.timing.items():
+            if samples:
+                ms = np.asarray(samples) * 1000.0
+                stats[name] = {"mean_ms": round(float(ms.mean()), 2), "p95_ms": round(float(np.percentile(ms, 95)), 2)}
+        return stats
 
+    def _track_objects(self, frame):
+        """Tracked objects as (xyxy, ids, conf, cls) arrays: model.track(), or the daemon + our own ByteTrack."""
+        if self.INFERENCE_SOCKET:
+            if self._inference_client is None:
+                self._inference_client = InferenceClient(self.MODEL_PATH, frame.shape, conf=self.CONF_THRESHOLD,
+                                                         input_hw=default_input_hw(self.MODEL_PATH),
+                                                         socket_path=self.INFERENCE_SOCKET)
+                self._object_tracker = create_tracker("bytetrack")
+            dets = self._inference_client.detect(frame)
+            return self._object_tracker.update(dets, frame.shape, frame)
         results = self.model.track(
             frame,
             conf=self.CONF_THRESHOLD,
@@ -146,63 +199,47 @@ class WorkerCounter:
             half=self.HALF,
             device=self.DEVICE
         )[0]
+        return boxes_to_arrays(results.boxes)
 
-        if results.boxes is not None and results.boxes.id is not None:
-            for box, track_id in zip(results.boxes, results.boxes.id):
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-                cls = int(box.cls.item())
-                track_id = int(track_id.item())
-
-                # only your object class
-                    # if cls != self.CLS_ID_TO_COUNT:
-                    #     if cls not in self.workers:
-                    #         self.workers[cls] = 0
-                    #     continue
-
-                # filter by area
-                area = abs(y2 - y1) * abs(x2 - x1)
-                if area < self.AREA_MIN or area > self.AREA_MAX:
-                    continue
-
-                obj_box = [x1,y1,x2,y2]
-                self._update_track_history(track_id, x1,y1,x2,y2, now_s)
-                vx, vy = self._estimate_vel(track_id)
-
-                # --- PICKUP RULE ---
-                # 1) sustained contact with any hand
-                contact_ok = self._consecutive_contact(track_id, obj_box, hand_boxes)
-                # 2) lifting motion & speed upwards
-                lift_ok = (vy < -self.V_UP_THRESH) and self._lifted(track_id)
-                # 3) optional occlusion cue (compare last two areas)
-                occl_ok = False
-                # if len(self.track_history[track_id]) >= 2:
-                #     # approximate areas
-                #     _, _, _, w0, h0 = self.track_history[track_id][-2]
-                #     _, _, _, w1, h1 = self.track_history[track_id][-1]
-                #     occl_ok = self._occluded(w0*h0, w1*h1)
-
-                """
-                The code above is currently bypassed to make occlusion optional."""
-
+    # -------- per-frame: hands + tracker, then the pickup rule --------
+    def _process_frame(self, frame):
+        now_s = time.time()
+        t_frame = time.perf_counter()
+        # frame=cv2.resize(frame,(self.TARGET_W,self.TARGET_H))
+        #Frame is already resized in run()
+        # the tracker runs alongside, so ROI crops follow the last frame's objects
+        hand_rects = self._hand_regions(frame)
+        if self._hand_pool is not None:
+            hands_job = self._hand_pool.submit(self._detect_hands, frame, hand_rects)
+        else:
+            hand_boxes, hand_results = self._detect_hands(frame, hand_rects)
 
-                if contact_ok and lift_ok: 
-                    cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
-                    cv2.putText(frame, f"ID {track_id}", (int(x1), int(y1) - 10),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-                    #The above code is being used to put bounding box
-                    if track_id not in self.picked_ids:
-                        self.picked_ids.add(track_id)
-                        self.pickups += 1
-                        print(f"[PICKUP] Track {track_id} picked up. Total pickups: {self.pickups}")
+        t_track = time.perf_counter()
+        xyxy, track_ids, _conf, cls = self._track_objects(frame)
+        self.timing["tracker"].append(time.perf_counter() - t_track)
+        if self._hand_pool is not None:
+            hand_boxes, hand_results = hands_job.result()
+        # drawn only now: the tracker and the hand detector were reading this frame
+        self._draw_hands(frame, hand_results)
 
-                # your existing line-cross logic
-                # cx, cy = int((x1+x2)/2), int((y1+y2)/2)
-                # if (line_y - 5 < cy < line_y + 5) and (track_id not in self.already_tracked):
-                #     self.exit_count += 1
-                #     self.already_tracked.add(track_id)
-                #     for cls_id in self.workers.keys():
-                #         self.workers[cls_id] += 1
+        if len(track_ids):
+            # hands are searched around the target class only (workers are tracked too)
+            self._hand_objects = xyxy[cls == self.CLS_ID_TO_COUNT]
+            # pickup rule: no class filter yet
+            ids, boxes, ok, new = self.pickup_engine.update(xyxy, track_ids, hand_boxes, now_s)
+            for (x1, y1, x2, y2), track_id in zip(boxes[ok].tolist(), ids[ok].tolist()):
+                cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
+                cv2.putText(frame, f"ID {track_id}", (int(x1), int(y1) - 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+            self.pickups = self.pickup_engine.pickups
+            for track_id in new.tolist():
+                print(f"[PICKUP] Track {track_id} picked up. Total pickups: {self.pickups}")
+        else:
+            self._hand_objects = np.zeros((0, 4))
+        # per-track state leaves with the track
+        self.pickup_engine.purge(now_s)
 
+        self.timing["frame"].append(time.perf_counter() - t_frame)
         return self.pickups
     def _update_and_display_info(self, frame):
         """Calculates FPS and draws text overlays on the frame."""
@@ -223,6 +260,10 @@ class WorkerCounter:
                     cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
     def _print_final_results(self):
         print(self.pickups)
+        if self.HAND_ROI_MODE:
+            print(f"Hand detection: {self.hand_stats}")
+        for name, t in self.get_timing_stats().items():
+            print(f"{name:>8}: {t['mean_ms']:.1f} ms/frame (p95 {t['p95_ms']:.1f} ms)")
     def run(self):
         print(f"Starting tracking on {self.VIDEO_PATH} with device: {self.DEVICE}")
         
@@ -255,11 +296,17 @@ class WorkerCounter:
                     
         finally:
             self.cap.release()
+            if self._hand_pool is not None:
+                self._hand_pool.shutdown(wait=True)
+            if self._inference_client is not None:
+                self._inference_client.close()
             cv2.destroyAllWindows()
             self._print_final_results()
 
 if __name__ == "__main__":
     model_path="textile_model_worker1.engine"  # replace with your model path
     video_path="short.mkv"  # replace with your video path
-    counter = WorkerCounter(model_path,video_path,conf_threshold=0.6,cls_id_to_count=1)
+    # INFERENCE_SOCKET: path of a running inference_server.py to use its resident model
+    counter = WorkerCounter(model_path,video_path,conf_threshold=0.6,cls_id_to_count=1,
+                            inference_socket=os.getenv("INFERENCE_SOCKET"))
     counter.run()
@@ -0,0 +1,63 @@
+"""
+Benchmark: hand detection on the full frame vs ROI crops around tracked objects.
+
+Runs hand_class.WorkerCounter over a clip twice, hands and tracker in series
+so the hand detector's own time is measured, and reports hand-detector
+ms/frame (mean and p95), how ROI frames split between crops, heartbeat
+full frames and skipped frames, and the pickup count of each run.
+
+    python hand_roi_benchmark.py --model textile_model_worker1.pt --clip short.mkv
+        [--frames 600] [--heartbeat 10] [--roi-size 160] [--hand-backend cuda --hand-target cuda_fp16]
+"""
+import argparse
+import contextlib
+import io
+
+import cv2
+
+from hand_class import WorkerCounter
+from yoloer import get_detector
+
+
+def run_case(name, args, roi):
+    wc = WorkerCounter(args.model, args.clip, conf_threshold=args.conf, device=args.device,
+                       hand_backend=args.hand_backend, hand_target=args.hand_target,
+                       parallel_hands=False, hand_roi=roi)
+    wc.HAND_HEARTBEAT = args.heartbeat
+    if roi and args.roi_size:
+        wc.HAND_ROI_SIZE = args.roi_size
+        wc.hand_roi_detector = get_detector(wc.HAND_CFG, wc.HAND_WEIGHTS, ["hand"], size=args.roi_size,
+                                            backend=args.hand_backend, target=args.hand_target)
+    n = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        while args.frames is None or n < args.frames:
+            ok, frame = wc.cap.read()
+            if not ok:
+                break
+            wc._process_frame(cv2.resize(frame, (wc.TARGET_W, wc.TARGET_H)))
+            n += 1
+    wc.cap.release()
+    if not n:
+        raise ValueError(f"No frames decoded from {args.clip}")
+    hands = wc.get_timing_stats()["hands"]
+    print(f"{name:>5}: hands {hands['mean_ms']:6.2f} ms/frame (p95 {hands['p95_ms']:6.2f} ms)  "
+          f"pickups {wc.pickups}  {wc.hand_stats}")
+    return hands["mean_ms"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", required=True)
+    parser.add_argument("--clip", required=True)
+    parser.add_argument("--frames", type=int, default=None)
+    parser.add_argument("--conf", type=float, default=0.6)
+    parser.add_argument("--device", type=int, default=0)
+    parser.add_argument("--heartbeat", type=int, default=10, help="full-frame hand detection every N frames")
+    parser.add_argument("--roi-size", type=int, default=None, help="crop network input (multiple of 32)")
+    parser.add_argument("--hand-backend", default=None)
+    parser.add_argument("--hand-target", default=None)
+    args = parser.parse_args()
+
+    full = run_case("full", args, False)
+    roi = run_case("roi", args, True)
+    print(f"ROI hand detection: {full / max(roi, 1e-9):.2f}x faster than full frame")
@@ -1,10 +1,27 @@
+import os
 import cv2
 from ultralytics import YOLO
+from ultralytics.utils import ops
 import torch
 import time
 import threading
 from collections import defaultdict, deque
 import random 
+import numpy as np
+
+from counting_engine import boxes_to_arrays, box_geometry, line_sides, first_seen, empty_detections
+from track_store import TrackStore, has_repeats, T, CY
+from frame_ring import FrameRing
+from capture_supervisor import CaptureSupervisor, open_stream
+from motion_gate import MotionGate
+from detector_stride import StrideController
+from box_ops import nms
+from tracking import create_tracker
+from preprocess import FusedPreprocessor
+from inference_server import InferenceClient
+from backends import resolve as resolve_backend
+from cascade import DetectorCascade, FastDetector
+from tiling import tile_grid, merge_tiles
 
 
 
@@ -25,9 +42,19 @@ class WorkerCounter:
                   cls_id_to_count=1,
                   conf_threshold=0.7,
                   half=True,
-                  device=0):
+                  device=0,
+                  reader_mode="auto",
+                  capture_factory=None,
+                  model=None,
+                  model_lock=None,
+                  inference_socket=None,
+                  backend=None,
+                  cascade_model=None,
+                  tracker="bytetrack",
+                  motion_gate=False,
+                  stride=False,
+                  lean=False):
         # Config
-        self.show=False
         self.MODEL_PATH = model_path
         self.VIDEO_PATH = video_path
         self.LINE_OFFSET = line_offset
@@ -35,7 +62,99 @@ class WorkerCounter:
         self.CONF_THRESHOLD = conf_threshold
         self.HALF = half
         self.DEVICE = device
+        # "latest":    cap.read() every frame, keep the newest
+        # "on_demand": grab() every frame, retrieve() only when run() wants one (opt-in:
+        #              with the FFmpeg backend grab() already decodes, so it only saves
+        #              the color conversion of dropped frames)
+        # "lossless":  every frame exactly once, reader blocks while run() is behind,
+        #              timestamps come from the stream PTS (file replay)
+        # "auto":      lossless for files, latest for live sources
+        self.READER_MODE = self._resolve_reader_mode(reader_mode, video_path)
+        self.LOSSLESS_SLOTS = 8       # frames buffered ahead of run() in lossless mode
+        # Live-stream supervision: reopen when no new frame for STALE_SEC,
+        # report a PTS jump above PTS_GAP_SEC as an outage
+        self.STALE_SEC = 5.0
+        self.PTS_GAP_SEC = 2.0
+        self.RECONNECT_BACKOFF_MAX = 30.0
+        # callable returning a cv2.VideoCapture-like object (tests plug in a fake source)
+        self._capture_factory = capture_factory
+
+        self._init_counting_state()
+        self.MOTION_GATE = motion_gate  # opt-in, see _init_counting_state
+        self.STRIDE_ENABLE = stride     # opt-in, see _init_counting_state
+
+        # YOLO/TensorRT setup
+        self.device = f"cuda:{device}" if torch.cuda.is_available() and device >= 0 else "cpu"
+        if self.device == "cpu":
+            self.DEVICE = "cpu"  # ultralytics reads an int as a CUDA index (-1: pick a GPU)
+        # backend: None loads model_path as given; "auto" probes the exported artifacts
+        # (TensorRT/OpenVINO/ONNX Runtime/PyTorch) once and caches the fastest, see backends.py
+        self.BACKEND = backend
+        backend_hw = None
+        if backend and not inference_socket and model is None:
+            self.BACKEND, self.MODEL_PATH, backend_hw = resolve_backend(
+                model_path, backend, device=self.device, half=self.HALF and self.device != "cpu",
+                input_hw=(384, 640))  # 640x360 padded to the stride
+        # With inference_socket the model lives in inference_server.py and only tracking
+        # and counting run here. Otherwise a YOLO instance can be shared between counters
+        # (multi_camera.py); calls into it are serialized by model_lock
+        self.INFERENCE_SOCKET = inference_socket
+        if inference_socket:
+            self.model = None
+        else:
+            self.model = model if model is not None else YOLO(self.MODEL_PATH, task='detect')
+        self._model_lock = model_lock if model_lock is not None else threading.Lock()
+        # Exported models (.engine/.onnx) have a fixed input shape; re-export them at
+        # imgsz=(384, 640) before turning the rectangular fused input on for them
+        self.FUSED_PREPROCESS = str(self.MODEL_PATH).endswith(".pt")
+        # Lean detect+track is opt-in (lean=True); the daemon only serves raw detections,
+        # so inference_socket needs it
+        self.LEAN_INFERENCE = bool(lean or inference_socket)
+        if self.LEAN_INFERENCE and not self.FUSED_PREPROCESS:
+            self.LEAN_INPUT_HW = (640, 640)  # fixed-shape export: frame padded to its square input
+        if backend_hw is not None:
+            # the probe found the input size this artifact runs at
+            self.FUSED_PREPROCESS = self.LEAN_INFERENCE = True
+            self.LEAN_INPUT_HW = backend_hw
+        # small model in front of the full one, see cascade.py (loaded by warmup())
+        self.CASCADE_MODEL = cascade_model
+        self.TRACKER = tracker
 
+        # FPS info
+        self.fps = 0.0
+        self.frame_count = 0
+        self.start_time = time.time()
+        # Video capture (live sources are wrapped in a reconnecting supervisor)
+        self._reader_stop = threading.Event()
+        if self.READER_MODE == "lossless":
+            self.cap = self._open_capture()
+            if not self.cap.isOpened():
+                raise IOError(f"Cannot open video file: {self.VIDEO_PATH}")
+        else:
+            try:
+                self.cap = CaptureSupervisor(self._open_capture,
+                                             stale_sec=self.STALE_SEC,
+                                             pts_gap_sec=self.PTS_GAP_SEC,
+                                             backoff_max=self.RECONNECT_BACKOFF_MAX,
+                                             stop_event=self._reader_stop)
+            except IOError:
+                raise IOError(f"Cannot open video file: {self.VIDEO_PATH}")
+        # Frame reader thread to avoid blocking/skipped frames on RTSP.
+        # It resizes straight into a preallocated ring slot and hands run() the slot index.
+        if self.READER_MODE == "lossless":
+            self._ring = FrameRing((self.TARGET_H, self.TARGET_W, 3), slots=self.LOSSLESS_SLOTS, lossless=True)
+        else:
+            self._ring = FrameRing((self.TARGET_H, self.TARGET_W, 3), slots=3)
+        self._tile_slots = [None] * len(self._ring.buffers)
+        self._frame_wanted = threading.Event()
+        self._frame_wanted.set()
+        self.reader_stats = {"grabbed": 0, "decoded": 0, "dropped": 0, "consumed": 0}
+        self._grab_thread = threading.Thread(target=self._frame_reader, daemon=True)
+        self._grab_thread.start()
+
+    def _init_counting_state(self):
+        """Counting knobs and per-track state (no model/capture needed, used by benchmarks too)."""
+        self.show = False             # draw boxes and open a window (run() only)
         # increase history so 60s window kept under higher rates
         self.recent_crossings_exit = deque(maxlen=4096)
         self.recent_crossings_entry = deque(maxlen=4096)
@@ -60,32 +179,97 @@ class WorkerCounter:
         self.SWITCH_SUPPRESS_T = 0.6  # suppress near-duplicate within T seconds
         self.SWITCH_SUPPRESS_R = 30   # and within R pixels
 
-        # YOLO/TensorRT setup
-        self.device = f"cuda:{device}" if torch.cuda.is_available() and device >= 0 else "cpu"
-        self.model = YOLO(self.MODEL_PATH, task='detect')
+        # Motion gate: skip the detector while the band around the line is static. Off by
+        # default (motion_gate=True to opt in): skipped frames never reach the detector and
+        # advance ByteTrack's clock by hand, so validate counts against a clip first
+        self.MOTION_GATE = False
+        self.MOTION_MARGIN = 40       # px above/below the hysteresis band that is watched
+        self.MOTION_HEARTBEAT = 15    # run a full detection at least every N frames
+        self._motion_gate = None
+
+        # Adaptive stride: detect every k-th frame, propagate tracks in between. Off by default
+        # (stride=True to opt in). Tradeoff: with tracks away from the line, up to
+        # max_stride-1 of every max_stride frames skip the detector (detector time per frame
+        # drops to about LATENCY_BUDGET), but crossings can then be counted on propagated,
+        # undetected positions, and a roll that speeds up or appears between detections is
+        # seen up to a stride late. Near the line it detects every frame.
+        self.STRIDE_ENABLE = False
+        self._stride = StrideController(max_stride=4, far_min=2, latency_budget=0.030, near_px=40)
+        self._live_ids = np.zeros((0,), dtype=np.int64)  # target tracks of the last real detection
+
+        # ROI mode: detect only on crops (a band around the line, or lanes), batched
+        # at a smaller input size; boxes are mapped back to the frame and tracked there
+        self.ROI_MODE = False
+        self.ROI_RECTS = None         # [(x0, y0, x1, y1), ...] lanes; None = full-width band around the line
+        self.ROI_MARGIN = 90          # px above/below the line for the default band (> half a roll's height)
+        self.ROI_IMGSZ = 320          # detector input size for the crops (.engine files must be exported to match)
+        self.ROI_NMS_IOU = 0.5        # merge duplicates where lanes overlap
+        self._array_tracker = None    # tracker fed with our own arrays (ROI / lean modes, TRACKER="iou")
+
+        # Fused preprocessing: frame -> stride-padded (640x384) normalized CHW tensor in a
+        # reused buffer, fed to model.track() instead of letting ultralytics letterbox to 640x640
+        self.FUSED_PREPROCESS = False
+        self._preprocessor = None
+
+        # Lean inference: fused input -> raw model output -> NMS -> NumPy filter -> ByteTrack,
+        # without ultralytics Results/Boxes objects. Needs the fused input (boxes in frame pixels).
+        self.LEAN_INFERENCE = False
+        self.LEAN_INPUT_HW = None     # None = stride-padded frame; (640, 640) for a square fixed-shape export
+        self.NMS_IOU = 0.7            # ultralytics predict defaults
+        self.MAX_DET = 300
+        self.TRACK_CLASSES = None     # class ids handed to the tracker; None = all
+        # "bytetrack" (ultralytics) or "iou" (iou_tracker.IOUTracker: IoU matrix + Hungarian
+        # assignment, lighter); "iou" detects without model.track() and tracks the arrays
+        self.TRACKER = "bytetrack"
+        self._backend = None
+        # Warm-up: detector passes on blank frames before the first real one, so engine
+        # deserialization, kernel selection and allocator growth don't land on live frames
+        self.WARMUP_RUNS = 2
+        self._warm = False
+        # BatchScheduler shared with other streams on the same model (multi_camera.py); None = infer alone
+        self._batcher = None
+        self.INFERENCE_SOCKET = None  # detections from inference_server.py instead of a local model
+        self._inference_client = None
+        # Daemon down or restarting: frames get no detections and the client is rebuilt with
+        # backoff (like CaptureSupervisor for the camera) instead of run() dying on the error
+        self.INFERENCE_BACKOFF_INITIAL = 1.0  # s before the first reconnect attempt
+        self.INFERENCE_BACKOFF_MAX = 30.0     # s cap for the doubling delay
+        self._daemon_ok = True
+        self._daemon_delay = 0.0
+        self._daemon_retry_at = 0.0
+        self.daemon_stats = {"outages": 0, "reconnects": 0}
+        self.STREAM_NAME = "cam0"
+
+        # Detector cascade: a small model (CASCADE_MODEL) on every detected frame, the full
+        # model only for unsure boxes or targets near the line; see cascade.py
+        self.CASCADE_MODEL = None
+        self.CASCADE_BAND = 30        # px beyond the hysteresis band that escalate to the full model
+        self.CASCADE_LOW_CONF = 0.25  # small-model boxes below this are ignored
+        self.CASCADE_SURE_CONF = 0.85  # small-model target boxes below this escalate...
+        self.CASCADE_UNCERTAIN_MARGIN = 60  # ...within this many px of the escalation band
+        self.CASCADE_CROPS = True     # band-only escalations run the full model on the ROI band crop (.pt only)
+        self._cascade = None
+
+        # Tile mode: detect on overlapping tiles of a full-resolution region of the source
+        # frame (small rolls vanish in the 640x360 downscale), merged across tiles and
+        # mapped back to processing-frame pixels; see tiling.py
+        self.TILE_MODE = False
+        self.TILE_REGION = None       # (x0, y0, x1, y1) in processing-frame pixels; None = whole frame
+        self.TILE_GRID = (3, 2)       # columns, rows
+        self.TILE_OVERLAP = 0.2       # share of a tile overlapping each neighbour (> a small roll's size)
+        self.TILE_IMGSZ = 640         # detector input per tile (.pt, or an export with dynamic batch)
+        self.TILE_MERGE_IOS = 0.6     # cross-tile merge: intersection over the smaller box
+        self._tile_slots = None       # per ring slot: (full-resolution region, (px, py, sx, sy) region ->
+                                      # processing-frame map), written only while the slot is held
+        self._tile_frame = None       # (region, map) of the frame being processed
+        self._tiles = None
+        self.tile_stats = {"frames": 0, "tiles": 0, "boxes_in": 0, "boxes_out": 0, "sec": 0.0}
 
         # Counters & per-track state
         self.exit_count = 0
+        self.rollsin = 0
         self.workers = {}  # non-counted classes (kept from your original idea)
-        self.track_state = {}  # tid -> dict with history, age, prev_side, last_cross_time, last_seen, last_gate_side
-         
-        # FPS info
-        self.fps = 0.0
-        self.frame_count = 0
-        self.start_time = time.time()
-        self.rollsin=0
-        # Video capture
-        self.cap = cv2.VideoCapture(self.VIDEO_PATH)
-        if not self.cap.isOpened():
-            raise IOError(f"Cannot open video file: {self.VIDEO_PATH}")
-        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-        # Frame reader thread to avoid blocking/skipped frames on RTSP
-        self._lock = threading.Lock()
-        self._last_frame = None
-        self._last_frame_ts = 0.0
-        self._reader_stop = threading.Event()
-        self._grab_thread = threading.Thread(target=self._frame_reader, daemon=True)
-        self._grab_thread.start()
+        self.track_state = TrackStore(capacity=256, hist_len=12, ttl=3.0)  # slot arrays: hist, age, prev_side, last_cross_time, last_seen, last_gate_side
 
     # --------------- Helpers for anti-double-count ----------------
 
@@ -100,68 +284,36 @@ class WorkerCounter:
         else:
             return 0
 
-    def _update_track_state(self, tid, cx, cy, w, h, now):
-        st = self.track_state.get(tid)
-        if st is None:
-            st = {
-                "hist": deque(maxlen=12),  # (t, cx, cy, w, h)
-                "age": 0,
-                "prev_side": None,
-                "last_cross_time": -1e9,
-                "last_gate_side": None,
-                "last_seen": now
-            }
-            self.track_state[tid] = st
-        st["hist"].append((now, cx, cy, w, h))
-        st["age"] += 1
-        st["last_seen"] = now
-        return st
+    def _update_track_state(self, ids, cx, cy, w, h, now):
+        """Append one history sample per track; returns the store slots."""
+        return self.track_state.update(ids, cx, cy, w, h, now)
 
     def _purge_old_tracks(self, now):
-        drop = [tid for tid, st in self.track_state.items() if now - st["last_seen"] > 3.0]
-        for tid in drop:
-            self.track_state.pop(tid, None)
-
-    def _estimate_vy(self, st):
-        if len(st["hist"]) < 2:
-            return 0.0
-        (t0, _, cy0, _, _), (t1, _, cy1, _, _) = st["hist"][-2], st["hist"][-1]
-        dt = max(1e-3, t1 - t0)
-        return (cy1 - cy0) / dt  # +ve is downward in image coords
-
-    def _vertical_travel(self, st):
-        if len(st["hist"]) < 2:
-            return 0.0
-        _, _, cy_old, _, _ = st["hist"][0]
-        _, _, cy_new, _, _ = st["hist"][-1]
-        return abs(cy_new - cy_old)
-
-    def _gate_pair_pass(self, st, side_now):
+        self.track_state.purge(now)
+
+    def _estimate_vy(self, newest, prev):
+        """vy from each track's two newest samples (0 for a single sample)."""
+        dt = np.maximum(1e-3, newest[:, T] - prev[:, T])
+        return (newest[:, CY] - prev[:, CY]) / dt  # +ve is downward in image coords
+
+    def _vertical_travel(self, newest, oldest):
+        return np.abs(newest[:, CY] - oldest[:, CY])
+
+    def _gate_pair_pass(self, slots, side_now, newest, prev):
         """
         Implicit two-gate logic using side transitions with hysteresis.
-        Returns True when we observe a side flip across the band within a short time.
+        True where we observe a side flip across the band within a short time.
         """
         if not self.GATE_ENABLE:
-            return True
+            return np.ones(len(slots), dtype=bool)
 
-        last_side = st.get("last_gate_side")
-        t_now = st["hist"][-1][0]
-
-        if side_now == 0:
-            return False
+        st = self.track_state
+        last_side = st.last_gate_side[slots]
 
         # When side flips sign (above->below or below->above), consider it a gate pass.
-        valid = False
-        if last_side is None:
-            st["last_gate_side"] = side_now
-        else:
-            if last_side != side_now:
-                # Check timing based on recent samples
-                t_prev = st["hist"][-2][0] if len(st["hist"]) >= 2 else t_now
-                if (t_now - t_prev) <= self.GATE_WINDOW:
-                    valid = True
-                st["last_gate_side"] = side_now
-
+        flipped = (side_now != 0) & (last_side != side_now)
+        valid = flipped & (last_side != 0) & ((newest[:, T] - prev[:, T]) <= self.GATE_WINDOW)
+        st.last_gate_side[slots[flipped]] = side_now[flipped]
         return valid
 
     def _switch_suppress(self, cx, cy, now):
@@ -172,20 +324,126 @@ class WorkerCounter:
                 return True
         return False
     
+    def _open_capture(self):
+        if self._capture_factory is not None:
+            return self._capture_factory()
+        return open_stream(self.VIDEO_PATH, self.STALE_SEC)
+
+    @property
+    def stream_ok(self):
+        """False while a live stream is stalled/reconnecting, or the inference daemon is unreachable."""
+        return getattr(self.cap, "healthy", True) and self._daemon_ok
+
+    def get_capture_stats(self):
+        """Outage/reconnect stats for supervised live streams ({} for file replay)."""
+        return self.cap.get_stats() if isinstance(self.cap, CaptureSupervisor) else {}
+
+    @staticmethod
+    def _resolve_reader_mode(reader_mode, video_path):
+        if reader_mode not in ("auto", "on_demand", "latest", "lossless"):
+            raise ValueError(f"Unknown reader_mode: {reader_mode}")
+        if reader_mode != "auto":
+            return reader_mode
+        is_file = isinstance(video_path, str) and os.path.isfile(video_path)
+        return "lossless" if is_file else "latest"
+
     def _frame_reader(self):
         """Continuously read frames from the capture and keep the latest frame only."""
+        if self.READER_MODE == "on_demand":
+            return self._frame_reader_on_demand()
+        if self.READER_MODE == "lossless":
+            return self._frame_reader_lossless()
+        stats = self.reader_stats
         while not self._reader_stop.is_set():
             try:
                 ret, frame = self.cap.read()
                 if not ret:
                     time.sleep(0.01)
                     continue
-                with self._lock:
-                    self._last_frame = frame
-                    self._last_frame_ts = time.time()
+                stats["grabbed"] += 1
+                stats["decoded"] += 1
+                if self._publish_frame(frame):
+                    stats["dropped"] += 1  # previous frame overwritten before run() took it
+            except Exception:
+                time.sleep(0.05)
+
+    def _frame_reader_on_demand(self):
+        """
+        Keep the stream drained with grab() and only retrieve() (color convert
+        into a BGR Mat) when run() has taken the previous frame. Frames grabbed
+        while run() is busy are dropped without being converted; FFmpeg has
+        already decoded them in grab().
+        """
+        stats = self.reader_stats
+        while not self._reader_stop.is_set():
+            try:
+                if not self.cap.grab():
+                    time.sleep(0.01)
+                    continue
+                stats["grabbed"] += 1
+                if not self._frame_wanted.is_set():
+                    stats["dropped"] += 1
+                    continue
+                ret, frame = self.cap.retrieve()
+                if not ret:
+                    stats["dropped"] += 1
+                    continue
+                stats["decoded"] += 1
+                self._publish_frame(frame)
             except Exception:
                 time.sleep(0.05)
 
+    def _frame_reader_lossless(self):
+        """
+        File replay: hand every frame to run() exactly once. The ring blocks the
+        reader while all slots are in use (backpressure), so replay runs as fast
+        as inference allows, and the frame timestamp is the stream PTS rather
+        than wall-clock time, which makes counts independent of machine speed.
+        """
+        stats = self.reader_stats
+        fps = self.cap.get(cv2.CAP_PROP_FPS) or 25.0
+        last_pts = None
+        try:
+            while not self._reader_stop.is_set():
+                ret, frame = self.cap.read()
+                if not ret:
+                    break  # end of file
+                stats["grabbed"] += 1
+                stats["decoded"] += 1
+                pts = self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+                if last_pts is not None and pts <= last_pts:
+                    pts = last_pts + 1.0 / fps  # container without usable PTS
+                last_pts = pts
+                self._publish_frame(frame, pts)
+        except Exception as e:
+            print(f"Frame reader stopped: {e}")
+        finally:
+            self._ring.close()
+
+    def _publish_frame(self, frame, ts=None):
+        """
+        Resize the full-resolution frame straight into a free ring slot (no
+        full-resolution copy, no per-frame allocation) and publish it to run().
+        Returns True if an untaken older frame was dropped.
+        """
+        ring = self._ring
+        idx = ring.acquire_write()
+        if idx is None:
+            return False  # ring closed while waiting for a free slot
+        try:
+            cv2.resize(frame, (self.TARGET_W, self.TARGET_H), dst=ring.buffers[idx])
+            if self.TILE_MODE:
+                self._copy_tile_region(frame, idx)
+        except Exception:
+            ring.cancel_write(idx)
+            raise
+        self._frame_wanted.clear()
+        return ring.publish(idx, time.time() if ts is None else ts)
+
+    def get_reader_stats(self):
+        """Snapshot of grabbed/decoded/dropped/consumed frame counts."""
+        return dict(self.reader_stats)
+
     def _register_cross_exit(self, cx, cy, now):
         self.recent_crossings.append((now, cx, cy))
         self.recent_crossings_exit.append((now, cx, cy))
@@ -195,152 +453,573 @@ class WorkerCounter:
 
     # --------------- Main per-frame processing -------------------
 
-    def _process_frame(self, frame, line_y):
+    def _process_frame(self, frame, line_y, now=None):
         """
         Runs detection+tracking, updates per-track states, and increments exit_count
-        when a robust crossing is detected.
+        when a robust crossing is detected. now defaults to wall-clock time; file
+        replay passes the frame PTS instead.
         """
-        now = time.time()
-
-        results = self.model.track(
-            frame,
-            conf=self.CONF_THRESHOLD,
-            verbose=False,
-            persist=True,
-            tracker="bytetrack.yaml",
-            half=self.HALF,
-            device=self.DEVICE
-        )[0]
-        self.rollsin=len(results.boxes)
-        if results.boxes is None or results.boxes.id is None:
+        now = time.time() if now is None else now
+
+        if self.MOTION_GATE and not self._gate_for(frame, line_y).should_detect(frame):
+            # nothing moving near the line: no detector call, just let time pass
+            self._advance_tracker_clock()
+            self._purge_old_tracks(now)
+            return self.workers
+
+        if self.STRIDE_ENABLE:
+            live = self._live_slots()
+            cy, vy = self._live_motion(live, now)
+            if not self._stride.should_detect(now, cy, vy, line_y, self.HYSTERESIS):
+                # carry the last detection forward; crossing logic runs on the predictions
+                self._advance_tracker_clock()
+                self._count_detections(self._propagated_detections(live, now), frame, line_y, now)
+                self.get_counts_last(now)
+                self._purge_old_tracks(now)
+                return self.workers
+
+        t_detect = time.perf_counter()
+        dets = self._detect_and_track(frame, line_y)
+        self._stride.note_latency(time.perf_counter() - t_detect)
+        if dets is None:
+            self._live_ids = self._live_ids[:0]
             self._purge_old_tracks(now)
             return self.workers
 
-        for box, track_id in zip(results.boxes, results.boxes.id):
-            x1, y1, x2, y2 = box.xyxy[0].tolist()
-            cls = int(box.cls.item())
-            track_id = int(track_id.item())
+        self._live_ids = self._count_detections(dets, frame, line_y, now)
+        self.get_counts_last(now)
 
-            # Only the target class participates in counting
-            if cls != self.CLS_ID_TO_COUNT:
-                if cls not in self.workers:
-                    self.workers[cls] = 0
-                    print(f"New worker detected")
+        self._purge_old_tracks(now)
+        return self.workers
+
+    def _detect_and_track(self, frame, line_y):
+        """Detector + tracker for one frame: (xyxy, ids, conf, cls) arrays, or None without tracks."""
+        if self.ROI_MODE:
+            return self._detect_roi(frame, line_y)
+        if self.TILE_MODE:
+            return self._detect_tiles(frame)
+        if self.CASCADE_MODEL:
+            return self._detect_cascade(frame, line_y)
+        if self.LEAN_INFERENCE or self.TRACKER != "bytetrack":
+            return self.detect_track(frame)
+        source, extra = frame, {}
+        if self.FUSED_PREPROCESS:
+            pre = self._preprocessor_for(frame)
+            source, extra = pre(frame), {"imgsz": pre.input_hw}
+        with self._model_lock:
+            results = self.model.track(
+                source,
+                conf=self.CONF_THRESHOLD,
+                verbose=False,
+                persist=True,
+                tracker="bytetrack.yaml",
+                half=self.HALF,
+                device=self.DEVICE,
+                **extra
+            )[0]
+        self.rollsin=len(results.boxes)
+        if results.boxes is None or results.boxes.id is None:
+            return None
+        # one device->host copy for the whole frame instead of one per scalar
+        return boxes_to_arrays(results.boxes)
+
+    def _preprocessor_for(self, frame):
+        if self._preprocessor is None or self._preprocessor.frame_hw != frame.shape[:2]:
+            device = getattr(self, "device", "cpu")
+            self._preprocessor = FusedPreprocessor(frame.shape, half=self.HALF and device != "cpu",
+                                                   device=device, input_hw=self.LEAN_INPUT_HW)
+        return self._preprocessor
+
+    def detect_track(self, frame):
+        """
+        Lean detect+track: (xyxy, ids, conf, cls) NumPy arrays for frame, or None
+        without tracks. Runs the model's raw forward pass and NMS on the fused
+        input and filters before tracking; no Results/Boxes objects are built.
+        """
+        return self._track_arrays(self._filter_detections(self._detections(frame)), frame)
+
+    def _detections(self, frame):
+        """Full-model (N, 6) x1, y1, x2, y2, conf, cls rows for frame, in frame pixels."""
+        if self.INFERENCE_SOCKET:
+            return self._daemon_detections(frame)
+        if self._batcher is not None:
+            x = self._preprocessor_for(frame)(frame)
+            return self._batcher.submit(self.STREAM_NAME, x)  # batched with the other streams
+        if self.LEAN_INFERENCE:
+            # frame sits top-left in the padded input, so these are already frame pixels
+            return self.infer_batch(self._preprocessor_for(frame)(frame))[0]
+        with self._model_lock:
+            r = self.model.predict(frame, conf=self.CONF_THRESHOLD, verbose=False,
+                                   half=self.HALF, device=self.DEVICE)[0]
+        return r.boxes.data.cpu().numpy()
+
+    def _cascade_for(self):
+        if self._cascade is None:
+            on_cuda = getattr(self, "device", "cpu") != "cpu"
+            fast = FastDetector(YOLO(self.CASCADE_MODEL, task='detect'), half=self.HALF and on_cuda,
+                                device=self.DEVICE, torch_device=getattr(self, "device", "cpu"),
+                                input_hw=None if str(self.CASCADE_MODEL).endswith(".pt") else (640, 640),
+                                nms_iou=self.NMS_IOU, max_det=self.MAX_DET)
+            # crops run at ROI_IMGSZ, which a fixed-shape export can't take
+            crops = (self.CASCADE_CROPS and self.model is not None and not self.INFERENCE_SOCKET
+                     and str(self.MODEL_PATH).endswith(".pt"))
+            self._cascade = DetectorCascade(fast, self._detections, self._roi_detections if crops else None,
+                                            cls_id=self.CLS_ID_TO_COUNT, conf=self.CONF_THRESHOLD,
+                                            low_conf=self.CASCADE_LOW_CONF, sure_conf=self.CASCADE_SURE_CONF,
+                                            uncertain_margin=self.CASCADE_UNCERTAIN_MARGIN,
+                                            merge_iou=self.ROI_NMS_IOU)
+        return self._cascade
+
+    def _detect_cascade(self, frame, line_y):
+        """Small model first, full model where the cascade escalates; then filter and track."""
+        live = self._live_slots()
+        track_cy = self.track_state.sample(live, 0, CY) if len(live) else np.zeros(0)
+        margin = self.HYSTERESIS + self.CASCADE_BAND
+        dets = self._cascade_for().detect(frame, (line_y - margin, line_y + margin), track_cy,
+                                          self._roi_rects(frame, line_y))
+        return self._track_arrays(self._filter_detections(dets), frame)
+
+    def get_cascade_stats(self):
+        """Escalation/disagreement rates and per-model time ({} without a cascade)."""
+        return self._cascade.get_stats() if self._cascade is not None else {}
+
+    def warmup(self):
+        """Run the configured detector path WARMUP_RUNS times on a blank processing-size frame."""
+        frame = np.zeros((self.TARGET_H, self.TARGET_W, 3), dtype=np.uint8)
+        t0 = time.perf_counter()
+        if self.INFERENCE_SOCKET:
+            self._daemon_client(frame)  # attach; the daemon's model is already warm (run() retries if down)
+        elif self.LEAN_INFERENCE:
+            x = self._preprocessor_for(frame)(frame)
+            for _ in range(self.WARMUP_RUNS):
+                self.infer_batch(x)
+        else:
+            source, extra = frame, {}
+            if self.FUSED_PREPROCESS:
+                pre = self._preprocessor_for(frame)
+                source, extra = pre(frame), {"imgsz": pre.input_hw}
+            with self._model_lock:
+                for _ in range(self.WARMUP_RUNS):
+                    self.model.predict(source, conf=self.CONF_THRESHOLD, half=self.HALF,
+                                       device=self.DEVICE, verbose=False, **extra)
+        if self.CASCADE_MODEL:
+            fast = self._cascade_for().fast
+            for _ in range(self.WARMUP_RUNS):
+                fast(frame, self.CASCADE_LOW_CONF)
+        if (self.LEAN_INFERENCE or self.CASCADE_MODEL or self.TRACKER != "bytetrack") and self._array_tracker is None:
+            self._array_tracker = create_tracker(self.TRACKER)
+        self._warm = True
+        print(f"Detector warm-up on {self.STREAM_NAME}: {time.perf_counter() - t0:.2f}s")
+
+    def _daemon_detections(self, frame):
+        """Daemon detections for frame; none while the daemon is unreachable."""
+        client = self._daemon_client(frame)
+        if client is None:
+            return np.zeros((0, 6))
+        try:
+            dets = client.detect(frame)
+        except OSError as e:
+            self._daemon_down(e)
+            return np.zeros((0, 6))
+        if not self._daemon_ok:
+            self._daemon_ok = True
+            self.daemon_stats["reconnects"] += 1
+            print(f"[INFERENCE] {self.STREAM_NAME}: daemon back at {self.INFERENCE_SOCKET}")
+        return dets
+
+    def _daemon_client(self, frame):
+        """The attached InferenceClient, or None until the next reconnect attempt is due."""
+        client = self._inference_client
+        if client is not None and client.frame_shape == frame.shape:
+            return client
+        if time.monotonic() < self._daemon_retry_at:
+            return None
+        try:
+            return self._inference_client_for(frame)
+        except OSError as e:
+            self._daemon_down(e)
+            return None
+
+    def _daemon_down(self, e):
+        """Drop the client and schedule the next attach attempt with doubling backoff."""
+        if self._inference_client is not None:
+            try:
+                self._inference_client.close()
+            except OSError:
+                pass
+            self._inference_client = None
+        if self._daemon_ok:
+            self._daemon_ok = False
+            self._daemon_delay = self.INFERENCE_BACKOFF_INITIAL
+            self.daemon_stats["outages"] += 1
+            print(f"[INFERENCE] {self.STREAM_NAME}: daemon at {self.INFERENCE_SOCKET} unreachable ({e!r}); "
+                  f"retrying with backoff")
+        else:
+            self._daemon_delay = min(self._daemon_delay * 2, self.INFERENCE_BACKOFF_MAX)
+        self._daemon_retry_at = time.monotonic() + self._daemon_delay
+
+    def _inference_client_for(self, frame):
+        client = self._inference_client
+        if client is None or client.frame_shape != frame.shape:
+            if client is not None:
+                client.close()
+            client = self._inference_client = InferenceClient(
+                self.MODEL_PATH, frame.shape, conf=self.CONF_THRESHOLD,
+                input_hw=self.LEAN_INPUT_HW, socket_path=self.INFERENCE_SOCKET)
+        return client
+
+    def infer_batch(self, x, conf=None):
+        """Raw forward pass + NMS on a (B, 3, H, W) input; B (N, 6) detection arrays."""
+        backend = self._backend_for(x.shape[2:])
+        conf = self.CONF_THRESHOLD if conf is None else conf
+        with self._model_lock, torch.inference_mode():
+            preds = backend(x)
+            out = ops.non_max_suppression(preds, conf, self.NMS_IOU, max_det=self.MAX_DET)
+        return [d.cpu().numpy() for d in out]
+
+    def _backend_for(self, input_hw):
+        """The predictor's AutoBackend, set up by one ordinary predict call (once per shared model)."""
+        if self._backend is None:
+            with self._model_lock:
+                if getattr(self.model, "predictor", None) is None:
+                    dummy = np.zeros((int(input_hw[0]), int(input_hw[1]), 3), dtype=np.uint8)
+                    self.model.predict(dummy, imgsz=tuple(dummy.shape[:2]), half=self.HALF,
+                                       device=self.DEVICE, verbose=False)
+                self._backend = self.model.predictor.model
+        return self._backend
+
+    def _filter_detections(self, dets):
+        """
+        Vectorized pre-tracking filter on (N, 6) x1, y1, x2, y2, conf, cls rows:
+        confidence, TRACK_CLASSES, and the AREA_MIN/AREA_MAX window counting
+        applies to the target class anyway.
+        """
+        keep = dets[:, 4] >= self.CONF_THRESHOLD
+        if self.TRACK_CLASSES is not None:
+            keep &= np.isin(dets[:, 5], self.TRACK_CLASSES)
+        a = box_geometry(dets[:, :4])[0]  # same area formula as the counting filter
+        keep &= (dets[:, 5] != self.CLS_ID_TO_COUNT) | ((a >= self.AREA_MIN) & (a <= self.AREA_MAX))
+        return dets[keep]
+
+    def _track_arrays(self, dets, frame):
+        """Feed frame-coordinate detections to our own tracker (TRACKER); tracked arrays or None."""
+        if self._array_tracker is None:
+            self._array_tracker = create_tracker(self.TRACKER)
+        tracked = self._array_tracker.update(dets, frame.shape, frame)
+        self.rollsin = len(tracked[1])
+        return tracked if len(tracked[1]) else None
+
+    def _roi_rects(self, frame, line_y):
+        h, w = frame.shape[:2]
+        if self.ROI_RECTS:
+            return [(max(0, x0), max(0, y0), min(w, x1), min(h, y1)) for (x0, y0, x1, y1) in self.ROI_RECTS]
+        return [(0, max(0, line_y - self.ROI_MARGIN), w, min(h, line_y + self.ROI_MARGIN))]
+
+    def _detect_roi(self, frame, line_y):
+        """
+        One batched detector call over all ROI crops. Boxes are shifted back to
+        frame coordinates, merged with NMS where lanes overlap, then tracked.
+        """
+        dets = self._roi_detections(frame, self._roi_rects(frame, line_y))
+        return self._track_arrays(self._filter_detections(dets), frame)
+
+    def _roi_detections(self, frame, rects):
+        """(N, 6) detections from one batched call over the crops at rects, in frame pixels."""
+        crops = [frame[y0:y1, x0:x1] for (x0, y0, x1, y1) in rects]
+        with self._model_lock:
+            results = self.model.predict(
+                crops,
+                imgsz=self.ROI_IMGSZ,
+                conf=self.CONF_THRESHOLD,
+                verbose=False,
+                half=self.HALF,
+                device=self.DEVICE
+            )
+        parts = []
+        for r, (x0, y0, _x1, _y1) in zip(results, rects):
+            if r.boxes is None or len(r.boxes) == 0:
                 continue
+            d = r.boxes.data.cpu().numpy().astype(np.float64)  # x1, y1, x2, y2, conf, cls
+            d[:, [0, 2]] += x0
+            d[:, [1, 3]] += y0
+            parts.append(d)
+        dets = np.concatenate(parts) if parts else np.zeros((0, 6))
+        if len(rects) > 1 and len(dets) > 1:
+            dets = dets[nms(dets[:, :4], dets[:, 4], self.ROI_NMS_IOU, classes=dets[:, 5])]
+        return dets
 
-            # Area filter
-            area = abs(y2 - y1) * abs(x2 - x1)
-            if area < self.AREA_MIN or area > self.AREA_MAX:
+    def _tile_source_rect(self, src_shape):
+        """TILE_REGION scaled to source pixels, and the source -> processing-frame map."""
+        h, w = src_shape[:2]
+        sx, sy = self.TARGET_W / w, self.TARGET_H / h
+        x0, y0, x1, y1 = self.TILE_REGION or (0, 0, self.TARGET_W, self.TARGET_H)
+        rect = (max(0, int(x0 / sx)), max(0, int(y0 / sy)), min(w, int(round(x1 / sx))), min(h, int(round(y1 / sy))))
+        return rect, (rect[0] * sx, rect[1] * sy, sx, sy)
+
+    def _copy_tile_region(self, frame, idx):
+        """
+        Reader side: full-resolution copy of the tile region, and its map, into
+        ring slot idx's entry. Only the slot's current owner touches the entry,
+        so a source size change reallocates this slot's buffer and nothing else.
+        """
+        (x0, y0, x1, y1), mapping = self._tile_source_rect(frame.shape)
+        shape = (y1 - y0, x1 - x0, 3)
+        held = self._tile_slots[idx]
+        buf = held[0] if held is not None and held[0].shape == shape else np.empty(shape, dtype=np.uint8)
+        np.copyto(buf, frame[y0:y1, x0:x1])
+        self._tile_slots[idx] = (buf, mapping)
+
+    def _detect_tiles(self, frame):
+        """
+        One batched detector call over the tiles of the full-resolution region;
+        boxes merged across tiles, mapped to the processing frame, then tracked.
+        Falls back to the processing frame until the reader has a region copy.
+        """
+        if self._tile_frame is None:
+            return self._track_arrays(self._filter_detections(self._detections(frame)), frame)
+        region, (px, py, sx, sy) = self._tile_frame
+        t0 = time.perf_counter()
+        if self._tiles is None or self._tiles[0] != region.shape:
+            self._tiles = (region.shape, tile_grid(region.shape, self.TILE_GRID, self.TILE_OVERLAP))
+        tiles = self._tiles[1]
+        crops = [region[y0:y1, x0:x1] for (x0, y0, x1, y1) in tiles]
+        with self._model_lock:
+            results = self.model.predict(
+                crops,
+                imgsz=self.TILE_IMGSZ,
+                conf=self.CONF_THRESHOLD,
+                verbose=False,
+                half=self.HALF,
+                device=self.DEVICE
+            )
+        parts, tile_ids = [], []
+        for i, (r, (x0, y0, _x1, _y1)) in enumerate(zip(results, tiles)):
+            if r.boxes is None or len(r.boxes) == 0:
                 continue
+            d = r.boxes.data.cpu().numpy().astype(np.float64)  # x1, y1, x2, y2, conf, cls
+            d[:, [0, 2]] += x0
+            d[:, [1, 3]] += y0
+            parts.append(d)
+            tile_ids.append(np.full(len(d), i))
+        dets = np.concatenate(parts) if parts else np.zeros((0, 6))
+        merged = merge_tiles(dets, np.concatenate(tile_ids) if parts else np.zeros(0), self.TILE_MERGE_IOS)
+        merged[:, [0, 2]] = merged[:, [0, 2]] * sx + px
+        merged[:, [1, 3]] = merged[:, [1, 3]] * sy + py
+
+        st = self.tile_stats
+        st["frames"] += 1
+        st["tiles"] += len(tiles)
+        st["boxes_in"] += len(dets)
+        st["boxes_out"] += len(merged)
+        st["sec"] += time.perf_counter() - t0
+        return self._track_arrays(self._filter_detections(merged), frame)
+
+    def get_tile_stats(self):
+        """Tiles and detector time per frame, boxes before/after the cross-tile merge ({} unless tiling)."""
+        st = self.tile_stats
+        if not st["frames"]:
+            return {}
+        return {"frames": st["frames"], "tiles_per_frame": round(st["tiles"] / st["frames"], 2),
+                "ms_per_frame": round(1e3 * st["sec"] / st["frames"], 2),
+                "fps": round(st["frames"] / max(st["sec"], 1e-9), 1),
+                "merged_away": st["boxes_in"] - st["boxes_out"]}
+
+    def _gate_for(self, frame, line_y):
+        """MotionGate for the current frame size/line position (rebuilt if either changes)."""
+        band = (line_y - self.HYSTERESIS - self.MOTION_MARGIN, line_y + self.HYSTERESIS + self.MOTION_MARGIN)
+        gate = self._motion_gate
+        if gate is None or gate.requested_band != band or gate.frame_shape != frame.shape:
+            gate = self._motion_gate = MotionGate(frame.shape, band, heartbeat=self.MOTION_HEARTBEAT)
+        return gate
+
+    def _advance_tracker_clock(self):
+        """
+        Count a skipped frame in ByteTrack: bump its frame clock so lost-track
+        expiry (track_buffer, in frames) still matches elapsed time, and run the
+        Kalman predict step update() would have run, so boxes are where the
+        objects are when the next detection arrives.
+        """
+        if self._array_tracker is not None:
+            self._array_tracker.advance()
+        predictor = getattr(self.model, "predictor", None)
+        for tracker in getattr(predictor, "trackers", None) or []:
+            if hasattr(tracker, "frame_id"):
+                tracker.frame_id += 1
+            if hasattr(tracker, "multi_predict"):
+                tracker.multi_predict(list(tracker.tracked_stracks) + list(tracker.lost_stracks))
+
+    def _live_slots(self):
+        """TrackStore slots of the targets seen in the last real detection that are still alive."""
+        index = self.track_state.index
+        return np.array([index[t] for t in self._live_ids.tolist() if t in index], dtype=np.int64)
+
+    def _live_motion(self, slots, now):
+        """Predicted cy and vy of the live tracks, for the stride decision."""
+        if len(slots) == 0:
+            return np.zeros(0), np.zeros(0)
+        _cx, cy, _w, _h = self.track_state.predict(slots, now)
+        return cy, self.track_state.velocity(slots)[1]
+
+    def _propagated_detections(self, slots, now):
+        """Constant-velocity boxes for the live tracks, shaped like boxes_to_arrays output."""
+        if len(slots) == 0:
+            return empty_detections()
+        cx, cy, w, h = self.track_state.predict(slots, now)
+        xyxy = np.stack([cx - 0.5 * w, cy - 0.5 * h, cx + 0.5 * w, cy + 0.5 * h], axis=1)
+        ids = self.track_state.track_id[slots]
+        cls = np.full(len(slots), self.CLS_ID_TO_COUNT, dtype=np.int64)
+        return xyxy, ids, np.ones(len(slots)), cls
+
+    def get_stride_stats(self):
+        stats = dict(self._stride.stats)
+        stats["k"] = self._stride.k
+        stats["detector_latency_ms"] = 1e3 * (self._stride.latency or 0.0)
+        return stats
+
+    def get_motion_stats(self):
+        """Frames seen/detected/skipped by the motion gate ({} when disabled or not started)."""
+        return dict(self._motion_gate.stats) if self._motion_gate is not None else {}
+
+    def _count_detections(self, dets, frame, line_y, now):
+        """
+        Vectorized counting over all boxes of one frame.
+        dets: (xyxy, ids, conf, cls) arrays as returned by counting_engine.boxes_to_arrays.
+        Produces the same crossing decisions as walking the boxes one by one.
+        Returns the ids of the target-class tracks that passed the area filter.
+        """
+        xyxy, ids, _conf, cls = dets
+        if len(ids) == 0:
+            return ids
 
-            # Center
-            cx, cy = 0.5 * (x1 + x2), 0.5 * (y1 + y2)
-            w, h = (x2 - x1), (y2 - y1)
+        # Only the target class participates in counting; other classes are
+        # registered as workers in first-seen order (interleaved with crossings below)
+        other = cls != self.CLS_ID_TO_COUNT
+        new_workers = [(i, c) for (i, c) in first_seen(cls[other]) if c not in self.workers]
+        if new_workers:
+            other_idx = np.flatnonzero(other)
+            new_workers = [(int(other_idx[i]), c) for (i, c) in new_workers]
 
-            # Draw (optional)
-            if(self.show):
+        # Area filter
+        area, cx, cy, w, h = box_geometry(xyxy)
+        keep = np.flatnonzero(~other & (area >= self.AREA_MIN) & (area <= self.AREA_MAX))
+        # One box per track id (the first): a repeated id would collide in the slot writes
+        if has_repeats(ids[keep]):
+            _u, first = np.unique(ids[keep], return_index=True)
+            keep = keep[np.sort(first)]
+        if len(keep) == 0:
+            self._register_workers(new_workers)
+            return ids[keep]
+        ids_k, cx_k, cy_k = ids[keep], cx[keep], cy[keep]
+        w_k, h_k = w[keep], h[keep]
+
+        # Draw (optional)
+        if self.show:
+            for i in keep.tolist():
+                x1, y1, x2, y2 = xyxy[i]
                 cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
-                cv2.putText(frame, f"ID {track_id}", (int(x1), int(y1) - 10),
+                cv2.putText(frame, f"ID {int(ids[i])}", (int(x1), int(y1) - 10),
                             cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-                cv2.circle(frame, (int(cx), int(cy)), 4, (0, 0, 255), -1)
+                cv2.circle(frame, (int(cx[i]), int(cy[i])), 4, (0, 0, 255), -1)
 
-            # Update per-track state
-            st = self._update_track_state(track_id, cx, cy, w, h, now)
+        # Update per-track state
+        st = self.track_state
+        slots = self._update_track_state(ids_k, cx_k, cy_k, w_k, h_k, now)
 
-            # Drop very new/unstable tracks
-            if st["age"] < self.MIN_AGE:
-                continue
+        # Drop very new/unstable tracks
+        eligible = st.age[slots] >= self.MIN_AGE
+        slots, keep = slots[eligible], keep[eligible]
+        cx_k, cy_k = cx_k[eligible], cy_k[eligible]
 
-            # Compute motion/side
-            vy = self._estimate_vy(st)
-            side_now = self._line_sides(cy, line_y)
-            side_prev = st["prev_side"]
-            if side_now != 0:
-                st["prev_side"] = side_now  # keep last non-zero
-            down_checker=False
-            up_checker=False
-            # Must have a side change across the hysteresis band
-            crossed_band = (side_prev is not None) and (side_now != 0) and (side_prev != side_now)
-            if(crossed_band):
-                if(side_prev == -1 and side_now == 1):
-                    down_checker=True
-                elif(side_prev == 1 and side_now == -1):
-                    up_checker=True
-                    
-
-            # Gate logic (ordered pass)
-            gate_ok = self._gate_pair_pass(st, side_now)
-
-            # Motion requirements
-            speed_ok = abs(vy) >= self.MIN_VY
-            travel_ok = self._vertical_travel(st) >= self.MIN_TRAVEL
-
-            # Per-track cooldown
-            cooldown_ok = (now - st["last_cross_time"]) >= self.COOLDOWN_SEC
-
-            if crossed_band and gate_ok and speed_ok and travel_ok and cooldown_ok:
-                # suppress near-duplicate due to ID switch at the line
-                if not self._switch_suppress(cx, cy, now):
-                    if(up_checker):
-                        self.exit_count += 1
-                        st["last_cross_time"] = now
-                        self._register_cross_exit(cx, cy, now)
-                        for worker in self.workers.keys():
-                            self.workers[worker] += 1
-                            print(f"Worker {worker} incremented. His output {self.workers[worker]}")
-                    elif(down_checker):
-                        self.rollsin+=1
-                        st["last_cross_time"] = now
-                        self._register_cross_entry(cx, cy, now)
-        self.get_counts_last()
+        # Compute motion/side
+        newest, prev, oldest = st.recent(slots)
+        vy = self._estimate_vy(newest, prev)
+        side_now = line_sides(cy_k, line_y, self.HYSTERESIS)
+        side_prev = st.prev_side[slots]
+        moved = side_now != 0
+        st.prev_side[slots[moved]] = side_now[moved]  # keep last non-zero
 
-        self._purge_old_tracks(now)
-        return self.workers
+        # Must have a side change across the hysteresis band
+        crossed_band = (side_prev != 0) & moved & (side_prev != side_now)
+
+        # Gate logic (ordered pass)
+        gate_ok = self._gate_pair_pass(slots, side_now, newest, prev)
+
+        # Motion requirements
+        speed_ok = np.abs(vy) >= self.MIN_VY
+        travel_ok = self._vertical_travel(newest, oldest) >= self.MIN_TRAVEL
+
+        # Per-track cooldown
+        cooldown_ok = (now - st.last_cross_time[slots]) >= self.COOLDOWN_SEC
+
+        candidates = np.flatnonzero(crossed_band & gate_ok & speed_ok & travel_ok & cooldown_ok).tolist()
+        pending = iter(new_workers)
+        nxt = next(pending, None)
+        for j in candidates:
+            # workers seen earlier in the frame than this box are already registered
+            while nxt is not None and nxt[0] < keep[j]:
+                self._register_workers([nxt])
+                nxt = next(pending, None)
+            x, y = float(cx_k[j]), float(cy_k[j])
+            # suppress near-duplicate due to ID switch at the line
+            if self._switch_suppress(x, y, now):
+                continue
+            st.last_cross_time[slots[j]] = now
+            if side_prev[j] == 1 and side_now[j] == -1:
+                self.exit_count += 1
+                self._register_cross_exit(x, y, now)
+                for worker in self.workers.keys():
+                    self.workers[worker] += 1
+                    print(f"Worker {worker} incremented. His output {self.workers[worker]}")
+            else:
+                self.rollsin+=1
+                self._register_cross_entry(x, y, now)
+        if nxt is not None:
+            self._register_workers([nxt] + list(pending))
+        return ids_k
+
+    def _register_workers(self, new_workers):
+        for _i, cls in new_workers:
+            if cls not in self.workers:
+                self.workers[cls] = 0
+                print(f"New worker detected")
 
     # -------------------- App loop & UI --------------------------
 
     def run(self):
         print(f"Starting tracking on {self.VIDEO_PATH} with device: {self.device}")
-        prev_ts = 0.0
         try:
-            while True:
-                with self._lock:
-                    frame = None if self._last_frame is None else self._last_frame.copy()
-                    ts = float(self._last_frame_ts)
-
-                if frame is None:
-                    time.sleep(0.01)
-                    continue
-
-                # skip if same frame as previously processed
-                if ts == prev_ts:
-                    time.sleep(0.005)
+            if not self._warm:
+                self.warmup()
+            while not self._reader_stop.is_set():
+                got = self._ring.acquire_read(timeout=0.01)
+                if got is None:
+                    if self._ring.drained:
+                        break  # end of file replay
                     continue
-                prev_ts = ts
+                idx, ts, _seq = got
+                self.reader_stats["consumed"] += 1
 
-                # Pre-process
-                frame = cv2.resize(frame, (self.TARGET_W, self.TARGET_H))
+                # Frame is already resized by the reader; we own this slot until release()
+                frame = self._ring.buffers[idx]
                 line_y = int((self.TARGET_H / 2) - self.LINE_OFFSET)
 
                 # Process
-                self._process_frame(frame, line_y)
-
-                if self.show:
-                    # Draw main line and hysteresis band
-                    cv2.line(frame, (0, line_y), (frame.shape[1], line_y), (255, 0, 0), 2)
-                    cv2.line(frame, (0, line_y - self.HYSTERESIS), (frame.shape[1], line_y - self.HYSTERESIS), (255, 255, 0), 1)
-                    cv2.line(frame, (0, line_y + self.HYSTERESIS), (frame.shape[1], line_y + self.HYSTERESIS), (255, 255, 0), 1)
-                    self._update_and_display_info(frame)
-                    cv2.imshow("YOLO ByteTrack - Robust Line Counter", frame)
-                    if cv2.waitKey(1) & 0xFF == ord("q"):
-                        break
-                else:
-                    # keep HUD counters updated even in headless mode
-                    self._update_and_display_info(frame)
+                try:
+                    self._tile_frame = self._tile_slots[idx] if self.TILE_MODE else None
+                    self._process_frame(frame, line_y, ts if self._ring.lossless else None)
+                    quit_requested = self._show_frame(frame, line_y)
+                finally:
+                    self._ring.release(idx)
+                    # only now ask the on_demand reader for a frame: one retrieved earlier
+                    # would sit in the ring for a whole inference period and be that stale
+                    self._frame_wanted.set()
+                if quit_requested:
+                    break
         finally:
             # stop reader thread cleanly
             try:
                 self._reader_stop.set()
+                self._ring.close()
                 if hasattr(self, "_grab_thread") and self._grab_thread.is_alive():
                     self._grab_thread.join(timeout=0.5)
             except Exception:
@@ -349,12 +1028,33 @@ class WorkerCounter:
                 self.cap.release()
             except Exception:
                 pass
+            if self._inference_client is not None:
+                self._inference_client.close()
             try:
                 cv2.destroyAllWindows()
             except Exception:
                 pass
             self._print_final_results()
 
+    def stop(self):
+        """Ask run() (possibly on another thread) to finish; it releases the capture on the way out."""
+        self._reader_stop.set()
+        self._ring.close()
+
+    def _show_frame(self, frame, line_y):
+        """HUD/window for a processed frame. Returns True when 'q' was pressed."""
+        if self.show:
+            # Draw main line and hysteresis band
+            cv2.line(frame, (0, line_y), (frame.shape[1], line_y), (255, 0, 0), 2)
+            cv2.line(frame, (0, line_y - self.HYSTERESIS), (frame.shape[1], line_y - self.HYSTERESIS), (255, 255, 0), 1)
+            cv2.line(frame, (0, line_y + self.HYSTERESIS), (frame.shape[1], line_y + self.HYSTERESIS), (255, 255, 0), 1)
+            self._update_and_display_info(frame)
+            cv2.imshow("YOLO ByteTrack - Robust Line Counter", frame)
+            return cv2.waitKey(1) & 0xFF == ord("q")
+        # keep HUD counters updated even in headless mode
+        self._update_and_display_info(frame)
+        return False
+
     def _update_and_display_info(self, frame):
         # FPS
         self.frame_count += 1
@@ -383,11 +1083,46 @@ class WorkerCounter:
         print(f"Final Counted Exited: {self.exit_count}")
         print(f"Total Frames Processed: {self.frame_count}")
         print(f"Average FPS: {avg_fps:.1f}")
+        stats = self.get_reader_stats()
+        print(f"Reader ({self.READER_MODE}): grabbed {stats['grabbed']}, decoded {stats['decoded']}, "
+              f"dropped {stats['dropped']}, consumed {stats['consumed']}")
+        sstats = self.get_stride_stats()
+        print(f"Detector stride: {sstats['detected']} detected, {sstats['propagated']} propagated frames, "
+              f"detector {sstats['detector_latency_ms']:.1f} ms")
+        mstats = self.get_motion_stats()
+        if mstats:
+            print(f"Motion gate: {mstats['skipped']}/{mstats['frames']} frames skipped "
+                  f"({mstats['duplicates']} duplicates), {mstats['heartbeats']} heartbeats")
+        tstats = self.get_tile_stats()
+        if tstats:
+            print(f"Tiles: {tstats['tiles_per_frame']} per frame, {tstats['ms_per_frame']} ms/frame detector "
+                  f"({tstats['fps']} FPS), {tstats['merged_away']} boxes merged across tiles")
+        kstats = self.get_cascade_stats()
+        if kstats:
+            print(f"Cascade: {kstats['escalation_rate']:.1%} of frames escalated "
+                  f"({kstats['uncertain']} unsure, {kstats['band']} near the line, {kstats['crop']} on crops), "
+                  f"models disagreed on {kstats['disagreement_rate']:.1%}, {kstats['ms_per_frame']} ms/frame")
+        cstats = self.get_capture_stats()
+        if cstats:
+            print(f"Capture: {cstats['outages']} outages ({cstats['outage_sec_total']:.1f}s), "
+                  f"{cstats['reconnects']} reconnects, ~{cstats['frames_lost']} frames lost")
+        if self.daemon_stats["outages"]:
+            print(f"Inference daemon: {self.daemon_stats['outages']} outages, "
+                  f"{self.daemon_stats['reconnects']} reconnects")
         print("=" * 50)
 
-    def get_counts_last(self):
+    def get_status(self):
+        """Snapshot for external callers (e.g. test_server)."""
+        return {
+            "workers": dict(self.workers),
+            "exit_count": int(self.exit_count),
+            "rcpm": int(self.rcpm),
+            "rollsin": int(self.rollsin),
+        }
+
+    def get_counts_last(self, now=None):
         """Return counts in last minute (thread-safe-ish, iterates newest-first)."""
-        now = time.time()
+        now = time.time() if now is None else now
         cutoff = now - 60
         exit_c = 0
         # iterate from newest to oldest and stop when older than cutoff
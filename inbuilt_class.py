@@ -1,7 +1,11 @@
+import os
 import cv2
 from ultralytics import YOLO
 import torch
 import time
+from counting_engine import boxes_to_arrays
+from inference_server import InferenceClient, default_input_hw
+from tracking import create_tracker
 
 class WorkerCounter:
     """
@@ -9,7 +13,8 @@ class WorkerCounter:
     on a video stream using a YOLOv8-TensorRT engine and ByteTrack.
     """
     
-    def __init__(self, model_path, video_path, line_offset=60, cls_id_to_count=1, conf_threshold=0.7, half=True, device=0):
+    def __init__(self, model_path, video_path, line_offset=60, cls_id_to_count=1, conf_threshold=0.7, half=True, device=0,
+                 inference_socket=None):
         """
         Initializes the WorkerCounter.
 
@@ -21,6 +26,8 @@ class WorkerCounter:
             conf_threshold (float): Confidence threshold for detection.
             half (bool): Use half-precision (FP16) for inference if supported by the device.
             device (int): CUDA device index (0 for the first GPU).
+            inference_socket (str): Unix socket of a running inference_server.py; the model is
+                then not loaded here, detections come from the daemon and ByteTrack runs locally.
         """
         # Configuration
         self.MODEL_PATH = model_path
@@ -36,7 +43,10 @@ class WorkerCounter:
 
         # YOLO/TensorRT Setup
         self.device = f"cuda:{device}" if torch.cuda.is_available() and device >= 0 else "cpu"
-        self.model = YOLO(self.MODEL_PATH, task='detect')
+        self.INFERENCE_SOCKET = inference_socket
+        self.model = None if inference_socket else YOLO(self.MODEL_PATH, task='detect')
+        self._inference_client = None
+        self._tracker = None
 
         # Counting & Tracking State
         self.exit_count = 0
@@ -59,22 +69,11 @@ class WorkerCounter:
         """Processes a single frame for detection, tracking, and counting."""
         
         # 1. Tracking
-        results = self.model.track(
-            frame, 
-            conf=self.CONF_THRESHOLD, 
-            verbose=False, 
-            persist=True,
-            tracker="bytetrack.yaml",
-            half=self.HALF,
-            device=self.DEVICE
-        )[0]
+        xyxy, ids, _conf, classes = self._track(frame)
         
         # 2. Object Processing and Counting
-        if results.boxes is not None and results.boxes.id is not None:
-            for box, track_id in zip(results.boxes, results.boxes.id):
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-                cls = int(box.cls.item())
-                track_id = int(track_id.item())
+        if len(ids):
+            for (x1, y1, x2, y2), track_id, cls in zip(xyxy.tolist(), ids.tolist(), classes.tolist()):
                 
                 # Original logic for tracking non-counting classes (cls != 1)
                 if cls != self.CLS_ID_TO_COUNT:
@@ -118,6 +117,26 @@ class WorkerCounter:
                     #      print(f"ID {track_id} entered. Total Entered: {self.enter_count}")
         return self.workers
 
+    def _track(self, frame):
+        """Tracked boxes as (xyxy, ids, conf, cls) arrays, from model.track() or the inference daemon."""
+        if self.INFERENCE_SOCKET:
+            if self._inference_client is None:
+                self._inference_client = InferenceClient(self.MODEL_PATH, frame.shape, conf=self.CONF_THRESHOLD,
+                                                         input_hw=default_input_hw(self.MODEL_PATH),
+                                                         socket_path=self.INFERENCE_SOCKET)
+                self._tracker = create_tracker("bytetrack")
+            return self._tracker.update(self._inference_client.detect(frame), frame.shape, frame)
+        results = self.model.track(
+            frame, 
+            conf=self.CONF_THRESHOLD, 
+            verbose=False, 
+            persist=True,
+            tracker="bytetrack.yaml",
+            half=self.HALF,
+            device=self.DEVICE
+        )[0]
+        return boxes_to_arrays(results.boxes)
+
     def run(self):
         """Starts the main video processing loop."""
         
@@ -153,6 +172,8 @@ class WorkerCounter:
                     
         finally:
             self.cap.release()
+            if self._inference_client is not None:
+                self._inference_client.close()
             cv2.destroyAllWindows()
             self._print_final_results()
 
@@ -204,7 +225,8 @@ if __name__ == "__main__":
             line_offset=60,     
             cls_id_to_count=1,    
             conf_threshold=0.7,
-            device=0          
+            device=0,
+            inference_socket=os.getenv("INFERENCE_SOCKET")  # use a running inference_server.py
         )
         
         # Run the main processing loop
@@ -0,0 +1,128 @@
+"""
+Profile: where per-frame detect+track time goes, from the pre-series path to
+the lean WorkerCounter.detect_track() one (WorkerCounter(lean=True)):
+
+  track  model.track() on the BGR frame, ultralytics letterboxes it (baseline)
+  fused  model.track() on the fused, stride-padded input tensor
+  lean   detect_track(): raw forward + NMS on the fused input, array ByteTrack
+
+All paths run under cProfile on the same frames. Time is split into model
+forward (AutoBackend.forward), NMS, tracker update and input preprocessing;
+everything else is Python wrapper overhead (Results/Boxes construction,
+predictor callbacks and generators, per-box unpacking). The top wrapper
+functions are listed for each path.
+
+    python inference_profile.py --model textile_model_worker1.pt --clip recorded.mp4
+        [--frames 300] [--device cpu]
+
+On CUDA the forward pass is asynchronous and its wait lands on whichever call
+syncs first (usually NMS); use --device cpu for a clean split.
+
+No figures from this profile have been measured yet: it needs the production
+model and a recorded clip. Until someone runs it, treat any lean-path speedup
+quoted elsewhere as unverified.
+"""
+import argparse
+import cProfile
+import pstats
+import threading
+
+import torch
+from ultralytics import YOLO
+
+import improved_class
+from counting_engine import boxes_to_arrays
+from roi_benchmark import load_clip
+
+
+PHASES = (
+    ("forward", lambda f, fn: fn == "forward" and f.endswith("autobackend.py")),
+    ("nms", lambda f, fn: fn == "non_max_suppression"),
+    ("tracker", lambda f, fn: fn == "update" and f.endswith("byte_tracker.py")),
+    ("preprocess", lambda f, fn: (fn == "preprocess" and f.endswith("predictor.py"))
+                                 or (fn == "__call__" and f.endswith("preprocess.py"))),
+)
+
+
+def make_counter(model_path, half, device):
+    wc = improved_class.WorkerCounter.__new__(improved_class.WorkerCounter)
+    wc.CLS_ID_TO_COUNT = 1
+    wc.CONF_THRESHOLD = 0.7
+    wc.HALF = half
+    wc.DEVICE = device
+    wc.device = f"cuda:{device}" if half else "cpu"
+    wc._init_counting_state()
+    wc.model = YOLO(model_path, task='detect')
+    wc._model_lock = threading.Lock()
+    wc.FUSED_PREPROCESS = True
+    wc.LEAN_INFERENCE = True
+    return wc
+
+
+def track_path(wc, frame, fused=False):
+    """model.track() -> Results -> arrays, on the BGR frame or on the fused input."""
+    source, extra = frame, {}
+    if fused:
+        pre = wc._preprocessor_for(frame)
+        source, extra = pre(frame), {"imgsz": pre.input_hw}
+    results = wc.model.track(source, conf=wc.CONF_THRESHOLD, verbose=False, persist=True,
+                             tracker="bytetrack.yaml", half=wc.HALF, device=wc.DEVICE, **extra)[0]
+    if results.boxes is None or results.boxes.id is None:
+        return None
+    return boxes_to_arrays(results.boxes)
+
+
+def profile_path(name, fn, frames, warmup=10):
+    for frame in frames[:warmup]:
+        fn(frame)
+    prof = cProfile.Profile()
+    prof.enable()
+    for frame in frames:
+        fn(frame)
+    prof.disable()
+
+    stats = pstats.Stats(prof)
+    total = stats.total_tt
+    phases = {}
+    for phase, match in PHASES:
+        phases[phase] = sum(v[3] for (f, _line, fn_name), v in stats.stats.items() if match(f, fn_name))
+    wrapper = total - sum(phases.values())
+
+    n = len(frames)
+    parts = "  ".join(f"{k} {1e3 * v / n:6.2f}" for k, v in phases.items())
+    print(f"{name:>6}: {1e3 * total / n:7.2f} ms/frame | {parts} | "
+          f"wrapper {1e3 * wrapper / n:6.2f} ms ({100 * wrapper / max(total, 1e-9):4.1f}%)")
+
+    # heaviest own-time functions outside the phases above
+    own = [(v[2], f"{f.split('/')[-1]}:{fn_name}") for (f, _line, fn_name), v in stats.stats.items()
+           if not any(match(f, fn_name) for _p, match in PHASES)]
+    for tt, label in sorted(own, reverse=True)[:8]:
+        print(f"          {1e3 * tt / n:6.3f} ms  {label}")
+    return total / n, wrapper / n
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", required=True)
+    parser.add_argument("--clip", required=True)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--device", default="0", help="cuda index or 'cpu'")
+    args = parser.parse_args()
+
+    device = "cpu" if args.device == "cpu" or not torch.cuda.is_available() else int(args.device)
+    half = device != "cpu"
+
+    base = make_counter(args.model, half, device)
+    fused = make_counter(args.model, half, device)
+    lean = make_counter(args.model, half, device)
+    frames, _stamps = load_clip(args.clip, base.TARGET_W, base.TARGET_H, args.frames)
+    if not frames:
+        raise ValueError(f"No frames decoded from {args.clip}")
+    print(f"{len(frames)} frames, device {device}")
+
+    t_base, w_base = profile_path("track", lambda f: track_path(base, f), frames)
+    t_fused, w_fused = profile_path("fused", lambda f: track_path(fused, f, fused=True), frames)
+    t_lean, w_lean = profile_path("lean", lean.detect_track, frames)
+    print(f"wrapper overhead {1e3 * w_base:.2f} -> {1e3 * w_fused:.2f} -> {1e3 * w_lean:.2f} ms/frame, "
+          f"total {1e3 * t_base:.2f} -> {1e3 * t_fused:.2f} -> {1e3 * t_lean:.2f} ms/frame "
+          f"(track -> fused -> lean)")
@@ -0,0 +1,374 @@
+"""
+Local inference daemon: loads each detector once and serves every edge app on
+the box over a Unix domain socket.
+
+    python inference_server.py --model textile_model_worker1.engine [--socket PATH]
+    python inference_server.py --stats        # residency, latency, throughput of a running daemon
+
+Protocol (one connection per client, 4-byte big-endian length + JSON per message):
+  client -> {"op": "attach", "shm": name, "shape": [h, w, 3], "model": path,
+             "conf": 0.7, "input_hw": [h', w'] or null}
+  server -> {"ok": true, "max_det": n}
+  client -> {"op": "detect"}          after writing its frame into the shared memory
+  server -> {"ok": true, "n": k}      k rows of x1, y1, x2, y2, conf, cls (float32)
+                                      written into the same block, right after the frame
+  client -> {"op": "stats"}           server -> {"ok": true, "stats": {...}}
+
+The socket defaults to $XDG_RUNTIME_DIR/edge_inference.sock (see
+default_socket_path; EDGE_INFERENCE_SOCKET or --socket override it), so
+each user gets their own daemon.
+Clients: improved_class / multi_camera / test_server (inference_socket,
+INFERENCE_SOCKET), hand_class and inbuilt_class (inference_socket), and
+test_server_cpu_tester (INFERENCE_SOCKET). hand_class's OpenCV hand
+detector stays in the app.
+
+Pixels and detections never go through the socket. Frames from different
+clients on one model are batched (BatchScheduler). Tracking stays in the
+client (WorkerCounter keeps its own ByteTrack), so a counting app can restart
+without the engine being reloaded.
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import socketserver
+import struct
+import tempfile
+import threading
+import time
+from collections import deque
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+
+def default_socket_path():
+    """
+    $EDGE_INFERENCE_SOCKET, else edge_inference.sock in the per-user runtime
+    directory ($XDG_RUNTIME_DIR), else a per-user name in the temp directory.
+    """
+    path = os.getenv("EDGE_INFERENCE_SOCKET")
+    if path:
+        return path
+    runtime = os.getenv("XDG_RUNTIME_DIR")
+    if runtime and os.path.isdir(runtime):
+        return os.path.join(runtime, "edge_inference.sock")
+    return os.path.join(tempfile.gettempdir(), f"edge_inference-{os.getuid()}.sock")
+
+
+def default_input_hw(model_path):
+    """Client input size for a model: stride-padded frame for .pt, a fixed-shape export's square input otherwise."""
+    return None if str(model_path).endswith(".pt") else (640, 640)
+
+
+DEFAULT_SOCKET = default_socket_path()
+MAX_DET = 300
+_HEADER = struct.Struct(">I")
+
+
+def send_msg(sock, obj):
+    data = json.dumps(obj).encode()
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def recv_msg(sock):
+    """Next message, or None when the peer closed the connection."""
+    header = _recv_exact(sock, _HEADER.size)
+    if header is None:
+        return None
+    body = _recv_exact(sock, _HEADER.unpack(header)[0])
+    return None if body is None else json.loads(body)
+
+
+def _recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            return None
+        buf += chunk
+    return bytes(buf)
+
+
+def shm_layout(shape):
+    """(frame bytes, total bytes) of a client's block: frame, then MAX_DET x 6 float32."""
+    frame_bytes = int(np.prod(shape))
+    return frame_bytes, frame_bytes + MAX_DET * 6 * 4
+
+
+# ------------------------------ server ------------------------------
+
+class _ModelEntry:
+    """A resident model: backend, lock, batcher and usage stats."""
+
+    def __init__(self, path, device, half, min_conf, nms_iou, max_wait):
+        import torch
+        from ultralytics import YOLO
+        from batch_scheduler import BatchScheduler
+
+        self.path = path
+        self.device = device
+        self.torch_device = f"cuda:{device}" if torch.cuda.is_available() and device >= 0 else "cpu"
+        self.half = half and self.torch_device != "cpu"
+        self.MIN_CONF = min_conf
+        self.NMS_IOU = nms_iou
+        t0 = time.monotonic()
+        self.model = YOLO(path, task='detect')
+        self._lock = threading.Lock()
+        self._backend = None
+        self.loaded_at = time.time()
+        self.load_sec = time.monotonic() - t0
+        self.frames = 0
+        self.batcher = BatchScheduler(self.infer_batch, max_batch=8, max_wait=max_wait,
+                                      name=f"batcher-{os.path.basename(path)}")
+
+    def _backend_for(self, input_hw):
+        if self._backend is None:
+            dummy = np.zeros((int(input_hw[0]), int(input_hw[1]), 3), dtype=np.uint8)
+            self.model.predict(dummy, imgsz=tuple(dummy.shape[:2]), half=self.half,
+                               device=self.device if self.torch_device != "cpu" else "cpu", verbose=False)
+            self._backend = self.model.predictor.model
+        return self._backend
+
+    def infer_batch(self, x):
+        import torch
+        from ultralytics.utils import ops
+
+        with self._lock, torch.inference_mode():
+            backend = self._backend_for(x.shape[2:])
+            preds = backend(x)
+            out = ops.non_max_suppression(preds, self.MIN_CONF, self.NMS_IOU, max_det=MAX_DET)
+        self.frames += len(out)
+        return [d.cpu().numpy() for d in out]
+
+    def stats(self):
+        return {
+            "device": self.torch_device,
+            "fp16": self.half,
+            "loaded_at": self.loaded_at,
+            "resident_sec": round(time.time() - self.loaded_at, 1),
+            "load_sec": round(self.load_sec, 2),
+            "frames": self.frames,
+            "batching": self.batcher.get_stats(),
+        }
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    """One client connection: attach once, then detect requests until it hangs up."""
+
+    def handle(self):
+        server = self.server.app
+        client_id = f"client{next(server.client_ids)}"
+        shm = entry = pre = None
+        try:
+            while True:
+                msg = recv_msg(self.request)
+                if msg is None:
+                    return
+                op = msg.get("op")
+                try:
+                    if op == "attach":
+                        from preprocess import FusedPreprocessor
+
+                        shape = tuple(msg["shape"])
+                        shm = shared_memory.SharedMemory(name=msg["shm"])
+                        # the client owns the block; don't let our resource tracker unlink it
+                        resource_tracker.unregister(shm._name, "shared_memory")
+                        frame_bytes, _total = shm_layout(shape)
+                        frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+                        dets_out = np.ndarray((MAX_DET, 6), dtype=np.float32, buffer=shm.buf, offset=frame_bytes)
+                        entry = server.model(msg["model"])
+                        conf = float(msg.get("conf", entry.MIN_CONF))
+                        pre = FusedPreprocessor(shape, half=entry.half, device=entry.torch_device,
+                                                input_hw=msg.get("input_hw"))
+                        entry.batcher.register(client_id)
+                        server.clients[client_id] = msg["model"]
+                        send_msg(self.request, {"ok": True, "max_det": MAX_DET})
+                    elif op == "detect":
+                        if entry is None:
+                            raise ValueError("detect before attach")
+                        t0 = time.perf_counter()
+                        dets = entry.batcher.submit(client_id, pre(frame))
+                        dets = dets[dets[:, 4] >= conf][:MAX_DET]
+                        dets_out[:len(dets)] = dets
+                        server.note_request(time.perf_counter() - t0)
+                        send_msg(self.request, {"ok": True, "n": len(dets)})
+                    elif op == "stats":
+                        send_msg(self.request, {"ok": True, "stats": server.get_stats()})
+                    else:
+                        raise ValueError(f"Unknown op: {op}")
+                except (OSError, ValueError, KeyError, RuntimeError) as e:
+                    send_msg(self.request, {"ok": False, "error": str(e)})
+        finally:
+            if entry is not None:
+                entry.batcher.unregister(client_id)
+            server.clients.pop(client_id, None)
+            pre = frame = dets_out = None
+            if shm is not None:
+                shm.close()
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class InferenceServer:
+    """Owns the loaded models and the socket."""
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, device=0, half=True, min_conf=0.25, nms_iou=0.7, max_wait=0.004):
+        self.SOCKET_PATH = socket_path
+        self.DEVICE = device
+        self.HALF = half
+        self.MIN_CONF = min_conf      # NMS floor; each client filters at its own threshold
+        self.NMS_IOU = nms_iou
+        self.MAX_WAIT = max_wait
+        self._models = {}
+        self._models_lock = threading.Lock()
+        self.clients = {}
+        self.client_ids = iter(range(1, 1 << 62))
+        self.started_at = time.time()
+        self._latency = deque(maxlen=2048)
+        self._done = deque(maxlen=2048)   # completion times, for throughput
+        self.requests = 0
+
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)  # stale socket from a previous run
+        self._server = _UnixServer(socket_path, _Handler)
+        self._server.app = self
+
+    def model(self, path):
+        """Resident model for path, loaded on first use."""
+        with self._models_lock:
+            if path not in self._models:
+                print(f"Loading model {path} ...")
+                self._models[path] = _ModelEntry(path, self.DEVICE, self.HALF, self.MIN_CONF, self.NMS_IOU, self.MAX_WAIT)
+                print(f"Model {path} resident ({self._models[path].load_sec:.1f}s)")
+            return self._models[path]
+
+    def note_request(self, seconds):
+        self.requests += 1
+        self._latency.append(seconds)
+        self._done.append(time.monotonic())
+
+    def get_stats(self):
+        lat = np.asarray(self._latency) * 1000.0
+        window = self._done[-1] - self._done[0] if len(self._done) > 1 else 0.0
+        return {
+            "uptime_sec": round(time.time() - self.started_at, 1),
+            "clients": dict(self.clients),
+            "requests": self.requests,
+            "latency_mean_ms": round(float(lat.mean()), 2) if len(lat) else 0.0,
+            "latency_p95_ms": round(float(np.percentile(lat, 95)), 2) if len(lat) else 0.0,
+            "throughput_fps": round((len(self._done) - 1) / window, 2) if window > 0 else 0.0,
+            "models": {path: m.stats() for path, m in self._models.items()},
+        }
+
+    def serve_forever(self):
+        print(f"Inference server listening on {self.SOCKET_PATH}")
+        self._server.serve_forever(poll_interval=0.5)
+
+    def shutdown(self):
+        self._server.shutdown()
+        self._server.server_close()
+        for m in self._models.values():
+            m.batcher.close()
+        try:
+            os.unlink(self.SOCKET_PATH)
+        except FileNotFoundError:
+            pass
+
+
+# ------------------------------ client ------------------------------
+
+class InferenceClient:
+    """
+    Detections from a running InferenceServer for frames of one fixed shape.
+    detect(frame) -> (N, 6) x1, y1, x2, y2, conf, cls in frame pixels.
+    """
+
+    def __init__(self, model_path, frame_shape, conf=0.7, input_hw=None, socket_path=DEFAULT_SOCKET):
+        self.MODEL_PATH = model_path
+        self.SOCKET_PATH = socket_path
+        self.frame_shape = tuple(frame_shape)
+        self.conf = conf
+        self.input_hw = list(input_hw) if input_hw is not None else None
+        frame_bytes, total = shm_layout(self.frame_shape)
+        self._shm = shared_memory.SharedMemory(create=True, size=total)
+        self._frame = np.ndarray(self.frame_shape, dtype=np.uint8, buffer=self._shm.buf)
+        self._dets = np.ndarray((MAX_DET, 6), dtype=np.float32, buffer=self._shm.buf, offset=frame_bytes)
+        self._sock = None
+        try:
+            self._connect()
+        except Exception:
+            self.close()  # don't leak the segment when the daemon is down
+            raise
+
+    def _connect(self):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(self.SOCKET_PATH)
+        self._call({"op": "attach", "shm": self._shm.name, "shape": list(self.frame_shape),
+                    "model": self.MODEL_PATH, "conf": self.conf, "input_hw": self.input_hw})
+
+    def _call(self, msg):
+        send_msg(self._sock, msg)
+        reply = recv_msg(self._sock)
+        if reply is None:
+            raise ConnectionError("Inference server closed the connection")
+        if not reply.get("ok"):
+            raise RuntimeError(f"Inference server error: {reply.get('error')}")
+        return reply
+
+    def detect(self, frame):
+        np.copyto(self._frame, frame)
+        try:
+            n = self._call({"op": "detect"})["n"]
+        except (ConnectionError, BrokenPipeError, ConnectionResetError):
+            # daemon restarted: reattach once and retry
+            self._sock.close()
+            self._connect()
+            n = self._call({"op": "detect"})["n"]
+        return self._dets[:n].astype(np.float64)
+
+    def stats(self):
+        return self._call({"op": "stats"})["stats"]
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+        self._frame = self._dets = None
+        self._shm.close()
+        self._shm.unlink()
+
+
+def fetch_stats(socket_path=DEFAULT_SOCKET):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(socket_path)
+    try:
+        send_msg(sock, {"op": "stats"})
+        return recv_msg(sock)["stats"]
+    finally:
+        sock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--socket", default=DEFAULT_SOCKET)
+    parser.add_argument("--model", action="append", default=[], help="preload (repeatable)")
+    parser.add_argument("--device", type=int, default=0)
+    parser.add_argument("--no-half", action="store_true")
+    parser.add_argument("--stats", action="store_true", help="print a running daemon's stats and exit")
+    args = parser.parse_args()
+
+    if args.stats:
+        print(json.dumps(fetch_stats(args.socket), indent=2))
+    else:
+        app = InferenceServer(args.socket, device=args.device, half=not args.no_half)
+        for path in args.model:
+            app.model(path)
+        # systemd stop: shut the socket server down from another thread
+        signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=app.shutdown).start())
+        try:
+            app.serve_forever()
+        except KeyboardInterrupt:
+            app.shutdown()
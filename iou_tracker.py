@@ -0,0 +1,130 @@
+"""
+IoU + Hungarian tracker over NumPy arrays.
+
+A lighter alternative to ByteTrack for WorkerCounter (TRACKER = "iou"), and
+the array version of optimized_track.SimpleIOUTracker: instead of a Python
+loop over (detection, track) pairs with a scalar iou() and greedy matching,
+each frame computes the whole detection x track IoU matrix in one NumPy call
+and solves the assignment optimally (scipy's linear_sum_assignment). Tracks
+live in parallel arrays (boxes, per-frame velocity, ids, age, hits), and
+unmatched boxes coast on their last velocity for up to MAX_AGE frames.
+
+Same interface as tracking.ByteTrackAdapter: update(dets, frame_shape, img)
+with (N, 6) x1, y1, x2, y2, conf, cls detections returns the (xyxy, ids, conf,
+cls) arrays of the tracks matched or born this frame; advance() lets a frame
+go by without detections.
+"""
+import numpy as np
+
+from box_ops import iou_matrix
+from counting_engine import empty_detections
+
+
+class IOUTracker:
+    """Optimal IoU assignment between detections and array-held tracks."""
+
+    def __init__(self, iou_threshold=0.3, max_age=30, min_hits=1, velocity_smoothing=0.5, frame_rate=30):
+        self.IOU_THRESHOLD = iou_threshold    # below this a pair can't be matched
+        self.MAX_AGE = max_age                # frames a track coasts unmatched before it's dropped
+        self.MIN_HITS = min_hits              # matches before a new track is reported (1 = at once)
+        self.VELOCITY_SMOOTHING = velocity_smoothing  # weight of the old velocity in the update
+        self.frame_rate = frame_rate          # interface parity with ByteTrackAdapter; ages are in frames
+        self.boxes = np.zeros((0, 4))
+        self.vel = np.zeros((0, 4))           # box change per frame
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.cls = np.zeros(0, dtype=np.int64)
+        self.age = np.zeros(0, dtype=np.int64)  # frames since the last match
+        self.hits = np.zeros(0, dtype=np.int64)
+        self.next_id = 1
+        self._assign = None
+
+    def _linear_sum_assignment(self):
+        if self._assign is None:
+            try:
+                from scipy.optimize import linear_sum_assignment
+            except ImportError as e:
+                raise ImportError("IOUTracker needs scipy (pip install scipy)") from e
+            self._assign = linear_sum_assignment
+        return self._assign
+
+    def _predict(self):
+        """One frame on: coast every track on its velocity, age it, drop the expired."""
+        self.boxes = self.boxes + self.vel
+        self.age += 1
+        alive = self.age <= self.MAX_AGE
+        if not alive.all():
+            self.boxes, self.vel, self.ids = self.boxes[alive], self.vel[alive], self.ids[alive]
+            self.cls, self.age, self.hits = self.cls[alive], self.age[alive], self.hits[alive]
+
+    def match(self, det_boxes, det_cls):
+        """(det_idx, track_idx) pairs of the optimal assignment with IoU >= IOU_THRESHOLD, same class only."""
+        if len(det_boxes) == 0 or len(self.ids) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        iou = iou_matrix(det_boxes, self.boxes)
+        iou[det_cls[:, None] != self.cls[None, :]] = 0.0
+        ok = iou >= self.IOU_THRESHOLD
+        # a detection and a track that are each other's only candidate are matched in any
+        # optimal assignment; only the contested rest goes into the solver (with objects
+        # spread out, that is a small part of the frame)
+        row_deg, col_deg = ok.sum(axis=1), ok.sum(axis=0)
+        best = iou.argmax(axis=1)
+        single = (row_deg == 1) & (col_deg[best] == 1)
+        d_single = np.flatnonzero(single)
+        t_single = best[d_single]
+        rows = np.flatnonzero((row_deg > 0) & ~single)
+        if len(rows) == 0:
+            return d_single, t_single
+        contested = ok[rows].any(axis=0)
+        contested[t_single] = False
+        cols = np.flatnonzero(contested)
+        sub = iou[np.ix_(rows, cols)]
+        r, c = self._linear_sum_assignment()(np.where(sub >= self.IOU_THRESHOLD, 1.0 - sub, 2.0))
+        keep = sub[r, c] >= self.IOU_THRESHOLD
+        return np.concatenate([d_single, rows[r[keep]]]), np.concatenate([t_single, cols[c[keep]]])
+
+    def update(self, dets, frame_shape=None, img=None):
+        """dets: (N, 6) x1, y1, x2, y2, conf, cls in frame coordinates."""
+        dets = np.asarray(dets, dtype=np.float64).reshape(-1, 6)
+        self._predict()
+        det_boxes, det_cls = dets[:, :4], dets[:, 5].astype(np.int64)
+        d, t = self.match(det_boxes, det_cls)
+
+        # matched: move to the detection, blend the observed per-frame motion into the velocity
+        gap = self.age[t][:, None]  # frames since the previous match, >= 1
+        prev = self.boxes[t] - self.vel[t] * gap
+        a = self.VELOCITY_SMOOTHING
+        self.vel[t] = a * self.vel[t] + (1.0 - a) * (det_boxes[d] - prev) / gap
+        self.boxes[t] = det_boxes[d]
+        self.age[t] = 0
+        self.hits[t] += 1
+
+        # unmatched detections start new tracks
+        new = np.ones(len(dets), dtype=bool)
+        new[d] = False
+        n_new = int(new.sum())
+        if n_new:
+            self.boxes = np.concatenate([self.boxes, det_boxes[new]])
+            self.vel = np.concatenate([self.vel, np.zeros((n_new, 4))])
+            self.ids = np.concatenate([self.ids, np.arange(self.next_id, self.next_id + n_new)])
+            self.cls = np.concatenate([self.cls, det_cls[new]])
+            self.age = np.concatenate([self.age, np.zeros(n_new, dtype=np.int64)])
+            self.hits = np.concatenate([self.hits, np.ones(n_new, dtype=np.int64)])
+            self.next_id += n_new
+
+        # report tracks seen this frame, in detection order
+        det_idx = np.concatenate([d, np.flatnonzero(new)])
+        trk_idx = np.concatenate([t, np.arange(len(self.ids) - n_new, len(self.ids))])
+        shown = self.hits[trk_idx] >= self.MIN_HITS
+        det_idx, trk_idx = det_idx[shown], trk_idx[shown]
+        if len(trk_idx) == 0:
+            return empty_detections()
+        order = np.argsort(det_idx, kind="stable")
+        det_idx, trk_idx = det_idx[order], trk_idx[order]
+        return self.boxes[trk_idx].copy(), self.ids[trk_idx].copy(), dets[det_idx, 4], self.cls[trk_idx].copy()
+
+    def advance(self):
+        """A frame went by without detections: coast and age the tracks."""
+        self._predict()
+
+    def __len__(self):
+        return len(self.ids)
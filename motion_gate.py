@@ -0,0 +1,90 @@
+"""
+Cheap pre-stage that decides whether a frame needs a detector call.
+
+Only a horizontal band around the counting line (line +- hysteresis + margin)
+is looked at, downscaled and converted to gray into preallocated buffers:
+  - an exact duplicate of the previous band (frozen/repeated camera frame) is skipped
+  - otherwise the band is differenced against the previous one; if fewer than
+    MIN_CHANGED_FRAC of its pixels differ by more than DIFF_THRESH the band is
+    static and the frame is skipped (differencing rather than a running
+    background, which keeps "seeing" a roll after it has left the band)
+Every HEARTBEAT-th frame is always detected so tracks elsewhere in the image
+get refreshed before the tracker or TrackStore would expire them.
+"""
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """Frame-differencing gate over the counting band."""
+
+    def __init__(self,
+                 frame_shape,
+                 band,
+                 scale=0.25,
+                 diff_thresh=12,
+                 min_changed_frac=0.002,
+                 heartbeat=15):
+        h, w = frame_shape[:2]
+        self.frame_shape = tuple(frame_shape)
+        self.requested_band = tuple(band)
+        y0, y1 = max(0, int(band[0])), min(h, int(band[1]))
+        if y1 <= y0:
+            raise ValueError(f"Empty motion band {band} for frame height {h}")
+        self.band = (y0, y1)
+        self.DIFF_THRESH = diff_thresh
+        self.MIN_CHANGED_FRAC = min_changed_frac
+        self.HEARTBEAT = heartbeat
+
+        self._small_size = (max(1, int(w * scale)), max(1, int((y1 - y0) * scale)))
+        sw, sh = self._small_size
+        self._prev_band = np.zeros((y1 - y0, w) + tuple(frame_shape[2:]), dtype=np.uint8)
+        self._small = np.zeros((sh, sw) + tuple(frame_shape[2:]), dtype=np.uint8)
+        self._gray = np.zeros((sh, sw), dtype=np.uint8)
+        self._prev_gray = np.zeros((sh, sw), dtype=np.uint8)
+        self._diff = np.zeros((sh, sw), dtype=np.uint8)
+        self._primed = False
+        self._since_detect = 0
+
+        self.stats = {"frames": 0, "detected": 0, "skipped": 0, "duplicates": 0, "heartbeats": 0}
+
+    def should_detect(self, frame):
+        """True if the detector should run on this frame."""
+        stats = self.stats
+        stats["frames"] += 1
+        y0, y1 = self.band
+        band = frame[y0:y1]
+
+        duplicate = self._primed and np.array_equal(band, self._prev_band)
+        moving = False
+        if not duplicate:
+            np.copyto(self._prev_band, band)
+            cv2.resize(band, self._small_size, dst=self._small, interpolation=cv2.INTER_AREA)
+            if self._small.ndim == 3:
+                cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+            else:
+                np.copyto(self._gray, self._small)
+            if not self._primed:
+                self._primed = True
+                moving = True
+            else:
+                cv2.absdiff(self._gray, self._prev_gray, dst=self._diff)
+                changed = np.count_nonzero(self._diff > self.DIFF_THRESH)
+                moving = changed >= self.MIN_CHANGED_FRAC * self._diff.size
+            np.copyto(self._prev_gray, self._gray)
+
+        self._since_detect += 1
+        if moving:
+            run = True
+        elif self._since_detect >= self.HEARTBEAT:
+            stats["heartbeats"] += 1
+            run = True
+        else:
+            run = False
+            stats["skipped"] += 1
+            if duplicate:
+                stats["duplicates"] += 1
+        if run:
+            stats["detected"] += 1
+            self._since_detect = 0
+        return run
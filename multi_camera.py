@@ -0,0 +1,224 @@
+"""
+Several cameras in one process, one detector per model file.
+
+Each camera gets its own WorkerCounter (capture, reader thread, FrameRing,
+ByteTrack, TrackStore and counters), but counters built from the same model
+path share a single YOLO instance and a lock around its calls. model.track()
+keeps one tracker per model, so counters that share a model use the lean
+detect_track() path, where every counter feeds its own ByteTrack. A camera
+that has its model to itself keeps WorkerCounter's defaults.
+
+Camera config, one dict per camera:
+    {"name": "line-1", "source": "rtsp://...", "line_offset": 60,
+     "area_id": "...", "cls_id": 1, "model": "textile_model_worker1.engine"}
+Only "source" is required; "model" defaults to the runner's model_path.
+
+With batch=True the counters sharing a model submit their detector inputs to
+a shared BatchScheduler, so frames that are ready at the same time from
+different cameras go through the model as one batch. That needs a model that
+takes a batch: a .pt, or an export that runs a batch of the group's size when
+probed at warm-up. A fixed batch-1 export (the default .engine) is not
+batched; its calls are serialized on the model lock instead. With
+inference_socket no model is loaded here at all: detections come from
+inference_server.py.
+
+start() warms every counter's detector on blank frames before the counter
+threads start; ready is set once that is done, so callers can hold back
+reporting until the first real frame will be detected at full speed.
+"""
+import threading
+
+import numpy as np
+import torch
+from ultralytics import YOLO
+
+import improved_class
+from batch_scheduler import BatchScheduler
+
+
+class MultiCameraRunner:
+    """Runs one WorkerCounter per camera, sharing models between them."""
+
+    def __init__(self,
+                 model_path,
+                 cameras,
+                 conf_threshold=0.7,
+                 half=True,
+                 device=0,
+                 input_hw=None,
+                 batch=True,
+                 max_batch=None,
+                 max_wait=0.005,
+                 inference_socket=None):
+        if not cameras:
+            raise ValueError("MultiCameraRunner needs at least one camera")
+        self.MODEL_PATH = model_path
+        self._models = {}   # model path -> (YOLO, lock)
+        self.counters = {}
+        self.area_ids = {}
+        self._threads = {}
+        self.schedulers = {}  # model path -> BatchScheduler
+        self.ready = threading.Event()
+        self._batch = (max_batch, max_wait) if batch and not inference_socket else None
+
+        users = {}  # model path -> cameras on it
+        for cam in cameras:
+            path = cam.get("model", model_path)
+            users[path] = users.get(path, 0) + 1
+
+        for i, cam in enumerate(cameras):
+            name = cam.get("name") or cam.get("area_id") or f"cam{i}"
+            if name in self.counters:
+                raise ValueError(f"Duplicate camera name: {name}")
+            path = cam.get("model", model_path)
+            # with an inference daemon the model is loaded (and batched) there, not here
+            model, lock = (None, None) if inference_socket else self._model_for(path)
+            wc = improved_class.WorkerCounter(
+                model_path=path,
+                video_path=cam["source"],
+                line_offset=cam.get("line_offset", 60),
+                cls_id_to_count=cam.get("cls_id", 1),
+                conf_threshold=cam.get("conf_threshold", conf_threshold),
+                half=half,
+                device=device,
+                reader_mode=cam.get("reader_mode", "auto"),
+                model=model,
+                model_lock=lock,
+                inference_socket=inference_socket,
+            )
+            if users[path] > 1 and not inference_socket:
+                # a shared model can't keep one model.track() tracker per camera
+                wc.FUSED_PREPROCESS = True
+                wc.LEAN_INFERENCE = True
+                if not str(path).endswith(".pt"):
+                    wc.LEAN_INPUT_HW = (640, 640)  # fixed-shape export: frame padded to its square input
+            if input_hw is not None:
+                wc.LEAN_INPUT_HW = input_hw
+            wc.STREAM_NAME = name
+            self.counters[name] = wc
+            self.area_ids[name] = cam.get("area_id")
+            print(f"Camera {name}: {cam['source']} (model {path})")
+
+
+    def _attach_schedulers(self):
+        """Batch each shared model whose artifact takes a batch of its group's size (after warm-up)."""
+        max_batch, max_wait = self._batch
+        by_model = {}
+        for wc in self.counters.values():
+            by_model.setdefault(id(wc.model), []).append(wc)
+        for group in by_model.values():
+            if len(group) < 2:
+                continue
+            size = max_batch or len(group)
+            if self._accepts_batch(group[0], size):
+                self._attach_scheduler(group, size, max_wait)
+            else:
+                print(f"Batching off for {group[0].MODEL_PATH}: no batch of {size}, calls are serialized")
+
+    @staticmethod
+    def _accepts_batch(wc, size):
+        """.pt models take any batch; exports are probed with one batch of size blank frames."""
+        if str(wc.MODEL_PATH).endswith(".pt"):
+            return True
+        frame = np.zeros((wc.TARGET_H, wc.TARGET_W, 3), dtype=np.uint8)
+        x = wc._preprocessor_for(frame)(frame)
+        try:
+            return len(wc.infer_batch(torch.cat([x] * size))) == size
+        except Exception:
+            return False
+
+    def _attach_scheduler(self, group, max_batch, max_wait):
+        """One scheduler per shared model; NMS runs at the lowest threshold, each stream filters its own."""
+        lead = group[0]
+        conf = min(wc.CONF_THRESHOLD for wc in group)
+        scheduler = BatchScheduler(lambda x: lead.infer_batch(x, conf=conf),
+                                   max_batch=max_batch, max_wait=max_wait,
+                                   name=f"batcher-{lead.STREAM_NAME}")
+        for wc in group:
+            wc._batcher = scheduler
+        self.schedulers[lead.MODEL_PATH] = scheduler
+
+    def _model_for(self, path):
+        if path not in self._models:
+            self._models[path] = (YOLO(path, task='detect'), threading.Lock())
+        return self._models[path]
+
+    def warmup(self):
+        """Warm every counter's detector (the first one on a shared model pays for the load)."""
+        for wc in self.counters.values():
+            if not wc._warm:
+                wc.warmup()
+        if self._batch is not None and not self.schedulers:
+            self._attach_schedulers()
+        self.ready.set()
+
+    def wait_ready(self, timeout=None):
+        return self.ready.wait(timeout)
+
+    def start(self):
+        if not self.ready.is_set():
+            self.warmup()
+        for name, wc in self.counters.items():
+            if name in self._threads and self._threads[name].is_alive():
+                continue
+            if wc._batcher is not None:
+                wc._batcher.register(name)
+            t = threading.Thread(target=self._run_counter, args=(name, wc), name=f"counter-{name}", daemon=True)
+            self._threads[name] = t
+            t.start()
+
+    def _run_counter(self, name, wc):
+        try:
+            wc.run()
+        finally:
+            # a finished stream must not hold batches open waiting for it
+            if wc._batcher is not None:
+                wc._batcher.unregister(name)
+
+    def stop(self, timeout=2.0):
+        for wc in self.counters.values():
+            wc.stop()
+        for t in self._threads.values():
+            t.join(timeout=timeout)
+        for scheduler in self.schedulers.values():
+            scheduler.close()
+        for path, scheduler in self.schedulers.items():
+            print(f"Batching ({path}): {scheduler.get_stats()}")
+
+    def get_batch_stats(self):
+        """Per-model scheduler stats: fill ratio, queue wait, per-stream latency."""
+        return {path: s.get_stats() for path, s in self.schedulers.items()}
+
+    def get_counts(self):
+        """Per-camera snapshot: {name: {areaId, count, rcpm, rollsIn, workers, streamOk}}."""
+        counts = {}
+        for name, wc in self.counters.items():
+            counts[name] = {
+                "areaId": self.area_ids[name],
+                "count": int(wc.exit_count),
+                "rcpm": int(wc.rcpm),
+                "rollsIn": int(wc.rollsin),
+                "workers": dict(wc.workers),
+                "streamOk": bool(wc.stream_ok),
+            }
+        return counts
+
+
+if __name__ == "__main__":
+    import time
+
+    CAMERAS = [
+        {"name": "cam1", "source": "short.mkv", "line_offset": 60, "cls_id": 1},
+        {"name": "cam2", "source": "short.mkv", "line_offset": 40, "cls_id": 1},
+    ]
+    runner = MultiCameraRunner("textile_model_worker1.engine", CAMERAS)
+    runner.start()
+    try:
+        while any(t.is_alive() for t in runner._threads.values()):
+            time.sleep(5)
+            print(runner.get_counts())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        runner.stop()
+        print(runner.get_counts())
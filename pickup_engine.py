@@ -0,0 +1,115 @@
+"""
+Vectorized pickup rule for hand_class.WorkerCounter.
+
+A tracked object counts as picked up when, for the same track:
+  - contact: its IoU with some hand box is >= IOU_THRESH on each of the last
+    CONSEC_FRAMES frames
+  - lift: it moves up faster than V_UP_THRESH px/s, and its bottom edge rose
+    by >= LIFT_PIXELS over the last CONSEC_FRAMES samples
+  - occlusion (only with REQUIRE_OCCLUSION): its area shrank by >= OCC_FRAC
+    between the last two samples, a hand covering it
+
+All objects of a frame are evaluated at once: one object x hand IoU matrix
+and the rules as array predicates over TrackStore slots. Per-track state
+(history, contact ring, picked flag) lives in those slots and is retired with
+the track after TTL seconds unseen, so memory stays flat on a 24/7 stream.
+"""
+import numpy as np
+
+from box_ops import iou_matrix
+from counting_engine import box_geometry
+from track_store import TrackStore, CY, H, W
+
+
+class PickupEngine:
+    """Pickup rule state and evaluation for all tracks of one camera."""
+
+    def __init__(self, iou_thresh=0.20, v_up_thresh=60.0, lift_pixels=12, consec_frames=3, occ_frac=0.15,
+                 area_min=100, area_max=12000, ttl=3.0, capacity=256, hist_len=8):
+        self.IOU_THRESH = iou_thresh
+        self.V_UP_THRESH = v_up_thresh      # px/s upward (negative vy)
+        self.LIFT_PIXELS = lift_pixels      # min upward delta of bottom y
+        self.CONSEC_FRAMES = consec_frames
+        self.OCC_FRAC = occ_frac            # area shrink counted as occlusion
+        self.REQUIRE_OCCLUSION = False
+        self.AREA_MIN, self.AREA_MAX = area_min, area_max
+        if hist_len < max(2, consec_frames):
+            raise ValueError("hist_len must cover CONSEC_FRAMES samples")
+        self.store = TrackStore(capacity=capacity, hist_len=hist_len, ttl=ttl)
+        self.contact = np.zeros((0, consec_frames), dtype=bool)  # per slot: ring of the last touches
+        self.contact_head = np.zeros(0, dtype=np.int64)
+        self.contact_count = np.zeros(0, dtype=np.int64)
+        self.picked = np.zeros(0, dtype=bool)
+        self._grow()
+        self.pickups = 0
+
+    def _grow(self):
+        """Match the extra per-slot arrays to the store's capacity (it doubles when full)."""
+        old, cap = len(self.picked), self.store.capacity
+        if cap == old:
+            return
+        for name in ("contact", "contact_head", "contact_count", "picked"):
+            arr = getattr(self, name)
+            grown = np.zeros((cap,) + arr.shape[1:], dtype=arr.dtype)
+            grown[:old] = arr
+            setattr(self, name, grown)
+
+    def update(self, xyxy, ids, hand_xyxy, now):
+        """
+        One frame: tracked object boxes (N, 4) with their ids, hand boxes (M, 4).
+        Returns (ids, xyxy, ok, new): the objects that passed the area filter,
+        a mask of those meeting the pickup rule this frame, and the ids counted
+        as new pickups.
+        """
+        area, cx, cy, w, h = box_geometry(xyxy)
+        keep = (area >= self.AREA_MIN) & (area <= self.AREA_MAX)
+        xyxy, ids, cx, cy, w, h = xyxy[keep], ids[keep], cx[keep], cy[keep], w[keep], h[keep]
+        if len(ids) == 0:
+            return ids, xyxy, np.zeros(0, dtype=bool), ids
+
+        store = self.store
+        slots = store.update(ids, cx, cy, w, h, now)
+        self._grow()
+        fresh = store.age[slots] == 1  # slot (re)claimed this frame
+        if fresh.any():
+            s = slots[fresh]
+            self.contact[s] = False
+            self.contact_head[s] = 0
+            self.contact_count[s] = 0
+            self.picked[s] = False
+
+        # contact: ring of the last CONSEC_FRAMES touches per track
+        touch = (iou_matrix(xyxy, np.asarray(hand_xyxy, dtype=np.float64).reshape(-1, 4))
+                 >= self.IOU_THRESH).any(axis=1)
+        head = self.contact_head[slots]
+        self.contact[slots, head] = touch
+        self.contact_head[slots] = (head + 1) % self.CONSEC_FRAMES
+        self.contact_count[slots] = np.minimum(self.contact_count[slots] + 1, self.CONSEC_FRAMES)
+        contact_ok = (self.contact_count[slots] == self.CONSEC_FRAMES) & self.contact[slots].all(axis=1)
+
+        # lift: upward speed and bottom edge risen over the last CONSEC_FRAMES samples
+        vy = store.velocity(slots)[1]
+        enough = store.hist_count[slots] >= self.CONSEC_FRAMES
+        old = store.sample(slots, self.CONSEC_FRAMES - 1)
+        new = store.sample(slots, 0)
+        risen = (old[:, CY] + 0.5 * old[:, H]) - (new[:, CY] + 0.5 * new[:, H])
+        lift_ok = (vy < -self.V_UP_THRESH) & enough & (risen >= self.LIFT_PIXELS)
+
+        ok = contact_ok & lift_ok
+        if self.REQUIRE_OCCLUSION:
+            prev = store.sample(slots, 1)
+            prev_area = prev[:, W] * prev[:, H]
+            shrink = (prev_area - new[:, W] * new[:, H]) / np.maximum(prev_area, 1e-9)
+            ok &= (store.hist_count[slots] >= 2) & (prev_area > 0) & (shrink >= self.OCC_FRAC)
+
+        first = ok & ~self.picked[slots]
+        self.picked[slots[first]] = True
+        self.pickups += int(first.sum())
+        return ids, xyxy, ok, ids[first]
+
+    def purge(self, now):
+        """Retire tracks unseen for more than the TTL; returns their ids."""
+        return self.store.purge(now)
+
+    def __len__(self):
+        return len(self.store)
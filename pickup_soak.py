@@ -0,0 +1,165 @@
+"""
+Soak test: PickupEngine memory and per-frame cost over a long synthetic run.
+
+A synthetic line of tracked objects is generated frame by frame: fresh track
+ids forever (like ByteTrack), about --concurrent objects alive at a time, a
+share of them grabbed by a hand and lifted. The engine sees every frame
+at --fps timestamps. Python heap (tracemalloc, which also sees NumPy buffers)
+and live track state are sampled at checkpoints; the run fails if memory keeps
+growing after the first quarter.
+
+The first --check frames also go through the old per-pair hand_class logic
+(dicts and deques keyed by track id, never evicted) and must produce the same
+pickups; --legacy keeps it running for the whole soak to show its growth.
+
+    python pickup_soak.py [--frames 500000] [--concurrent 20] [--legacy]
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from collections import defaultdict, deque
+
+import numpy as np
+
+from pickup_engine import PickupEngine
+
+
+class LegacyPickup:
+    """The pre-engine hand_class pickup rule, one (object, hand) pair at a time."""
+
+    def __init__(self, e):
+        self.e = e
+        self.track_history = defaultdict(lambda: deque(maxlen=8))
+        self._contact_buf = defaultdict(lambda: deque(maxlen=e.CONSEC_FRAMES))
+        self.picked_ids = set()
+
+    @staticmethod
+    def _iou(a, b):
+        ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+        iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+        inter = ix * iy
+        union = max(0, a[2] - a[0]) * max(0, a[3] - a[1]) + max(0, b[2] - b[0]) * max(0, b[3] - b[1]) - inter
+        return inter / max(union, 1e-9)
+
+    def update(self, xyxy, ids, hands, now):
+        e, new = self.e, []
+        for (x1, y1, x2, y2), tid in zip(xyxy.tolist(), ids.tolist()):
+            area = abs(y2 - y1) * abs(x2 - x1)
+            if area < e.AREA_MIN or area > e.AREA_MAX:
+                continue
+            hist = self.track_history[tid]
+            hist.append((now, 0.5 * (x1 + x2), 0.5 * (y1 + y2), x2 - x1, y2 - y1))
+            vy = 0.0
+            if len(hist) >= 2:
+                vy = (hist[-1][2] - hist[-2][2]) / max(1e-3, hist[-1][0] - hist[-2][0])
+            buf = self._contact_buf[f"contact_{tid}"]
+            buf.append(any(self._iou((x1, y1, x2, y2), hb) >= e.IOU_THRESH for hb in hands.tolist()))
+            contact_ok = len(buf) == e.CONSEC_FRAMES and all(buf)
+            lifted = False
+            if len(hist) >= e.CONSEC_FRAMES:
+                _, _, cy_old, _, h_old = hist[-e.CONSEC_FRAMES]
+                _, _, cy_new, _, h_new = hist[-1]
+                lifted = (cy_old + 0.5 * h_old) - (cy_new + 0.5 * h_new) >= e.LIFT_PIXELS
+            if contact_ok and vy < -e.V_UP_THRESH and lifted and tid not in self.picked_ids:
+                self.picked_ids.add(tid)
+                new.append(tid)
+        return new
+
+
+class SyntheticLine:
+    """Objects appearing, sitting on the line, some grabbed and lifted, then leaving."""
+
+    def __init__(self, concurrent=20, pickup_share=0.3, fps=30.0, seed=0):
+        self.rng = np.random.default_rng(seed)
+        self.concurrent = concurrent
+        self.pickup_share = pickup_share
+        self.dt = 1.0 / fps
+        self.next_id = 1
+        self.objs = []  # [id, x, y, w, h, frames_left, lift_from, picked_by_hand]
+
+    def _spawn(self):
+        r = self.rng
+        life = int(r.integers(30, 150))
+        lift = r.random() < self.pickup_share
+        self.objs.append([self.next_id, r.uniform(0, 580), r.uniform(80, 300), r.uniform(30, 60), r.uniform(40, 80),
+                          life, int(life * r.uniform(0.3, 0.6)) if lift else -1, lift])
+        self.next_id += 1
+
+    def step(self):
+        """(xyxy (N, 4), ids (N,), hands (M, 4)) for the next frame."""
+        while len(self.objs) < self.concurrent:
+            self._spawn()
+        boxes, ids, hands = [], [], []
+        for o in self.objs:
+            o[5] -= 1
+            if o[6] >= 0 and o[5] <= o[6]:
+                o[2] -= 300.0 * self.dt  # lifted: up at 300 px/s
+            x, y, w, h = o[1], o[2], o[3], o[4]
+            boxes.append((x, y, x + w, y + h))
+            ids.append(o[0])
+            if o[7]:
+                hands.append((x + 0.1 * w, y + 0.1 * h, x + 0.8 * w, y + 0.7 * h))  # gripping hand
+        if self.rng.random() < 0.5:
+            x, y = self.rng.uniform(0, 600), self.rng.uniform(0, 320)
+            hands.append((x, y, x + 40, y + 40))  # a hand touching nothing
+        self.objs = [o for o in self.objs if o[5] > 0]
+        return (np.array(boxes, dtype=np.float64), np.array(ids, dtype=np.int64),
+                np.array(hands, dtype=np.float64).reshape(-1, 4))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=500000)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--concurrent", type=int, default=20)
+    parser.add_argument("--checkpoints", type=int, default=10)
+    parser.add_argument("--check", type=int, default=5000, help="frames compared against the old logic")
+    parser.add_argument("--legacy", action="store_true", help="run the old logic for the whole soak too")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="allowed heap growth after the first quarter")
+    args = parser.parse_args()
+
+    line = SyntheticLine(args.concurrent, fps=args.fps)
+    engine = PickupEngine()
+    legacy = LegacyPickup(engine)
+    every = max(1, args.frames // args.checkpoints)
+    mismatches, engine_sec, rows = 0, 0.0, []
+
+    tracemalloc.start()
+    for i in range(args.frames):
+        now = i / args.fps
+        xyxy, ids, hands = line.step()
+        t0 = time.perf_counter()
+        _ids, _boxes, _ok, new = engine.update(xyxy, ids, hands, now)
+        engine.purge(now)
+        engine_sec += time.perf_counter() - t0
+        if i < args.check:
+            if sorted(new.tolist()) != sorted(legacy.update(xyxy, ids, hands, now)):
+                mismatches += 1
+            if i == args.check - 1 and not args.legacy:
+                legacy = LegacyPickup(engine)  # done comparing; drop its state
+        elif args.legacy:
+            legacy.update(xyxy, ids, hands, now)
+        if (i + 1) % every == 0:
+            current, _peak = tracemalloc.get_traced_memory()
+            rows.append((i + 1, current / 1e6))
+            print(f"frame {i + 1:8d}  heap {current / 1e6:8.2f} MB  live tracks {len(engine):4d}  "
+                  f"slots {engine.store.capacity:4d}  pickups {engine.pickups:6d}"
+                  + (f"  old-logic tracks {len(legacy.track_history):7d}" if args.legacy else ""))
+    tracemalloc.stop()
+
+    print(f"{line.next_id - 1} tracks, {engine.pickups} pickups, "
+          f"{1e6 * engine_sec / args.frames:.1f} us/frame in the engine (under tracemalloc)")
+    checked = min(args.check, args.frames)
+    print(f"old logic agreed on {checked - mismatches}/{checked} frames")
+    if args.legacy:
+        # the old logic's dicts share the heap, so this shows its growth, not the engine's
+        print(f"heap with the old logic running: {rows[0][1]:.2f} MB -> {rows[-1][1]:.2f} MB")
+        sys.exit(0 if mismatches == 0 else 1)
+    base = rows[len(rows) // 4][1]
+    top = max(r[1] for r in rows[len(rows) // 4:])
+    growth = (top - base) / max(base, 1e-9)
+    flat = growth <= args.tolerance
+    print(f"heap after the first quarter: {base:.2f} MB -> max {top:.2f} MB ({growth:+.1%}) -> "
+          f"{'flat' if flat else 'GROWING'}")
+    sys.exit(0 if flat and mismatches == 0 else 1)
@@ -0,0 +1,143 @@
+"""
+Benchmark: threaded WorkerCounter vs the multiprocess ProcessPipeline on a
+recorded clip, end-to-end.
+
+Both layouts replay the whole clip losslessly (every frame once, PTS time) and
+report frames/s between the first and last counted frame (model load and
+process start-up excluded) and the latency from a frame being published
+(resized into its ring slot) to its detections being counted. --print-load
+adds a thread that prints continuously in the counting process, standing in
+for a chatty sender.
+
+    python pipeline_benchmark.py --model textile_model_worker1.pt --clip recorded.mp4 [--print-load]
+
+--check needs neither: it feeds synthetic tracked detections through
+ProcessPipeline's counting loop (the main-process side, no child processes)
+and compares the counts with WorkerCounter's own counting on the same boxes.
+
+    python pipeline_benchmark.py --check [--frames 300]
+"""
+import argparse
+import contextlib
+import io
+import queue
+import threading
+import time
+
+import numpy as np
+
+import improved_class
+from process_pipeline import ProcessPipeline
+
+
+def print_load(stop):
+    sink = io.StringIO()
+    while not stop.is_set():
+        print("x" * 200, file=sink)
+        sink.seek(0)
+        sink.truncate()
+
+
+def run_threaded(model_path, clip):
+    wc = improved_class.WorkerCounter(model_path, clip, reader_mode="lossless")
+    wc.STRIDE_ENABLE = False  # not available in the process layout
+    published = {}
+    ring_publish, process_frame = wc._ring.publish, wc._process_frame
+    latency, done_at = [], []
+
+    def publish(idx, ts):
+        published[ts] = time.monotonic()
+        return ring_publish(idx, ts)
+
+    def timed_process(frame, line_y, now=None):
+        out = process_frame(frame, line_y, now)
+        t_pub = published.pop(now, None)
+        if t_pub is not None:  # frames published before the patch are not timed
+            done_at.append(time.monotonic())
+            latency.append(done_at[-1] - t_pub)
+        return out
+
+    wc._ring.publish, wc._process_frame = publish, timed_process
+    with contextlib.redirect_stdout(io.StringIO()):
+        wc.run()
+    elapsed = done_at[-1] - done_at[0]
+    lat = np.asarray(latency) * 1000.0
+    return {"frames": len(latency), "fps": round((len(latency) - 1) / elapsed, 2),
+            "latency_mean_ms": round(float(lat.mean()), 2), "latency_p95_ms": round(float(np.percentile(lat, 95)), 2),
+            "count": wc.exit_count}
+
+
+def run_processes(model_path, clip):
+    p = ProcessPipeline(model_path, clip, reader_mode="lossless")
+    p.start()
+    p.wait()
+    p.stop()
+    if p.error is not None:
+        raise RuntimeError(f"process pipeline counting failed: {p.error!r}")
+    return {**p.get_pipeline_stats(), "count": p.exit_count}
+
+
+def check_counting(frames, n_objects=5):
+    """Synthetic detections through ProcessPipeline.run() vs WorkerCounter._count_detections()."""
+    from counting_benchmark import SyntheticBoxes, make_engine_counter, synthetic_stream
+    from counting_engine import boxes_to_arrays
+
+    p = ProcessPipeline("model.pt", "synthetic.mp4", reader_mode="lossless", device=-1)
+    ref = make_engine_counter()
+    t = threading.Thread(target=p.run, daemon=True)
+    t.start()
+
+    def feed(msg):
+        while t.is_alive():  # a dead counting thread would leave the queue full
+            try:
+                p.det_q.put(msg, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        for seq, (now, data) in enumerate(synthetic_stream(n_objects, frames, p.line_y)):
+            boxes = SyntheticBoxes(data)
+            dets = boxes_to_arrays(boxes)
+            if not feed((seq, now, time.monotonic(), dets, len(boxes))):
+                break
+            ref.rollsin = len(boxes)
+            ref._count_detections(dets, None, p.line_y, now)
+            ref.get_counts_last(now)
+            ref._purge_old_tracks(now)
+        feed(None)
+        t.join(30.0)
+    p.stop()
+    got = {"frames": p.frames, "exit": p.exit_count, "rollsin": p.rollsin, "workers": p.workers}
+    want = {"frames": frames, "exit": ref.exit_count, "rollsin": ref.rollsin, "workers": ref.workers}
+    ok = p.error is None and got == want
+    print(f"process pipeline counting: {got}, WorkerCounter: {want} -> {'ok' if ok else 'MISMATCH'}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model")
+    parser.add_argument("--clip")
+    parser.add_argument("--print-load", action="store_true")
+    parser.add_argument("--check", action="store_true", help="synthetic counting check, no model or clip")
+    parser.add_argument("--frames", type=int, default=300, help="frames for --check")
+    args = parser.parse_args()
+    if args.check:
+        raise SystemExit(0 if check_counting(args.frames) else 1)
+    if not args.model or not args.clip:
+        parser.error("--model and --clip are required (or --check)")
+
+    stop = threading.Event()
+    if args.print_load:
+        threading.Thread(target=print_load, args=(stop,), daemon=True).start()
+    try:
+        threaded = run_threaded(args.model, args.clip)
+        print(f"threads:   {threaded}")
+        processes = run_processes(args.model, args.clip)
+        print(f"processes: {processes}")
+    finally:
+        stop.set()
+    print(f"speed-up {processes['fps'] / max(threaded['fps'], 1e-9):.2f}x, "
+          f"counts {'agree' if processes['count'] == threaded['count'] else 'differ'}")
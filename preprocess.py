@@ -0,0 +1,70 @@
+"""
+Fused, allocation-free detector input for WorkerCounter.
+
+ultralytics turns every BGR frame into a model input with fresh allocations:
+letterbox to a 640x640 square, BGR->RGB, HWC->CHW, contiguous copy, float
+and /255. For the 640x360 processing frame that is 44% padding.
+
+FusedPreprocessor keeps one (1, 3, H', W') float32 input buffer, H'/W' being
+the frame size rounded up to the model stride (640x360 -> 640x384). The pad
+rows are written once; each frame is swapped to RGB, transposed and scaled
+into the top-left of the buffer in a single NumPy pass. The buffer is handed
+to model.track() as a BCHW tensor, which ultralytics uses as-is (no letterbox),
+so boxes come back directly in frame coordinates. A fixed-shape export can
+be given its own input_hw (e.g. 640x640): the frame still sits top-left and
+only the padding grows.
+
+On CUDA the host buffer is pinned and copied into a preallocated device
+tensor (half when requested) without blocking.
+"""
+import math
+
+import cv2
+import numpy as np
+import torch
+
+
+class FusedPreprocessor:
+    """BGR uint8 frames -> normalized RGB CHW tensor in a reused buffer."""
+
+    def __init__(self, frame_shape, stride=32, half=False, device="cpu", pad_value=114, input_hw=None):
+        h, w = frame_shape[:2]
+        self.frame_hw = (h, w)
+        if input_hw is None:
+            input_hw = (math.ceil(h / stride) * stride, math.ceil(w / stride) * stride)
+        if input_hw[0] < h or input_hw[1] < w:
+            raise ValueError(f"Model input {input_hw} is smaller than the frame {self.frame_hw}")
+        self.input_hw = tuple(input_hw)
+        shape = (1, 3) + self.input_hw
+        self.device = torch.device(device if isinstance(device, str) else f"cuda:{device}")
+        on_cuda = self.device.type == "cuda"
+
+        if on_cuda:
+            host = torch.empty(shape, dtype=torch.float32, pin_memory=True)
+            self._host = host.numpy()
+            self._host_t = host
+            self.tensor = torch.empty(shape, dtype=torch.float16 if half else torch.float32, device=self.device)
+        else:
+            self._host = np.empty(shape, dtype=np.float32)
+            self._host_t = torch.from_numpy(self._host)  # shares memory, no copy per frame
+            self.tensor = self._host_t
+        self._host.fill(pad_value / 255.0)
+        self._view = self._host[0, :, :h, :w]
+        self._resized = np.empty((h, w, 3), dtype=np.uint8)
+        self._scale = np.float32(1.0 / 255.0)
+
+    def fill(self, frame):
+        """Write frame into the host buffer (resized first if it is not frame_hw)."""
+        if frame.shape[:2] != self.frame_hw:
+            cv2.resize(frame, self.frame_hw[::-1], dst=self._resized)
+            frame = self._resized
+        # BGR->RGB, HWC->CHW and /255 in one strided pass
+        np.multiply(frame[..., ::-1].transpose(2, 0, 1), self._scale, out=self._view)
+        return self._host
+
+    def __call__(self, frame):
+        """Model input for frame; valid until the next call."""
+        self.fill(frame)
+        if self.tensor is not self._host_t:
+            self.tensor.copy_(self._host_t, non_blocking=True)
+        return self.tensor
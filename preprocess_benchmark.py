@@ -0,0 +1,107 @@
+"""
+CPU benchmark: detector input preparation, current path vs FusedPreprocessor.
+
+  current: run() resizes to 640x360 (new array), ultralytics letterboxes it to
+           640x640, swaps BGR->RGB, transposes to CHW, makes it contiguous,
+           converts to float and divides by 255 (a new array at every step)
+  fused:   resize into a reused 640x360 buffer, then one pass into the reused
+           stride-padded 640x384 float CHW buffer
+
+Both outputs are checked to hold the same pixels where they overlap. Reports
+time, peak allocation (tracemalloc) and input pixels the detector has to run on.
+
+    python preprocess_benchmark.py [--width 2560 --height 1440] [--frames 200]
+"""
+import argparse
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+import torch
+
+from preprocess import FusedPreprocessor
+
+
+TARGET_W, TARGET_H = 640, 360
+IMGSZ = 640
+
+
+def letterbox(im, size=IMGSZ, pad_value=114):
+    """Square letterbox the way ultralytics does it for a fixed-shape model."""
+    h, w = im.shape[:2]
+    r = min(size / h, size / w)
+    nw, nh = round(w * r), round(h * r)
+    if (nw, nh) != (w, h):
+        im = cv2.resize(im, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    dw, dh = (size - nw) / 2, (size - nh) / 2
+    top, bottom = round(dh - 0.1), round(dh + 0.1)
+    left, right = round(dw - 0.1), round(dw + 0.1)
+    return cv2.copyMakeBorder(im, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(pad_value,) * 3), top
+
+
+def current_path(frame):
+    small = cv2.resize(frame, (TARGET_W, TARGET_H))
+    im, top = letterbox(small)
+    im = np.stack([im])
+    im = im[..., ::-1].transpose((0, 3, 1, 2))
+    im = np.ascontiguousarray(im)
+    im = torch.from_numpy(im)
+    im = im.float()
+    im /= 255
+    return im, top
+
+
+def fused_path(frame, pre, buf):
+    cv2.resize(frame, (TARGET_W, TARGET_H), dst=buf)
+    return pre(buf), 0
+
+
+def measure(name, fn, frames, sample_frames=20):
+    fn(frames[0])  # warm-up
+    t = time.perf_counter()
+    for frame in frames:
+        fn(frame)
+    dt = (time.perf_counter() - t) / len(frames)
+
+    tracemalloc.start()
+    peaks = []
+    for frame in frames[:sample_frames]:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        out = fn(frame)
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+        del out
+    tracemalloc.stop()
+    print(f"{name:7s} | {1e3 * dt:7.3f} ms/frame | {np.median(peaks) / 1e6:7.2f} MB allocated/frame")
+    return dt
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--width", type=int, default=2560)
+    parser.add_argument("--height", type=int, default=1440)
+    parser.add_argument("--frames", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 255, (args.height, args.width, 3), dtype=np.uint8) for _ in range(4)]
+    frames = [frames[i % 4] for i in range(args.frames)]
+
+    buf = np.empty((TARGET_H, TARGET_W, 3), dtype=np.uint8)
+    pre = FusedPreprocessor(buf.shape, device="cpu")
+
+    ref, top = current_path(frames[0])
+    out, _ = fused_path(frames[0], pre, buf)
+    ref = np.asarray(ref)[0, :, top:top + TARGET_H]
+    err = np.abs(ref - np.asarray(out)[0, :, :TARGET_H]).max()
+    if err > 1e-6:
+        raise ValueError(f"Fused input differs from the current path (max abs error {err})")
+
+    print(f"Preprocess benchmark (CPU): {args.width}x{args.height} -> detector input, {args.frames} frames")
+    t_cur = measure("current", lambda f: current_path(f), frames)
+    t_fused = measure("fused", lambda f: fused_path(f, pre, buf), frames)
+    ih, iw = pre.input_hw
+    print(f"detector input: current {IMGSZ}x{IMGSZ} ({IMGSZ * IMGSZ} px), "
+          f"fused {iw}x{ih} ({iw * ih} px, {100 * (1 - iw * ih / IMGSZ ** 2):.0f}% fewer)")
+    print(f"speed-up: {t_cur / t_fused:.2f}x")
@@ -0,0 +1,465 @@
+"""
+Optional multiprocess layout for WorkerCounter, one camera per pipeline:
+
+  decode process     capture -> resize into a shared-memory frame slot
+  inference process  slot -> motion gate -> lean detect+track -> detection queue
+  main process       detections -> counting (TrackStore, crossings), plus
+                     whatever reads the counts (test_server's Socket.IO sender)
+
+Frames never get pickled: SharedFrameRing keeps its slots in one
+multiprocessing.shared_memory block and only slot indices travel through
+queues (free slots one way, published slots the other). Detections travel as
+small NumPy arrays. A slow print or emit in the main process no longer holds
+the GIL that decode and inference need.
+
+Live sources drop frames in the decode process when no slot is free (grab()
+without retrieve(), like the on_demand reader); files are replayed losslessly
+with the stream PTS as the frame time. The adaptive stride needs TrackStore
+next to the detector and is not used here; the motion gate runs in the
+inference process.
+
+Processes are started with "spawn" (CUDA does not survive fork) as daemons.
+Children ignore SIGINT and turn SIGTERM into a clean stop, so systemd's
+control-group SIGTERM, or stop() from the parent, shuts everything down and
+the shared memory is unlinked by the parent.
+"""
+import multiprocessing as mp
+import queue
+import signal
+import threading
+import time
+from collections import deque
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from capture_supervisor import CaptureSupervisor, open_stream
+
+
+READER_KEYS = ("grabbed", "decoded", "dropped")
+CAPTURE_KEYS = ("outages", "reconnects", "outage_sec_total", "last_outage_sec", "frames_lost", "healthy")
+STAT_KEYS = READER_KEYS + CAPTURE_KEYS
+
+
+class SharedFrameRing:
+    """Fixed-shape frame slots in shared memory, handed between processes by index."""
+
+    def __init__(self, shape, slots=4, ctx=None):
+        ctx = ctx or mp.get_context("spawn")
+        self.shape = tuple(shape)
+        self.slots = slots
+        self._shm = shared_memory.SharedMemory(create=True, size=int(np.prod(self.shape)) * slots)
+        self._owner = True
+        self.free = ctx.Queue()
+        self.ready = ctx.Queue()
+        for i in range(slots):
+            self.free.put(i)
+        self._attach()
+
+    def _attach(self):
+        self.buffers = np.ndarray((self.slots,) + self.shape, dtype=np.uint8, buffer=self._shm.buf)
+
+    def __getstate__(self):
+        return {"name": self._shm.name, "shape": self.shape, "slots": self.slots,
+                "free": self.free, "ready": self.ready}
+
+    def __setstate__(self, state):
+        self.shape, self.slots = state["shape"], state["slots"]
+        self.free, self.ready = state["free"], state["ready"]
+        self._shm = shared_memory.SharedMemory(name=state["name"])
+        self._owner = False
+        self._attach()
+
+    def acquire_write(self, timeout=None):
+        """Free slot index; None on timeout (timeout=0: don't wait)."""
+        try:
+            return self.free.get_nowait() if timeout == 0 else self.free.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def publish(self, idx, seq, ts, t_decoded):
+        self.ready.put((idx, seq, ts, t_decoded))
+
+    def end(self):
+        """No more frames (end of file or shutdown)."""
+        self.ready.put(None)
+
+    def acquire_read(self, timeout=None):
+        """(idx, seq, ts, t_decoded), None at the end of the stream, or False on timeout."""
+        try:
+            return self.ready.get(timeout=timeout)
+        except queue.Empty:
+            return False
+
+    def release(self, idx):
+        self.free.put(idx)
+
+    def close(self):
+        self.buffers = None
+        self._shm.close()
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _child_signals(stop):
+    # Ctrl-C goes to the parent, which stops us; SIGTERM (systemd) stops us directly
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+
+def _decode_main(source, lossless, ring, stop, shared_stats, stale_sec):
+    _child_signals(stop)
+    stats = dict.fromkeys(READER_KEYS, 0)
+
+    def export(cap):
+        for i, k in enumerate(READER_KEYS):
+            shared_stats[i] = stats[k]
+        cap_stats = cap.get_stats() if isinstance(cap, CaptureSupervisor) else {"healthy": True}
+        for i, k in enumerate(CAPTURE_KEYS, len(READER_KEYS)):
+            shared_stats[i] = float(cap_stats.get(k, 0))
+
+    h, w = ring.shape[:2]
+    if lossless:
+        cap = open_stream(source, stale_sec)
+        if not cap.isOpened():
+            print(f"Cannot open video file: {source}")
+            ring.end()
+            return
+    else:
+        try:
+            cap = CaptureSupervisor(lambda: open_stream(source, stale_sec), stale_sec=stale_sec, stop_event=stop)
+        except IOError:
+            print(f"Cannot open video file: {source}")
+            ring.end()
+            return
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    seq, last_pts = 0, None
+    try:
+        while not stop.is_set():
+            if lossless:
+                ok, frame = cap.read()
+                if not ok:
+                    break  # end of file
+                stats["grabbed"] += 1
+                idx = None
+                while idx is None and not stop.is_set():
+                    idx = ring.acquire_write(timeout=0.1)  # backpressure
+                if idx is None:
+                    break
+                pts = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+                if last_pts is not None and pts <= last_pts:
+                    pts = last_pts + 1.0 / fps  # container without usable PTS
+                last_pts = ts = pts
+            else:
+                if not cap.grab():
+                    time.sleep(0.01)
+                    continue
+                stats["grabbed"] += 1
+                idx = ring.acquire_write(timeout=0)
+                if idx is None:
+                    stats["dropped"] += 1  # inference still busy with every slot
+                    continue
+                ok, frame = cap.retrieve()
+                if not ok:
+                    stats["dropped"] += 1
+                    ring.release(idx)
+                    continue
+                ts = time.time()
+            stats["decoded"] += 1
+            cv2.resize(frame, (w, h), dst=ring.buffers[idx])
+            ring.publish(idx, seq, ts, time.monotonic())
+            seq += 1
+            if seq % 30 == 0:
+                export(cap)
+    finally:
+        export(cap)
+        ring.end()
+        cap.release()
+        ring.close()
+
+
+def _inference_main(model_path, opts, ring, det_q, stop, ready):
+    _child_signals(stop)
+    from ultralytics import YOLO
+    import improved_class
+
+    wc = improved_class.WorkerCounter.__new__(improved_class.WorkerCounter)
+    wc.CLS_ID_TO_COUNT = opts["cls_id"]
+    wc.CONF_THRESHOLD = opts["conf_threshold"]
+    wc.HALF = opts["half"]
+    wc.DEVICE = opts["device"]
+    wc.device = opts["torch_device"]
+    wc._init_counting_state()
+    wc.model = YOLO(model_path, task='detect')
+    wc._model_lock = threading.Lock()
+    wc.FUSED_PREPROCESS = True
+    wc.LEAN_INFERENCE = True
+    wc.LEAN_INPUT_HW = opts["input_hw"]
+    wc.STREAM_NAME = opts["name"]
+    wc.warmup()
+    ready.set()
+    line_y = opts["line_y"]
+
+    def put(msg):
+        while not stop.is_set():
+            try:
+                det_q.put(msg, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    try:
+        while not stop.is_set():
+            got = ring.acquire_read(timeout=0.1)
+            if got is False:
+                continue
+            if got is None:
+                break
+            idx, seq, ts, t_decoded = got
+            frame = ring.buffers[idx]
+            try:
+                if wc.MOTION_GATE and not wc._gate_for(frame, line_y).should_detect(frame):
+                    wc._advance_tracker_clock()
+                    dets = None
+                else:
+                    dets = wc.detect_track(frame)
+                    if dets is None:
+                        dets = ()  # detector ran, nothing tracked
+            finally:
+                ring.release(idx)
+            put((seq, ts, t_decoded, dets, wc.rollsin))
+    finally:
+        put(None)
+        ring.close()
+
+
+class ProcessPipeline:
+    """
+    One camera as decode + inference processes; counting runs in this process
+    on a thread. Exposes the counters test_server reads from a WorkerCounter.
+    """
+
+    def __init__(self,
+                 model_path,
+                 video_path,
+                 line_offset=60,
+                 cls_id_to_count=1,
+                 conf_threshold=0.7,
+                 half=True,
+                 device=0,
+                 reader_mode="auto",
+                 slots=4,
+                 input_hw=None,
+                 name="cam0"):
+        import improved_class
+        import torch
+
+        self.MODEL_PATH = model_path
+        self.VIDEO_PATH = video_path
+        self.name = name
+        mode = improved_class.WorkerCounter._resolve_reader_mode(reader_mode, video_path)
+        self.lossless = mode == "lossless"
+
+        # counting state only: no model, no capture in this process
+        c = self.counter = improved_class.WorkerCounter.__new__(improved_class.WorkerCounter)
+        c.CLS_ID_TO_COUNT = cls_id_to_count
+        c.CONF_THRESHOLD = conf_threshold
+        c._init_counting_state()
+        c.STRIDE_ENABLE = False
+        self.line_y = int((c.TARGET_H / 2) - line_offset)
+
+        if input_hw is None and not str(model_path).endswith(".pt"):
+            input_hw = (640, 640)  # fixed-shape export: frame padded to its square input
+        torch_device = f"cuda:{device}" if torch.cuda.is_available() and device >= 0 else "cpu"
+        self._opts = {"cls_id": cls_id_to_count, "conf_threshold": conf_threshold, "half": half and torch_device != "cpu",
+                      "device": device, "torch_device": torch_device, "input_hw": input_hw, "line_y": self.line_y,
+                      "name": name}
+
+        self.ctx = mp.get_context("spawn")
+        self.ring = SharedFrameRing((c.TARGET_H, c.TARGET_W, 3), slots=slots, ctx=self.ctx)
+        self.det_q = self.ctx.Queue(maxsize=64)
+        self.stop_event = self.ctx.Event()
+        self.ready_event = self.ctx.Event()  # set by the inference process after its warm-up
+        self._shared_stats = self.ctx.Array("d", len(STAT_KEYS))
+        self._shared_stats[STAT_KEYS.index("healthy")] = 1.0
+        self._procs = []
+        self._thread = None
+        self.error = None       # exception that ended the counting thread
+
+        self.frames = 0
+        self.latency = deque(maxlen=1024)   # published -> counted, seconds
+        self.first_at = None    # first / last frame counted
+        self.last_at = None
+
+    def start(self):
+        self._procs = [
+            self.ctx.Process(target=_decode_main, name=f"decode-{self.name}", daemon=True,
+                             args=(self.VIDEO_PATH, self.lossless, self.ring, self.stop_event,
+                                   self._shared_stats, 5.0)),
+            self.ctx.Process(target=_inference_main, name=f"inference-{self.name}", daemon=True,
+                             args=(self.MODEL_PATH, self._opts, self.ring, self.det_q, self.stop_event,
+                                   self.ready_event)),
+        ]
+        for p in self._procs:
+            p.start()
+        self._thread = threading.Thread(target=self.run, name=f"counting-{self.name}", daemon=True)
+        self._thread.start()
+
+    def run(self):
+        """Counting loop: consume detections until the inference process ends."""
+        try:
+            self._count_loop()
+        except Exception as e:
+            # a dead counting thread would otherwise leave the counts frozen without a word
+            self.error = e
+            print(f"Pipeline {self.name}: counting stopped: {e!r}")
+            self.stop_event.set()
+            raise
+
+    def _count_loop(self):
+        c = self.counter
+        while not self.stop_event.is_set():
+            try:
+                msg = self.det_q.get(timeout=0.2)
+            except queue.Empty:
+                if not any(p.is_alive() for p in self._procs):
+                    break
+                continue
+            if msg is None:
+                break
+            _seq, ts, t_decoded, dets, rollsin = msg
+            now = ts
+            if dets is not None:
+                c.rollsin = rollsin
+                if len(dets):
+                    c._count_detections(dets, None, self.line_y, now)
+                    c.get_counts_last(now)
+            c._purge_old_tracks(now)
+            self.frames += 1
+            self.last_at = time.monotonic()
+            if self.first_at is None:
+                self.first_at = self.last_at
+            self.latency.append(self.last_at - t_decoded)
+
+    def wait_ready(self, timeout=None):
+        """True once the inference process has loaded and warmed its model; False if it died or timed out."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.ready_event.wait(0.2):
+            if self._procs and not self._procs[1].is_alive():
+                return False
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+        return True
+
+    def wait(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stop(self, timeout=5.0):
+        self.stop_event.set()
+        for p in self._procs:
+            p.join(timeout)
+            if p.is_alive():
+                p.terminate()
+                p.join(1.0)
+        self.wait(1.0)
+        self.ring.close()
+
+    # --------------- WorkerCounter-compatible surface ----------------
+
+    @property
+    def exit_count(self):
+        return self.counter.exit_count
+
+    @property
+    def rcpm(self):
+        return self.counter.rcpm
+
+    @property
+    def rollsin(self):
+        return self.counter.rollsin
+
+    @property
+    def workers(self):
+        return self.counter.workers
+
+    @property
+    def stream_ok(self):
+        return bool(self._shared_stats[STAT_KEYS.index("healthy")])
+
+    def get_capture_stats(self):
+        return {k: self._shared_stats[i] for i, k in enumerate(STAT_KEYS)}
+
+    def get_pipeline_stats(self):
+        """End-to-end FPS (first to last counted frame) and published->counted latency (ms)."""
+        elapsed = self.last_at - self.first_at if self.frames > 1 else 0.0
+        lat = np.asarray(self.latency) * 1000.0
+        return {
+            "frames": self.frames,
+            "fps": round((self.frames - 1) / elapsed, 2) if elapsed > 0 else 0.0,
+            "latency_mean_ms": round(float(lat.mean()), 2) if len(lat) else 0.0,
+            "latency_p95_ms": round(float(np.percentile(lat, 95)), 2) if len(lat) else 0.0,
+        }
+
+
+class MultiProcessRunner:
+    """MultiCameraRunner's interface over one ProcessPipeline per camera."""
+
+    def __init__(self, model_path, cameras, conf_threshold=0.7, half=True, device=0, input_hw=None):
+        if not cameras:
+            raise ValueError("MultiProcessRunner needs at least one camera")
+        self.counters = {}
+        self.area_ids = {}
+        for i, cam in enumerate(cameras):
+            name = cam.get("name") or cam.get("area_id") or f"cam{i}"
+            if name in self.counters:
+                raise ValueError(f"Duplicate camera name: {name}")
+            self.counters[name] = ProcessPipeline(
+                cam.get("model", model_path),
+                cam["source"],
+                line_offset=cam.get("line_offset", 60),
+                cls_id_to_count=cam.get("cls_id", 1),
+                conf_threshold=cam.get("conf_threshold", conf_threshold),
+                half=half,
+                device=device,
+                reader_mode=cam.get("reader_mode", "auto"),
+                input_hw=input_hw,
+                name=name,
+            )
+            self.area_ids[name] = cam.get("area_id")
+
+    def start(self):
+        for p in self.counters.values():
+            p.start()
+
+    def wait_ready(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for p in self.counters.values():
+            left = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not p.wait_ready(left):
+                return False
+        return True
+
+    def stop(self, timeout=5.0):
+        for p in self.counters.values():
+            p.stop(timeout)
+        for name, p in self.counters.items():
+            print(f"Pipeline {name}: {p.get_pipeline_stats()}")
+
+    def get_counts(self):
+        counts = {}
+        for name, p in self.counters.items():
+            counts[name] = {
+                "areaId": self.area_ids[name],
+                "count": int(p.exit_count),
+                "rcpm": int(p.rcpm),
+                "rollsIn": int(p.rollsin),
+                "workers": dict(p.workers),
+                "streamOk": p.stream_ok,
+            }
+        return counts
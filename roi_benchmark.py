@@ -0,0 +1,131 @@
+"""
+Benchmark: full-frame detect+track vs ROI crops (band around the line, or lanes)
+batched at a smaller input size, on a recorded clip.
+
+Every frame of the clip goes through WorkerCounter._process_frame once per
+mode (motion gate and stride off, timestamps from the clip PTS), so the two
+runs see identical input. Reports detector+counting ms/frame and whether the
+exit/entry counts agree. --cascade adds a third run with the small model in
+front of the full one (cascade.py) and prints how often it escalated.
+
+    python roi_benchmark.py --model textile_model_worker1.pt --clip recorded.mp4
+        [--imgsz 320] [--margin 90] [--rects "0,120,320,300;320,120,640,300"]
+        [--cascade textile_model_worker_fast.pt]
+
+Lanes in --rects are in the 640x360 processing frame. A TensorRT .engine has a
+fixed input size, so use a .pt/.onnx model (or an engine exported at --imgsz).
+"""
+import argparse
+import contextlib
+import io
+import threading
+import time
+
+import cv2
+import numpy as np
+import torch
+from ultralytics import YOLO
+
+import improved_class
+
+
+def load_clip(path, width, height, max_frames=None):
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video file: {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    frames, stamps = [], []
+    while max_frames is None or len(frames) < max_frames:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(cv2.resize(frame, (width, height)))
+        stamps.append(len(stamps) / fps)
+    cap.release()
+    return frames, stamps
+
+
+def make_counter(model_path, cls_id, conf, half, device, roi, cascade=None):
+    wc = improved_class.WorkerCounter.__new__(improved_class.WorkerCounter)
+    wc.CLS_ID_TO_COUNT = cls_id
+    wc.CONF_THRESHOLD = conf
+    wc.HALF = half
+    wc.DEVICE = device
+    wc.device = "cpu" if device == "cpu" else f"cuda:{device}"
+    wc._init_counting_state()
+    wc.MOTION_GATE = False
+    wc.STRIDE_ENABLE = False
+    wc.model = YOLO(model_path, task='detect')
+    wc._model_lock = threading.Lock()
+    wc.MODEL_PATH = model_path
+    wc.CASCADE_MODEL = cascade
+    wc.ROI_MODE = roi is not None
+    if roi is not None:
+        wc.ROI_IMGSZ, wc.ROI_MARGIN, wc.ROI_RECTS = roi
+    return wc
+
+
+def run_case(name, wc, frames, stamps, line_y, warmup=5):
+    for frame in frames[:warmup]:
+        with contextlib.redirect_stdout(io.StringIO()):
+            wc.model.predict(frame, imgsz=wc.ROI_IMGSZ if wc.ROI_MODE else 640,
+                             half=wc.HALF, device=wc.DEVICE, verbose=False)
+
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for frame, ts in zip(frames, stamps):
+            t0 = time.perf_counter()
+            wc._process_frame(frame, line_y, now=ts)
+            times.append(time.perf_counter() - t0)
+    times = np.asarray(times) * 1000.0
+    exits, entries = wc.exit_count, len(wc.recent_crossings_entry)
+    print(f"{name:>10}: {times.mean():7.2f} ms/frame  p95 {np.percentile(times, 95):7.2f} ms  "
+          f"exits {exits}  entries {entries}  workers {dict(wc.workers)}")
+    return exits, entries, dict(wc.workers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", required=True)
+    parser.add_argument("--clip", required=True)
+    parser.add_argument("--frames", type=int, default=None)
+    parser.add_argument("--line-offset", type=int, default=60)
+    parser.add_argument("--cls", type=int, default=1)
+    parser.add_argument("--conf", type=float, default=0.7)
+    parser.add_argument("--imgsz", type=int, default=320)
+    parser.add_argument("--margin", type=int, default=90)
+    parser.add_argument("--rects", default=None, help="x0,y0,x1,y1;... lanes in processing-frame pixels")
+    parser.add_argument("--cascade", default=None, help="small model to run in front of --model")
+    parser.add_argument("--device", type=int, default=0)
+    args = parser.parse_args()
+
+    half = torch.cuda.is_available() and args.device >= 0
+    device = args.device if half else "cpu"
+    rects = None
+    if args.rects:
+        rects = [tuple(int(v) for v in r.split(",")) for r in args.rects.split(";")]
+
+    probe = make_counter(args.model, args.cls, args.conf, half, device, None)
+    frames, stamps = load_clip(args.clip, probe.TARGET_W, probe.TARGET_H, args.frames)
+    if not frames:
+        raise ValueError(f"No frames decoded from {args.clip}")
+    line_y = int(probe.TARGET_H / 2 - args.line_offset)  # same as WorkerCounter.run()
+    print(f"{len(frames)} frames, line at y={line_y}, ROI imgsz {args.imgsz}, "
+          f"{'lanes ' + str(rects) if rects else 'band +-' + str(args.margin)}")
+
+    full = run_case("full", probe, frames, stamps, line_y)
+    roi = run_case("roi", make_counter(args.model, args.cls, args.conf, half, device,
+                                       (args.imgsz, args.margin, rects)),
+                   frames, stamps, line_y)
+    if full == roi:
+        print("counts agree")
+    else:
+        print(f"counts differ: full exits/entries {full[:2]} vs roi {roi[:2]}")
+
+    if args.cascade:
+        wc = make_counter(args.model, args.cls, args.conf, half, device, None, cascade=args.cascade)
+        wc.ROI_IMGSZ, wc.ROI_MARGIN, wc.ROI_RECTS = args.imgsz, args.margin, rects
+        casc = run_case("cascade", wc, frames, stamps, line_y)
+        print(f"cascade: {wc.get_cascade_stats()}")
+        print("cascade counts agree" if casc == full else
+              f"cascade counts differ: full {full[:2]} vs cascade {casc[:2]}")
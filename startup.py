@@ -0,0 +1,71 @@
+"""
+Per-phase startup timing for test_server.
+
+Boot work runs on more than one thread (runtime imports, model load and
+warm-up on one, the Socket.IO connection on another), so phases are kept as
+intervals measured from process start and printed as a timeline. Process
+start comes from /proc, so interpreter start-up and the first imports are
+included.
+
+Only test_server defers its heavy imports: improved_class (and everything
+that imports it) still loads torch and ultralytics at module level, so the
+"import runtime" phase is moved off the connect path, not made shorter, and
+a standalone improved_class run starts as before.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+def process_start():
+    """time.monotonic() value at which this process was started (now if /proc is unavailable)."""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return time.monotonic() - (uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return time.monotonic()
+
+
+class StartupProfile:
+    """Thread-safe list of (phase, start, end, thread) intervals."""
+
+    def __init__(self, t0=None):
+        self.t0 = process_start() if t0 is None else t0
+        self.phases = []
+        self._lock = threading.Lock()
+
+    def add(self, name, start, end):
+        with self._lock:
+            self.phases.append((name, start, end, threading.current_thread().name))
+
+    @contextmanager
+    def phase(self, name):
+        start = time.monotonic()
+        try:
+            yield
+        except BaseException:
+            self.add(name + " (failed)", start, time.monotonic())
+            raise
+        self.add(name, start, time.monotonic())
+
+    def mark(self, name):
+        now = time.monotonic()
+        self.add(name, now, now)
+        return now - self.t0
+
+    def as_dict(self):
+        """{phase: {"start": s, "end": s, "sec": s}}, seconds from process start."""
+        with self._lock:
+            return {name: {"start": round(s - self.t0, 3), "end": round(e - self.t0, 3), "sec": round(e - s, 3)}
+                    for name, s, e, _ in self.phases}
+
+    def report(self):
+        with self._lock:
+            phases = sorted(self.phases, key=lambda p: p[1])
+        print("Startup timeline (s from process start):")
+        for name, s, e, thread in phases:
+            print(f"  {name:18s} {s - self.t0:7.2f} -> {e - self.t0:7.2f}  {e - s:6.2f}s  [{thread}]")
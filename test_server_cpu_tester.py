@@ -1,3 +1,4 @@
+import os
 import socketio
 import random
 import threading
@@ -30,7 +31,8 @@ def start_counter():
             cls_id_to_count=1,
             conf_threshold=0.7,
             device=0,
-            half=True
+            half=True,
+            inference_socket=os.getenv("INFERENCE_SOCKET")  # use a running inference_server.py
         )
         threading.Thread(target=counter_app.run, daemon=True).start()
         print("WorkerCounter started")
@@ -0,0 +1,111 @@
+"""
+Benchmark: single-shot detection on the 640x360 downscale vs tiled detection
+on the full-resolution frame, on a recorded main-stream clip.
+
+Each case decodes the clip at full resolution and runs every frame through
+WorkerCounter._process_frame (motion gate and stride off, timestamps from the
+clip PTS). Reports detector+counting ms/frame and FPS, tracked target boxes per
+frame, how many of them are small (area under --small px in the processing
+frame), and the exit count, so the throughput cost of each tile grid can be
+weighed against what it finds.
+
+    python tile_benchmark.py --model textile_model_worker1.pt --clip main_stream.mp4
+        [--grids 2x1 3x2 4x3] [--overlap 0.2] [--region 0,90,640,300] [--frames 300]
+
+--region is in 640x360 processing-frame pixels. Tiles go through the model as
+one batch, so use a .pt (or an export with dynamic batch and input size).
+"""
+import argparse
+import contextlib
+import io
+import time
+
+import cv2
+import numpy as np
+import torch
+
+from box_ops import area
+from roi_benchmark import make_counter
+
+
+def run_case(name, wc, clip, line_offset, max_frames, small, tiled):
+    cap = cv2.VideoCapture(clip)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video file: {clip}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    line_y = int(wc.TARGET_H / 2 - line_offset)
+    processing = np.empty((wc.TARGET_H, wc.TARGET_W, 3), dtype=np.uint8)
+
+    boxes, small_boxes = [], []
+    detect_and_track = wc._detect_and_track
+
+    def recorded(frame, line_y):
+        out = detect_and_track(frame, line_y)
+        tgt = out[0][out[3] == wc.CLS_ID_TO_COUNT] if out is not None else np.zeros((0, 4))
+        boxes.append(len(tgt))
+        small_boxes.append(int(np.sum(area(tgt) < small)))
+        return out
+
+    wc._detect_and_track = recorded
+    times, n = [], 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        while max_frames is None or n < max_frames:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            cv2.resize(frame, (wc.TARGET_W, wc.TARGET_H), dst=processing)
+            if tiled:
+                (x0, y0, x1, y1), mapping = wc._tile_source_rect(frame.shape)
+                wc._tile_frame = (frame[y0:y1, x0:x1], mapping)
+            t0 = time.perf_counter()
+            wc._process_frame(processing, line_y, now=n / fps)
+            times.append(time.perf_counter() - t0)
+            n += 1
+    cap.release()
+    if not times:
+        raise ValueError(f"No frames decoded from {clip}")
+
+    warm = times[5:] or times  # first calls include model setup
+    ms = np.asarray(warm) * 1000.0
+    row = {"case": name, "ms": round(float(ms.mean()), 2), "p95_ms": round(float(np.percentile(ms, 95)), 2),
+           "fps": round(1000.0 / float(ms.mean()), 1), "boxes": round(float(np.mean(boxes)), 2),
+           "small": round(float(np.mean(small_boxes)), 2), "exits": wc.exit_count}
+    print(f"{name:>10}: {row['ms']:7.2f} ms/frame ({row['fps']:6.1f} FPS)  p95 {row['p95_ms']:7.2f} ms  "
+          f"{row['boxes']:5.2f} targets/frame ({row['small']:.2f} small)  exits {row['exits']}")
+    return row
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", required=True)
+    parser.add_argument("--clip", required=True, help="recording of the full-resolution main stream")
+    parser.add_argument("--frames", type=int, default=None)
+    parser.add_argument("--line-offset", type=int, default=60)
+    parser.add_argument("--cls", type=int, default=1)
+    parser.add_argument("--conf", type=float, default=0.7)
+    parser.add_argument("--grids", nargs="+", default=["2x1", "3x2"], help="COLSxROWS tile grids to try")
+    parser.add_argument("--overlap", type=float, default=0.2)
+    parser.add_argument("--imgsz", type=int, default=640, help="detector input per tile")
+    parser.add_argument("--region", default=None, help="x0,y0,x1,y1 in processing-frame pixels")
+    parser.add_argument("--small", type=float, default=1000.0, help="area (processing px) counted as small")
+    parser.add_argument("--device", type=int, default=0)
+    args = parser.parse_args()
+
+    half = torch.cuda.is_available() and args.device >= 0
+    device = args.device if half else "cpu"
+    region = tuple(int(v) for v in args.region.split(",")) if args.region else None
+
+    def counter():
+        wc = make_counter(args.model, args.cls, args.conf, half, device, None)
+        wc.TILE_REGION, wc.TILE_OVERLAP, wc.TILE_IMGSZ = region, args.overlap, args.imgsz
+        return wc
+
+    single = run_case("single", counter(), args.clip, args.line_offset, args.frames, args.small, False)
+    for grid in args.grids:
+        wc = counter()
+        wc.TILE_MODE = True
+        wc.TILE_GRID = tuple(int(v) for v in grid.lower().split("x"))
+        row = run_case(grid, wc, args.clip, args.line_offset, args.frames, args.small, True)
+        print(f"{'':>10}  {row['fps'] / single['fps']:.2f}x single-shot throughput, "
+              f"{row['small'] - single['small']:+.2f} small targets/frame, "
+              f"exits {row['exits']} vs {single['exits']}")
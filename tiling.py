@@ -0,0 +1,68 @@
+"""
+Tiled detection over a full-resolution region of the source frame.
+
+WorkerCounter works on the 640x360 downscale of the camera's main stream,
+where a small roll is only a few pixels across. In tile mode the reader keeps
+a full-resolution copy of a region, which is cut into a cols x rows grid of
+overlapping tiles, detected as one batch and merged back into one set of
+boxes in region pixels.
+
+Merging works on intersection over the smaller box, only between boxes from
+different tiles: a roll inside an overlap comes out of both tiles as (nearly)
+the same box, and a roll cut by a seam comes out as two partial boxes that
+each lie mostly inside the other tile's box. Both collapse into the union of
+the group at the best confidence. Boxes from the same tile were already
+separated by the model's own NMS and are never merged with each other.
+"""
+import numpy as np
+
+from box_ops import ios_matrix
+
+
+def tile_grid(shape, grid=(3, 2), overlap=0.2):
+    """
+    (T, 4) x0, y0, x1, y1 tiles covering an image of shape (h, w, ...): grid is
+    (cols, rows); neighbouring tiles share `overlap` of a tile's width/height.
+    """
+    h, w = shape[:2]
+    cols, rows = grid
+    if cols < 1 or rows < 1 or not 0.0 <= overlap < 1.0:
+        raise ValueError(f"Bad tile grid {grid} / overlap {overlap}")
+
+    def spans(size, n):
+        tile = size / (n - (n - 1) * overlap)
+        starts = np.round(np.arange(n) * tile * (1.0 - overlap)).astype(int)
+        ends = np.minimum(size, np.round(starts + tile).astype(int))
+        ends[-1] = size
+        return starts, ends
+
+    xs0, xs1 = spans(w, cols)
+    ys0, ys1 = spans(h, rows)
+    return np.array([(x0, y0, x1, y1) for y0, y1 in zip(ys0, ys1) for x0, x1 in zip(xs0, xs1)], dtype=np.int64)
+
+
+def merge_tiles(dets, tile_ids, ios_thresh=0.6):
+    """
+    Merge (N, 6) x1, y1, x2, y2, conf, cls detections from several tiles (same
+    coordinates) into one set; tile_ids (N,) says which tile each came from.
+    """
+    if len(dets) < 2:
+        return dets
+    order = np.argsort(-dets[:, 4], kind="stable")
+    dets, tile_ids = dets[order], tile_ids[order]
+    ios = ios_matrix(dets[:, :4], dets[:, :4])
+    same_cls = dets[:, 5][:, None] == dets[:, 5][None, :]
+    other_tile = tile_ids[:, None] != tile_ids[None, :]
+    link = (ios >= ios_thresh) & same_cls & other_tile
+
+    used = np.zeros(len(dets), dtype=bool)
+    out = []
+    for i in range(len(dets)):
+        if used[i]:
+            continue
+        group = link[i] & ~used
+        group[i] = True
+        used |= group
+        g = dets[group]
+        out.append((g[:, 0].min(), g[:, 1].min(), g[:, 2].max(), g[:, 3].max(), dets[i, 4], dets[i, 5]))
+    return np.array(out, dtype=dets.dtype)
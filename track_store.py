@@ -0,0 +1,172 @@
+"""
+Struct-of-arrays per-track state for WorkerCounter.
+
+Every track owns a slot in preallocated arrays:
+  - hist: ring buffer of (t, cx, cy, w, h), hist_len samples per slot
+  - age, prev_side, last_gate_side, last_cross_time, last_seen
+An id->slot dict maps tracker ids to slots and freed slots are recycled, so
+memory stays flat on 24/7 streams. Expiry uses one bucket per update (the
+slots touched at that timestamp); purge only looks at buckets older than the
+TTL instead of scanning every live track.
+"""
+from collections import deque
+
+import numpy as np
+
+
+T, CX, CY, W, H = range(5)
+
+
+def has_repeats(values):
+    """True if a 1-D int array holds some value twice (far cheaper than np.unique on a frame's worth)."""
+    return len(set(values.tolist())) < len(values)
+
+
+class TrackStore:
+    """Preallocated per-track counting state indexed by slot."""
+
+    def __init__(self, capacity=256, hist_len=12, ttl=3.0):
+        self.hist_len = hist_len
+        self.ttl = ttl
+        self.capacity = 0
+        self.index = {}  # track id -> slot
+        self._free = []
+        self._buckets = deque()  # (t, slots touched at t), oldest first
+        self._alloc(capacity)
+
+    def _alloc(self, capacity):
+        """Allocate (or grow to) capacity slots, keeping existing contents."""
+        old = self.capacity
+
+        def grown(name, fill, dtype, shape=()):
+            arr = np.full((capacity,) + shape, fill, dtype=dtype)
+            if old:
+                arr[:old] = getattr(self, name)
+            setattr(self, name, arr)
+
+        grown("hist", 0.0, np.float64, (self.hist_len, 5))
+        grown("hist_head", 0, np.int64)
+        grown("hist_count", 0, np.int64)
+        grown("age", 0, np.int64)
+        grown("prev_side", 0, np.int8)  # 0 = not known yet
+        grown("last_gate_side", 0, np.int8)
+        grown("last_cross_time", -1e9, np.float64)
+        grown("last_seen", -np.inf, np.float64)
+        grown("track_id", -1, np.int64)
+        grown("active", False, bool)
+        # pop() hands out low slots first
+        self._free.extend(range(capacity - 1, old - 1, -1))
+        self.capacity = capacity
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, tid):
+        return tid in self.index
+
+    def slots_for(self, ids):
+        """Map track ids to slots, claiming (and resetting) fresh slots for unseen ids."""
+        index = self.index
+        slots = np.empty(len(ids), dtype=np.int64)
+        for i, tid in enumerate(ids.tolist()):
+            slot = index.get(tid)
+            if slot is None:
+                if not self._free:
+                    self._alloc(self.capacity * 2)
+                slot = self._free.pop()
+                self._reset(slot, tid)
+                index[tid] = slot
+            slots[i] = slot
+        return slots
+
+    def _reset(self, slot, tid):
+        self.hist_head[slot] = 0
+        self.hist_count[slot] = 0
+        self.age[slot] = 0
+        self.prev_side[slot] = 0
+        self.last_gate_side[slot] = 0
+        self.last_cross_time[slot] = -1e9
+        self.track_id[slot] = tid
+        self.active[slot] = True
+
+    def update(self, ids, cx, cy, w, h, now):
+        """
+        Append one (now, cx, cy, w, h) sample per track id. Returns the slots.
+        A repeated id gets the sample of its first box only (and ages once).
+        """
+        slots = self.slots_for(ids)
+        rows = slice(None)
+        if has_repeats(slots):
+            _uniq, first = np.unique(slots, return_index=True)
+            rows = np.sort(first)
+        s = slots[rows]
+        head = self.hist_head[s]
+        sample = np.empty((len(s), 5))
+        sample[:, T] = now
+        sample[:, CX], sample[:, CY], sample[:, W], sample[:, H] = cx[rows], cy[rows], w[rows], h[rows]
+        self.hist[s, head] = sample
+        self.hist_head[s] = (head + 1) % self.hist_len
+        self.hist_count[s] = np.minimum(self.hist_count[s] + 1, self.hist_len)
+        self.age[s] += 1
+        self.last_seen[s] = now
+        self._buckets.append((now, s))
+        return slots
+
+    def recent(self, slots):
+        """
+        (newest, previous, oldest) sample rows of each slot, in one gather. A slot
+        with a single sample gets it for all three, so its deltas come out as 0.
+        """
+        head, n = self.hist_head[slots], self.hist_count[slots]
+        idx = np.empty((len(slots), 3), dtype=np.int64)
+        idx[:, 0] = head - 1
+        idx[:, 1] = head - np.minimum(n, 2)
+        idx[:, 2] = head - n
+        rows = self.hist[slots[:, None], idx % self.hist_len]
+        return rows[:, 0], rows[:, 1], rows[:, 2]
+
+    def sample(self, slots, back=0, field=None):
+        """Sample `back` steps before the newest one (0 = newest). Only valid where hist_count > back."""
+        idx = (self.hist_head[slots] - 1 - back) % self.hist_len
+        rows = self.hist[slots, idx]
+        return rows if field is None else rows[:, field]
+
+    def oldest(self, slots, field=None):
+        idx = (self.hist_head[slots] - self.hist_count[slots]) % self.hist_len
+        rows = self.hist[slots, idx]
+        return rows if field is None else rows[:, field]
+
+    def velocity(self, slots):
+        """(vx, vy) in px/s from the two newest samples; 0 for tracks with a single sample."""
+        has_prev = self.hist_count[slots] >= 2
+        t0, t1 = self.sample(slots, 1, T), self.sample(slots, 0, T)
+        dt = np.maximum(1e-3, t1 - t0)
+        vx = np.where(has_prev, (self.sample(slots, 0, CX) - self.sample(slots, 1, CX)) / dt, 0.0)
+        vy = np.where(has_prev, (self.sample(slots, 0, CY) - self.sample(slots, 1, CY)) / dt, 0.0)
+        return vx, vy
+
+    def predict(self, slots, now):
+        """Constant-velocity (cx, cy, w, h) at time now from each track's newest sample."""
+        last = self.sample(slots, 0)
+        vx, vy = self.velocity(slots)
+        dt = now - last[:, T]
+        return last[:, CX] + vx * dt, last[:, CY] + vy * dt, last[:, W], last[:, H]
+
+    def purge(self, now):
+        """Retire tracks not seen for more than ttl seconds. Returns the retired ids."""
+        retired = []
+        buckets = self._buckets
+        while buckets and now - buckets[0][0] > self.ttl:
+            _t, slots = buckets.popleft()
+            # a slot may have been refreshed (or recycled) since this bucket was written
+            stale = slots[self.active[slots] & (now - self.last_seen[slots] > self.ttl)]
+            for slot in stale.tolist():
+                if not self.active[slot]:
+                    continue  # duplicate slot inside one bucket
+                tid = int(self.track_id[slot])
+                self.index.pop(tid, None)
+                self.active[slot] = False
+                self.track_id[slot] = -1
+                self._free.append(slot)
+                retired.append(tid)
+        return retired
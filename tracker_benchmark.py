@@ -0,0 +1,272 @@
+"""
+Benchmark: tracker backends, update cost and identity metrics.
+
+Trackers compared:
+  greedy     optimized_track.SimpleIOUTracker's matching (Python loop over
+             detection x track pairs, scalar IoU, greedy)
+  iou        iou_tracker.IOUTracker (IoU matrix + Hungarian, array state)
+  bytetrack  tracking.ByteTrackAdapter (when ultralytics is installed)
+
+Synthetic mode (default) moves --sizes objects through a scene whose area
+grows with the object count, so density stays the same. Detections are
+jittered, some are missed, and a few false positives are added. Every
+tracker sees the same detections. The ground truth gives the real ID
+switches, misses and false positives, and MOTA.
+
+Clip mode runs the detector once per frame of a recorded clip and replays the
+cached detections into each tracker. With --gt (MOT format: frame, id, x, y,
+w, h per line, frames from 1), the same metrics are computed against it.
+Without ground truth it reports id churn instead: ids per box, mean track
+length, and restarts, meaning a new id born on top of a track lost in the
+last --restart-window frames (mostly ID switches).
+
+    python tracker_benchmark.py [--sizes 10 100 1000] [--frames 300]
+    python tracker_benchmark.py --clip short.mkv --model textile_model_worker1.pt [--gt gt.txt]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from box_ops import iou_matrix
+from iou_tracker import IOUTracker
+
+
+class GreedyIOUTracker:
+    """optimized_track.SimpleIOUTracker (that module runs its video loop on import)."""
+
+    def __init__(self, iou_threshold=0.3, max_age=30):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.tracks = {}
+        self.next_id = 1
+
+    @staticmethod
+    def _iou(box1, box2):
+        x1_min, y1_min, x1_max, y1_max = box1
+        x2_min, y2_min, x2_max, y2_max = box2
+        inter = max(0, min(x1_max, x2_max) - max(x1_min, x2_min)) * max(0, min(y1_max, y2_max) - max(y1_min, y2_min))
+        union = (x1_max - x1_min) * (y1_max - y1_min) + (x2_max - x2_min) * (y2_max - y2_min) - inter
+        return inter / union if union > 0 else 0
+
+    def update(self, dets, frame_shape=None, img=None):
+        for track_id in list(self.tracks.keys()):
+            self.tracks[track_id]["age"] += 1
+            if self.tracks[track_id]["age"] > self.max_age:
+                del self.tracks[track_id]
+        out, unmatched = [], []
+        for det in dets.tolist():
+            det_box = det[:4]
+            best_iou, best_track_id = 0, None
+            for track_id, track_data in self.tracks.items():
+                current_iou = self._iou(det_box, track_data["box"])
+                if current_iou > best_iou and current_iou > self.iou_threshold:
+                    best_iou, best_track_id = current_iou, track_id
+            if best_track_id is not None:
+                self.tracks[best_track_id]["box"] = det_box
+                self.tracks[best_track_id]["age"] = 0
+                out.append((best_track_id, det_box))
+            else:
+                unmatched.append(det)
+        for det in unmatched:
+            self.tracks[self.next_id] = {"box": det[:4], "age": 0}
+            out.append((self.next_id, det[:4]))
+            self.next_id += 1
+        if not out:
+            return np.zeros((0, 4)), np.zeros(0, dtype=np.int64)
+        return np.array([b for _, b in out], dtype=np.float64), np.array([i for i, _ in out], dtype=np.int64)
+
+
+def make_trackers(names):
+    trackers = {}
+    for name in names:
+        if name == "greedy":
+            trackers[name] = GreedyIOUTracker
+        elif name == "iou":
+            try:
+                import scipy.optimize  # noqa: F401  (IOUTracker's assignment solver)
+            except ImportError as e:
+                print(f"iou skipped: {e}")
+                continue
+            trackers[name] = IOUTracker
+        elif name == "bytetrack":
+            try:
+                from tracking import ByteTrackAdapter
+            except ImportError as e:
+                print(f"bytetrack skipped: {e}")
+                continue
+            trackers[name] = ByteTrackAdapter
+        else:
+            raise ValueError(f"Unknown tracker: {name}")
+    return trackers
+
+
+def synthetic_scene(n, frames, seed=0, miss=0.05, false_pos=0.02, jitter=1.0):
+    """Per frame: (gt_boxes, gt_ids, dets (K, 6)); objects ~ 30x40 px moving down at 2-6 px/frame."""
+    rng = np.random.default_rng(seed)
+    side = 640.0 * np.sqrt(n / 10.0)  # ~10 objects per 640x640
+    pos = rng.uniform(0, side, (n, 2))
+    size = rng.uniform([25, 35], [35, 45], (n, 2))
+    vel = np.stack([rng.normal(0, 0.5, n), rng.uniform(2, 6, n)], axis=1)
+    ids = np.arange(1, n + 1)
+    next_id = n + 1
+    out = []
+    for _ in range(frames):
+        pos += vel
+        gone = pos[:, 1] > side
+        if gone.any():  # leaves at the bottom, a new object enters at the top
+            k = int(gone.sum())
+            pos[gone] = np.stack([rng.uniform(0, side, k), rng.uniform(-45, 0, k)], axis=1)
+            ids[gone] = np.arange(next_id, next_id + k)
+            next_id += k
+        gt = np.concatenate([pos, pos + size], axis=1)
+        seen = rng.random(n) >= miss
+        det = gt[seen] + rng.normal(0, jitter, (int(seen.sum()), 4))
+        n_fp = rng.binomial(n, false_pos)
+        fp_xy = rng.uniform(0, side, (n_fp, 2))
+        det = np.concatenate([det, np.concatenate([fp_xy, fp_xy + 30], axis=1)])
+        dets = np.concatenate([det, rng.uniform(0.5, 1.0, (len(det), 1)), np.ones((len(det), 1))], axis=1)
+        out.append((gt, ids.copy(), dets[rng.permutation(len(dets))]))
+    return out
+
+
+def clip_detections(clip, model_path, conf, cls, max_frames, device):
+    """Detector output for each frame of the clip at the 640x360 processing size."""
+    import cv2
+    from ultralytics import YOLO
+
+    model = YOLO(model_path, task="detect")
+    cap = cv2.VideoCapture(clip)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video file: {clip}")
+    out = []
+    while max_frames is None or len(out) < max_frames:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frame = cv2.resize(frame, (640, 360))
+        dets = model.predict(frame, conf=conf, verbose=False, device=device)[0].boxes.data.cpu().numpy()
+        out.append(dets[dets[:, 5] == cls] if cls is not None else dets)
+    cap.release()
+    if not out:
+        raise ValueError(f"No frames decoded from {clip}")
+    return out
+
+
+def load_mot(path, frames):
+    """MOT-format ground truth -> per frame (boxes (G, 4), ids (G,))."""
+    rows = np.loadtxt(path, delimiter=",", ndmin=2)
+    gt = []
+    for f in range(1, frames + 1):
+        r = rows[rows[:, 0] == f]
+        gt.append((np.concatenate([r[:, 2:4], r[:, 2:4] + r[:, 4:6]], axis=1), r[:, 1].astype(np.int64)))
+    return gt
+
+
+def match_best_first(iou, thresh):
+    """One-to-one (row, col) pairs with IoU >= thresh, highest IoU taken first."""
+    r, c = np.nonzero(iou >= thresh)
+    order = np.argsort(-iou[r, c], kind="stable")
+    used_r, used_c, rows, cols = set(), set(), [], []
+    for i, j in zip(r[order].tolist(), c[order].tolist()):
+        if i not in used_r and j not in used_c:
+            used_r.add(i)
+            used_c.add(j)
+            rows.append(i)
+            cols.append(j)
+    return np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)
+
+
+def id_metrics(gt, tracked, iou_thresh=0.5):
+    """
+    ID switches, misses, false positives and MOTA of per-frame (boxes, ids)
+    tracker output against per-frame (boxes, ids) ground truth. Pairs are
+    matched best IoU first, in plain NumPy, so the scoring is the same
+    whichever trackers (and optional packages) are in the run.
+    """
+    last = {}
+    switches = misses = false_pos = total = 0
+    for (g_boxes, g_ids), (t_boxes, t_ids) in zip(gt, tracked):
+        total += len(g_ids)
+        matched = 0
+        if len(g_ids) and len(t_ids):
+            r, c = match_best_first(iou_matrix(g_boxes, t_boxes), iou_thresh)
+            matched = len(r)
+            for gi, ti in zip(g_ids[r].tolist(), t_ids[c].tolist()):
+                if gi in last and last[gi] != ti:
+                    switches += 1
+                last[gi] = ti
+        misses += len(g_ids) - matched
+        false_pos += len(t_ids) - matched
+    return {"id_switches": switches, "misses": misses, "false_pos": false_pos,
+            "mota": round(1.0 - (switches + misses + false_pos) / max(1, total), 4)}
+
+
+def churn_metrics(tracked, window=30, iou_thresh=0.3):
+    """Id churn without ground truth: ids per box, mean track length, restarts on a lost track."""
+    first, last, last_box = {}, {}, {}
+    restarts = boxes = 0
+    for f, (t_boxes, t_ids) in enumerate(tracked):
+        boxes += len(t_ids)
+        for box, tid in zip(t_boxes.tolist(), t_ids.tolist()):
+            if tid not in first:
+                first[tid] = f
+                lost = [b for t, b in last_box.items() if 0 < f - last[t] <= window and t not in t_ids]
+                if lost and iou_matrix(np.array([box]), np.array(lost)).max() >= iou_thresh:
+                    restarts += 1
+            last[tid], last_box[tid] = f, box
+    lengths = [last[t] - first[t] + 1 for t in first]
+    return {"ids": len(first), "ids_per_100_boxes": round(100.0 * len(first) / max(1, boxes), 2),
+            "mean_track_frames": round(float(np.mean(lengths)) if lengths else 0.0, 1), "restarts": restarts}
+
+
+def replay(make, frames, shape):
+    """Run one tracker over cached detections: per-frame (boxes, ids) and update ms per frame."""
+    tracker = make()
+    tracked, sec = [], 0.0
+    for dets in frames:
+        t0 = time.perf_counter()
+        out = tracker.update(dets, shape)
+        sec += time.perf_counter() - t0
+        tracked.append((out[0], out[1]))
+    return tracked, 1e3 * sec / len(frames)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trackers", nargs="+", default=["greedy", "iou", "bytetrack"])
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10, 100, 1000])
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--greedy-max", type=int, default=100, help="skip greedy above this many objects (seconds per frame at 1000)")
+    parser.add_argument("--clip", default=None)
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--gt", default=None, help="MOT-format ground truth for --clip")
+    parser.add_argument("--cls", type=int, default=1)
+    parser.add_argument("--conf", type=float, default=0.7)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--restart-window", type=int, default=30)
+    args = parser.parse_args()
+    trackers = make_trackers(args.trackers)
+
+    if args.clip:
+        if not args.model:
+            parser.error("--clip needs --model")
+        frames = clip_detections(args.clip, args.model, args.conf, args.cls, args.frames, args.device)
+        gt = load_mot(args.gt, len(frames)) if args.gt else None
+        for name, make in trackers.items():
+            tracked, ms = replay(make, frames, (360, 640))
+            metrics = id_metrics(gt, tracked) if gt else churn_metrics(tracked, args.restart_window)
+            print(f"{name:>10}: {ms:7.3f} ms/frame  {metrics}")
+    else:
+        for n in args.sizes:
+            scene = synthetic_scene(n, args.frames)
+            gt = [(g, i) for g, i, _ in scene]
+            frames = [d for _, _, d in scene]
+            side = int(640 * np.sqrt(n / 10.0))
+            print(f"{n} objects ({side}x{side} px scene, {args.frames} frames):")
+            for name, make in trackers.items():
+                if name == "greedy" and n > args.greedy_max:
+                    print(f"{name:>10}: skipped (--greedy-max {args.greedy_max})")
+                    continue
+                tracked, ms = replay(make, frames, (side, side))
+                print(f"{name:>10}: {ms:8.3f} ms/frame  {id_metrics(gt, tracked)}")
@@ -0,0 +1,53 @@
+"""
+Standalone tracker for detections that did not come out of model.track().
+
+model.track(persist=True) keeps its ByteTrack instance inside the model's
+predictor; when WorkerCounter builds detections itself (ROI crops mapped
+back to frame coordinates, etc.) it feeds them to a ByteTrackAdapter instead.
+Detections go in as an (N, 6) array of x1, y1, x2, y2, conf, cls and come
+back as the (xyxy, ids, conf, cls) arrays the counting engine expects.
+create_tracker() picks this or the lighter iou_tracker.IOUTracker by name.
+"""
+import numpy as np
+from ultralytics.engine.results import Boxes
+from ultralytics.trackers.byte_tracker import BYTETracker
+from ultralytics.utils import IterableSimpleNamespace, yaml_load
+from ultralytics.utils.checks import check_yaml
+
+from counting_engine import empty_detections
+
+
+class ByteTrackAdapter:
+    """ultralytics BYTETracker driven with plain NumPy detections."""
+
+    def __init__(self, tracker_cfg="bytetrack.yaml", frame_rate=30):
+        cfg = IterableSimpleNamespace(**yaml_load(check_yaml(tracker_cfg)))
+        self.tracker = BYTETracker(args=cfg, frame_rate=frame_rate)
+
+    def update(self, dets, frame_shape, img=None):
+        """dets: (N, 6) x1, y1, x2, y2, conf, cls in frame coordinates."""
+        dets = np.asarray(dets, dtype=np.float32).reshape(-1, 6)
+        tracks = self.tracker.update(Boxes(dets, frame_shape[:2]), img)
+        if len(tracks) == 0:
+            return empty_detections()
+        tracks = np.asarray(tracks, dtype=np.float64)  # x1, y1, x2, y2, id, conf, cls, idx
+        return tracks[:, :4], tracks[:, 4].astype(np.int64), tracks[:, 5], tracks[:, 6].astype(np.int64)
+
+    def advance(self):
+        """A frame went by without detections: bump the clock and run the Kalman predict."""
+        self.tracker.frame_id += 1
+        self.tracker.multi_predict(list(self.tracker.tracked_stracks) + list(self.tracker.lost_stracks))
+
+
+def create_tracker(kind="bytetrack", frame_rate=30, tracker_cfg="bytetrack.yaml", **kwargs):
+    """
+    Array tracker by name: "bytetrack" (ultralytics BYTETracker) or "iou"
+    (iou_tracker.IOUTracker; kwargs go to it). Both take update(dets,
+    frame_shape, img) and advance().
+    """
+    if kind == "bytetrack":
+        return ByteTrackAdapter(tracker_cfg, frame_rate=frame_rate)
+    if kind == "iou":
+        from iou_tracker import IOUTracker
+        return IOUTracker(frame_rate=frame_rate, **kwargs)
+    raise ValueError(f"Unknown tracker: {kind} (have: bytetrack, iou)")
@@ -1,15 +1,56 @@
+import os
+import threading
 import time
 
 import cv2
 import numpy as np
 
 
+# OpenCV DNN backends/targets by name; entries missing from this cv2 build are left out
+BACKENDS = {name: getattr(cv2.dnn, const) for name, const in (
+    ("default", "DNN_BACKEND_DEFAULT"),
+    ("opencv", "DNN_BACKEND_OPENCV"),
+    ("cuda", "DNN_BACKEND_CUDA"),
+    ("openvino", "DNN_BACKEND_INFERENCE_ENGINE"),
+) if hasattr(cv2.dnn, const)}
+TARGETS = {name: getattr(cv2.dnn, const) for name, const in (
+    ("cpu", "DNN_TARGET_CPU"),
+    ("opencl", "DNN_TARGET_OPENCL"),
+    ("opencl_fp16", "DNN_TARGET_OPENCL_FP16"),
+    ("cuda", "DNN_TARGET_CUDA"),
+    ("cuda_fp16", "DNN_TARGET_CUDA_FP16"),
+) if hasattr(cv2.dnn, const)}
+
+# one row per detection; x, y is the top-left corner, in pixels of the input image
+DETECTION_DTYPE = np.dtype([("class_id", np.int32), ("confidence", np.float32),
+                            ("x", np.int32), ("y", np.int32), ("w", np.int32), ("h", np.int32)])
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_detector(config, model, labels, size=416, confidence=0.5, threshold=0.3, backend=None, target=None):
+    """Shared YOLOER for these files and settings: the network is parsed once per process."""
+    key = (os.path.abspath(config), os.path.abspath(model), tuple(labels), str(size), confidence, threshold,
+           backend, target)
+    with _registry_lock:
+        detector = _registry.get(key)
+        if detector is None:
+            detector = _registry[key] = YOLOER(config, model, labels, size, confidence, threshold,
+                                               backend=backend, target=target)
+        return detector
+
+
 class YOLOER:
 
-    def __init__(self, config, model, labels, size=416, confidence=0.5, threshold=0.3):
+    def __init__(self, config, model, labels, size=416, confidence=0.5, threshold=0.3, backend=None, target=None):
         self.confidence = confidence
         self.threshold = threshold
-        self.size = size
+        # network input (width, height): an int is square; non-square sizes such as
+        # (640, 352) follow the 640x360 frame instead of squashing it
+        self.size = (size, size) if isinstance(size, int) else tuple(size)
+        if self.size[0] % 32 or self.size[1] % 32:
+            raise ValueError(f"YOLO input size must be a multiple of 32, got {self.size}")
         self.output_names = []
         self.labels = labels
         try:
@@ -17,6 +58,17 @@ class YOLOER:
         except:
             raise ValueError("Couldn't find the models!\nDid you forget to download them manually (and keep in the "
                              "correct directory, models/) or run the shell script?")
+        # backend/target by name (see BACKENDS / TARGETS); None keeps OpenCV's default
+        if backend is not None:
+            if backend not in BACKENDS:
+                raise ValueError(f"Unknown or unavailable DNN backend: {backend} (have: {', '.join(BACKENDS)})")
+            self.net.setPreferableBackend(BACKENDS[backend])
+        if target is not None:
+            if target not in TARGETS:
+                raise ValueError(f"Unknown or unavailable DNN target: {target} (have: {', '.join(TARGETS)})")
+            self.net.setPreferableTarget(TARGETS[target])
+        # a Net holds its input and activations; one forward at a time per instance
+        self._lock = threading.Lock()
 
         ln = self.net.getLayerNames()
         for i in self.net.getUnconnectedOutLayers():
@@ -27,57 +79,52 @@ class YOLOER:
         return self.inference(mat)
 
     def inference(self, image):
+        """(width, height, forward seconds, detections) for one image; see DETECTION_DTYPE."""
         ih, iw = image.shape[:2]
+        inference_time, detections = self.inference_many([image])
+        return iw, ih, inference_time, detections[0]
+
+    def inference_many(self, images):
+        """
+        Several frames or crops in one forward pass: (forward seconds, one
+        DETECTION_DTYPE array per image, in image pixels).
+        """
+        blob = cv2.dnn.blobFromImages(images, 1 / 255.0, self.size, swapRB=True, crop=False)
+        with self._lock:
+            self.net.setInput(blob)
+            start = time.time()
+            layerOutputs = self.net.forward(self.output_names)
+            end = time.time()
+        # each YOLO layer emits (batch * cells * anchors, 5 + classes) rows, image by image
+        n = len(images)
+        rows = np.concatenate([out.reshape(n, -1, out.shape[-1]) for out in layerOutputs], axis=1)
+        return end - start, [self._decode(r, img.shape[1], img.shape[0]) for r, img in zip(rows, images)]
+
+    def _decode(self, rows, iw, ih):
+        """(x, y, w, h, objectness, class scores...) rows -> NMS-filtered DETECTION_DTYPE array."""
+        scores = rows[:, 5:]
+        class_ids = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(rows)), class_ids]
+        keep = confidences > self.confidence
+        rows, class_ids, confidences = rows[keep], class_ids[keep], confidences[keep]
+
+        # YOLO boxes are relative center x/y, width, height: scale to the image and
+        # move to the top-left corner
+        box = (rows[:, :4] * np.array([iw, ih, iw, ih])).astype(np.int32)
+        x = (box[:, 0] - box[:, 2] / 2).astype(np.int32)
+        y = (box[:, 1] - box[:, 3] / 2).astype(np.int32)
+        boxes = np.stack([x, y, box[:, 2], box[:, 3]], axis=1)
+
+        idxs = []
+        if len(boxes):
+            idxs = cv2.dnn.NMSBoxes(boxes.tolist(), confidences.tolist(), self.confidence, self.threshold)
+        idxs = np.asarray(idxs, dtype=np.int64).reshape(-1)
+
+        out = np.empty(len(idxs), dtype=DETECTION_DTYPE)
+        out["class_id"] = class_ids[idxs]
+        out["confidence"] = confidences[idxs]
+        out["x"], out["y"], out["w"], out["h"] = boxes[idxs].T
+        return out
 
-        blob = cv2.dnn.blobFromImage(image, 1 / 255.0, (self.size, self.size), swapRB=True, crop=False)
-        self.net.setInput(blob)
-        start = time.time()
-        layerOutputs = self.net.forward(self.output_names)
-        end = time.time()
-        inference_time = end - start
-
-        boxes = []
-        confidences = []
-        classIDs = []
-
-        for output in layerOutputs:
-            # loop over each of the detections
-            for detection in output:
-                # extract the class ID and confidence (i.e., probability) of
-                # the current object detection
-                scores = detection[5:]
-                classID = np.argmax(scores)
-                confidence = scores[classID]
-                # filter out weak predictions by ensuring the detected
-                # probability is greater than the minimum probability
-                if confidence > self.confidence:
-                    # scale the bounding box coordinates back relative to the
-                    # size of the image, keeping in mind that YOLO actually
-                    # returns the center (x, y)-coordinates of the bounding
-                    # box followed by the boxes' width and height
-                    box = detection[0:4] * np.array([iw, ih, iw, ih])
-                    (centerX, centerY, width, height) = box.astype("int")
-                    # use the center (x, y)-coordinates to derive the top and
-                    # and left corner of the bounding box
-                    x = int(centerX - (width / 2))
-                    y = int(centerY - (height / 2))
-                    # update our list of bounding box coordinates, confidences,
-                    # and class IDs
-                    boxes.append([x, y, int(width), int(height)])
-                    confidences.append(float(confidence))
-                    classIDs.append(classID)
-
-        idxs = cv2.dnn.NMSBoxes(boxes, confidences, self.confidence, self.threshold)
-
-        results = []
-        if len(idxs) > 0:
-            for i in idxs.flatten():
-                # extract the bounding box coordinates
-                x, y = (boxes[i][0], boxes[i][1])
-                w, h = (boxes[i][2], boxes[i][3])
-                id = classIDs[i]
-                confidence = confidences[i]
-
-                results.append((id, self.labels[id], confidence, x, y, w, h))
-
-        return iw, ih, inference_time, results
\ No newline at end of file
+    def label(self, class_id):
+        return self.labels[int(class_id)]